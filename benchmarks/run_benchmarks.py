@@ -0,0 +1,314 @@
+# run_benchmarks.py — time the hot paths on synthetic data, fit scaling curves, compare to a baseline
+#
+#   python benchmarks/run_benchmarks.py                       # quick sizes, print table
+#   python benchmarks/run_benchmarks.py --preset full --out results/bench.json
+#   python benchmarks/run_benchmarks.py --save-baseline       # refresh benchmarks/baseline.json
+#   python benchmarks/run_benchmarks.py --compare benchmarks/baseline.json --tolerance 0.25
+import argparse
+import contextlib
+import io
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent / "src"))
+
+import synthetic  # noqa: E402
+import convert_shap_json as csj  # noqa: E402
+import data_cleaning as dc  # noqa: E402
+import main  # noqa: E402
+import modified_network as mn  # noqa: E402
+from archive import xgboost_training as xt  # noqa: E402
+
+DEFAULT_BASELINE = BENCH_DIR / "baseline.json"
+CLI = BENCH_DIR.parent / "src" / "cli.py"
+STARTUP_BUDGET = 0.1  # seconds for `cli.py --help`
+
+# =========================
+# Benchmarks
+# =========================
+# Each benchmark is a plain dict:
+#   sizes   {"quick": [...], "full": [...]}  — the scaling parameter n
+#   unit    what n counts
+#   prepare(n, work_dir) -> fresh   (untimed; writes the synthetic inputs)
+#   fresh() -> args                 (untimed, called before every repeat so
+#                                    in-place functions always see clean input)
+#   run(*args)                      (timed)
+
+
+def _interpolate_prepare(n, work):
+    tsv = synthetic.write_scats_tsv(work / f"scats_{n}.tsv", n_detectors=n, n_lanes=4, n_days=14)
+    with contextlib.redirect_stdout(io.StringIO()):
+        df = dc.pre_processing_data(str(tsv))
+    return lambda: (df,)
+
+
+def _features_prepare(n, work):
+    df = synthetic.scats_frame(n_detectors=n, n_lanes=4, n_days=14, missing=0.0)
+    df[["Detector_ID", "Lane"]] = df["Detector"].str.split("-", expand=True).astype(int)
+    df["DateTime"] = pd.to_datetime(df["Date"] + " " + df["Time"])
+    df = df[["DateTime", "Detector_ID", "Lane", "Volume"]]
+    return lambda: (df,)
+
+
+def _pack_prepare(n, work):
+    paths = synthetic.write_shap_exports(work / f"shap_{n}", n_rows=n)
+    out = work / f"shap_{n}" / "pack"
+    return lambda: (paths["shap_csv"], paths["features_csv"], paths["pred_csv"], None, "veh/hr", 5,
+                    str(out / "llm_pack.json"), str(out / "llm_pack_local.jsonl"))
+
+
+def _net_prepare(n, work):
+    net = synthetic.write_net(work / f"net_{n}.net.xml", n_junctions=n)
+    return lambda: (str(net),)
+
+
+def _detectors_prepare(n, work):
+    det = synthetic.write_detector_output(work / f"det_{n}.xml", n_detectors=n, n_intervals=60)
+    return lambda: (str(det),)
+
+
+def _summary_prepare(n, work):
+    summary = synthetic.write_summary(work / f"summary_{n}.xml", n_steps=n)
+    return lambda: (str(summary),)
+
+
+def _link_prepare(n, work):
+    net = synthetic.write_net(work / f"net_{n}.net.xml", n_junctions=n)
+    out = work / f"net_{n}.linked.xml"
+    return lambda: (ET.parse(net), str(out))
+
+
+def _ensure_prepare(n, work):
+    net = synthetic.write_net(work / f"net_{n}.net.xml", n_junctions=n)
+    out = work / f"net_{n}.ensured.xml"
+    cfg = mn.load_tuning_config(None)
+
+    def fresh():
+        tree = ET.parse(net)
+        tl_to_conns = mn.link_connections_to_tllogic(tree, str(work / f"net_{n}.linked.xml"))
+        return tree, tl_to_conns, str(out), cfg
+    return fresh
+
+
+BENCHMARKS = {
+    "interpolate_data": {
+        "unit": "detectors (4 lanes x 14 days)",
+        "sizes": {"quick": [2, 4, 8], "full": [4, 8, 16, 32]},
+        "prepare": _interpolate_prepare,
+        "run": dc.interpolate_data,
+    },
+    "make_features": {
+        "unit": "detectors (4 lanes x 14 days)",
+        "sizes": {"quick": [2, 4, 8], "full": [4, 8, 16, 32]},
+        "prepare": _features_prepare,
+        "run": xt.make_features,
+    },
+    "build_llm_json": {
+        "unit": "SHAP rows",
+        "sizes": {"quick": [500, 1000, 2000], "full": [1000, 4000, 16000, 64000]},
+        "prepare": _pack_prepare,
+        "run": csj.build_llm_json,
+    },
+    "parse_network": {
+        "unit": "junctions",
+        "sizes": {"quick": [100, 400, 1600], "full": [400, 1600, 6400, 25600]},
+        "prepare": _net_prepare,
+        "run": main.parse_network,
+    },
+    "parse_detectors": {
+        "unit": "detectors (60 intervals)",
+        "sizes": {"quick": [20, 80, 320], "full": [80, 320, 1280, 5120]},
+        "prepare": _detectors_prepare,
+        "run": main.parse_detectors,
+    },
+    "parse_summary": {
+        "unit": "steps",
+        "sizes": {"quick": [3600, 14400], "full": [3600, 14400, 57600]},
+        "prepare": _summary_prepare,
+        "run": main.parse_summary,
+    },
+    "link_connections_to_tllogic": {
+        "unit": "junctions",
+        "sizes": {"quick": [100, 400, 1600], "full": [400, 1600, 6400]},
+        "prepare": _link_prepare,
+        "run": mn.link_connections_to_tllogic,
+    },
+    "ensure_tllogic_programs": {
+        "unit": "junctions",
+        "sizes": {"quick": [100, 400, 1600], "full": [400, 1600, 6400]},
+        "prepare": _ensure_prepare,
+        "run": mn.ensure_tllogic_programs,
+    },
+}
+
+
+# =========================
+# Timing
+# =========================
+
+def time_benchmark(bench, n, work, repeats=3):
+    """min / median wall seconds of bench["run"] at size n (inputs prepared untimed)."""
+    fresh = bench["prepare"](n, work)
+    times = []
+    for i in range(repeats + 1):
+        with contextlib.redirect_stdout(io.StringIO()):  # the pipeline functions are chatty
+            args = fresh()
+            t0 = time.perf_counter()
+            bench["run"](*args)
+            if i:  # first call is a warm-up (imports, caches)
+                times.append(time.perf_counter() - t0)
+    return {"n": n, "min_s": round(min(times), 6), "median_s": round(statistics.median(times), 6),
+            "repeats": repeats}
+
+
+def scaling_exponent(points):
+    """Slope of log(time) vs log(n): ~1 linear, ~2 quadratic. None with < 2 sizes."""
+    if len(points) < 2:
+        return None
+    n = np.log([p["n"] for p in points])
+    t = np.log([max(p["median_s"], 1e-9) for p in points])
+    return round(float(np.polyfit(n, t, 1)[0]), 3)
+
+
+def run_benchmarks(names=None, preset="quick", repeats=3, work_dir=None):
+    """Run the selected benchmarks over their preset sizes; returns the results dict."""
+    names = names or list(BENCHMARKS)
+    unknown = sorted(set(names) - set(BENCHMARKS))
+    if unknown:
+        raise KeyError(f"Unknown benchmarks: {unknown}")
+
+    results = {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "preset": preset,
+            "repeats": repeats,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+        },
+        "benchmarks": {},
+    }
+    with tempfile.TemporaryDirectory(prefix="xai-bench-") as tmp:
+        work = Path(work_dir or tmp)
+        work.mkdir(parents=True, exist_ok=True)
+        for name in names:
+            bench = BENCHMARKS[name]
+            points = []
+            for n in bench["sizes"][preset]:
+                p = time_benchmark(bench, n, work, repeats)
+                points.append(p)
+                print(f"{name:<30} n={n:<7} median {p['median_s']:.4f} s  (min {p['min_s']:.4f} s)")
+            results["benchmarks"][name] = {
+                "unit": bench["unit"],
+                "points": points,
+                "scaling_exponent": scaling_exponent(points),
+            }
+    return results
+
+
+def cli_startup(argv=("--help",), repeats=5):
+    """Best-of-repeats wall seconds for a fresh `python src/cli.py <argv>` process."""
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, str(CLI), *argv], stdout=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - t0)
+    return round(min(times), 4)
+
+
+# =========================
+# Baseline comparison
+# =========================
+
+def compare(results, baseline, tolerance=0.25):
+    """
+    Rows of (benchmark, n, baseline_s, current_s, ratio, regressed) for every
+    size present in both. Best-of-repeats times are compared (least affected
+    by other load on the machine); a point regresses when it is more than
+    `tolerance` slower than the baseline.
+    """
+    rows = []
+    for name, cur in results["benchmarks"].items():
+        base = {p["n"]: p for p in baseline.get("benchmarks", {}).get(name, {}).get("points", [])}
+        for p in cur["points"]:
+            b = base.get(p["n"])
+            if b is None:
+                continue
+            ratio = p["min_s"] / max(b["min_s"], 1e-9)
+            rows.append({"benchmark": name, "n": p["n"], "baseline_s": b["min_s"],
+                         "current_s": p["min_s"], "ratio": round(ratio, 3),
+                         "regressed": ratio > 1 + tolerance})
+    return rows
+
+
+def print_comparison(rows):
+    for r in rows:
+        flag = "REGRESSION" if r["regressed"] else ""
+        print(f"{r['benchmark']:<30} n={r['n']:<7} {r['baseline_s']:>9.4f} s → {r['current_s']:>9.4f} s "
+              f"x{r['ratio']:<6} {flag}")
+
+
+# =========================
+# CLI
+# =========================
+
+def main_cli(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark the pipeline hot paths on synthetic data.")
+    ap.add_argument("names", nargs="*", help=f"benchmarks to run (default all): {', '.join(BENCHMARKS)}")
+    ap.add_argument("--preset", choices=["quick", "full"], default="quick")
+    ap.add_argument("--repeats", type=int, default=3)
+    ap.add_argument("--work-dir", default=None, help="keep the synthetic inputs here instead of a temp dir")
+    ap.add_argument("--out", default=None, help="write the results JSON here")
+    ap.add_argument("--save-baseline", nargs="?", const=str(DEFAULT_BASELINE), default=None,
+                    help=f"write the results as the baseline (default {DEFAULT_BASELINE.name})")
+    ap.add_argument("--compare", default=None, help="baseline JSON to compare against")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before flagging (0.25 = 25%%)")
+    ap.add_argument("--startup", nargs="?", type=float, const=STARTUP_BUDGET, default=None, metavar="SECONDS",
+                    help=f"only check that `cli.py --help` starts within SECONDS (default {STARTUP_BUDGET})")
+    args = ap.parse_args(argv)
+
+    if args.startup is not None:
+        t = cli_startup()
+        ok = t <= args.startup
+        print(f"cli.py --help: {t * 1000:.1f} ms (budget {args.startup * 1000:.0f} ms) {'ok' if ok else 'TOO SLOW'}")
+        return 0 if ok else 1
+
+    results = run_benchmarks(args.names, args.preset, args.repeats, args.work_dir)
+
+    print("\nScaling (log-log slope of time vs n):")
+    for name, b in results["benchmarks"].items():
+        print(f"  {name:<30} {b['scaling_exponent']}  per {b['unit']}")
+
+    for out in filter(None, [args.out, args.save_baseline]):
+        Path(out).parent.mkdir(parents=True, exist_ok=True)
+        Path(out).write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"Wrote {out}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        if baseline.get("meta", {}).get("preset") != args.preset:
+            print(f"Note: baseline preset is {baseline.get('meta', {}).get('preset')!r}, only shared sizes are compared")
+        rows = compare(results, baseline, args.tolerance)
+        print(f"\nCompared with {args.compare}:")
+        print_comparison(rows)
+        if any(r["regressed"] for r in rows):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main_cli())
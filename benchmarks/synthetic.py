@@ -0,0 +1,222 @@
+# synthetic.py — deterministic stand-ins for SCATS / SUMO / SHAP inputs (benchmarks only)
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Everything is generated from a seeded numpy Generator, so the same arguments
+# always give byte-identical files and benchmark timings stay comparable.
+
+# hourly shape of a weekday (AM / PM peaks), scaled per lane
+DAY_PROFILE = np.array([
+    0.10, 0.06, 0.05, 0.05, 0.08, 0.20, 0.55, 0.95, 1.00, 0.75, 0.60, 0.62,
+    0.65, 0.62, 0.65, 0.75, 0.90, 1.00, 0.85, 0.60, 0.45, 0.35, 0.25, 0.15,
+])
+
+SHAP_FEATURES = [
+    "hour", "dow", "month", "sin_hour", "cos_hour", "sin_dow", "cos_dow",
+    "lag_1", "lag_2", "lag_3", "lag_6", "lag_12", "lag_24", "lag_168",
+    "roll_mean_3", "roll_mean_6", "roll_mean_24", "roll_std_3", "roll_std_6", "roll_std_24",
+    "hod_mean_past", "Detector_ID", "Lane",
+]
+
+
+# =========================
+# SCATS
+# =========================
+
+def scats_frame(n_detectors=4, n_lanes=4, n_days=14, missing=0.05, start="2024-01-01", seed=0):
+    """
+    SCATS-style hourly volumes: columns Detector ("<site>-<lane>"), Date, Time, Volume.
+    A `missing` share of rows is dropped so interpolate_data has gaps to fill.
+    """
+    rng = np.random.default_rng(seed)
+    times = pd.date_range(start, periods=n_days * 24, freq="h")
+    sites = 2900 + np.arange(n_detectors)
+    lanes = np.arange(1, n_lanes + 1)
+
+    n_series = n_detectors * n_lanes
+    scale = rng.uniform(50, 400, size=n_series)
+    weekend = np.where(times.dayofweek >= 5, 0.7, 1.0)
+    mean = scale[:, None] * DAY_PROFILE[times.hour][None, :] * weekend[None, :]
+    volume = rng.poisson(mean).ravel()
+
+    site_col = np.repeat(sites, n_lanes * len(times))
+    lane_col = np.tile(np.repeat(lanes, len(times)), n_detectors)
+    time_col = np.tile(times, n_series)
+
+    keep = rng.random(volume.size) >= missing
+    t = pd.DatetimeIndex(time_col[keep])
+    return pd.DataFrame({
+        "Detector": pd.Series(site_col[keep]).astype(str) + "-" + pd.Series(lane_col[keep]).astype(str),
+        "Date": t.strftime("%Y-%m-%d"),
+        "Time": t.strftime("%H:%M"),
+        "Volume": volume[keep],
+    })
+
+
+def write_scats_tsv(path, **kwargs):
+    """scats_frame(**kwargs) as a tab-separated file in the raw SCATS export layout."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    scats_frame(**kwargs).to_csv(path, sep="\t", index=False)
+    return path
+
+
+# =========================
+# SUMO network
+# =========================
+
+def write_net(path, n_junctions=100, lanes_per_edge=2, tl_share=0.3, tllogic_share=0.5, seed=0):
+    """
+    Grid-shaped net.xml with ~n_junctions junctions, two-way edges between
+    neighbours, one connection (with an internal `via` lane) per incoming lane
+    and outgoing edge, and a tl_share of signalised junctions. tllogic_share of
+    those already carry a <tlLogic> with a stale 2-link program, so
+    ensure_tllogic_programs has to regenerate it.
+    """
+    rng = np.random.default_rng(seed)
+    side = max(2, int(np.ceil(np.sqrt(n_junctions))))
+    jids = [f"J{i:06d}" for i in range(side * side)]
+    signal = rng.random(len(jids)) < tl_share
+
+    root = ET.Element("net", version="1.20", lefthand="true")
+    ET.SubElement(root, "location", netOffset="0.00,0.00",
+                  convBoundary=f"0.00,0.00,{side * 100:.2f},{side * 100:.2f}",
+                  origBoundary="0,0,1,1", projParameter="!")
+
+    edges = []  # (edge_id, from, to)
+    for r in range(side):
+        for c in range(side):
+            i = r * side + c
+            for dr, dc in ((0, 1), (1, 0)):
+                rr, cc = r + dr, c + dc
+                if rr < side and cc < side:
+                    k = rr * side + cc
+                    edges.append((f"E{i}_{k}", jids[i], jids[k]))
+                    edges.append((f"E{k}_{i}", jids[k], jids[i]))
+
+    for eid, a, b in edges:
+        e = ET.SubElement(root, "edge", id=eid, **{"from": a, "to": b}, priority="2", type="highway.secondary")
+        speed = f"{rng.choice([13.89, 16.67, 22.22]):.2f}"
+        for ln in range(lanes_per_edge):
+            ET.SubElement(e, "lane", id=f"{eid}_{ln}", index=str(ln), speed=speed, length="100.00",
+                          shape="0.00,0.00 100.00,0.00")
+
+    incoming, outgoing = {}, {}
+    for eid, a, b in edges:
+        outgoing.setdefault(a, []).append((eid, b))
+        incoming.setdefault(b, []).append((eid, a))
+
+    for i, jid in enumerate(jids):
+        r, c = divmod(i, side)
+        attrs = {"id": jid, "type": "traffic_light" if signal[i] else "priority",
+                 "x": f"{c * 100:.2f}", "y": f"{r * 100:.2f}"}
+        if signal[i]:
+            attrs["tl"] = jid
+        ET.SubElement(root, "junction", **attrs)
+
+    for i, jid in enumerate(jids):
+        if signal[i] and rng.random() < tllogic_share:
+            tl = ET.SubElement(root, "tlLogic", id=jid, type="static", programID="0", offset="0")
+            ET.SubElement(tl, "phase", duration="40", state="Gr")
+            ET.SubElement(tl, "phase", duration="40", state="rG")
+
+    for jid in jids:
+        k = 0
+        for in_eid, origin in incoming.get(jid, []):
+            for out_eid, dest in outgoing.get(jid, []):
+                if dest == origin:  # no U-turns
+                    continue
+                for ln in range(lanes_per_edge):
+                    ET.SubElement(root, "connection", **{"from": in_eid, "to": out_eid},
+                                  fromLane=str(ln), toLane=str(ln), via=f":{jid}_{k}_0",
+                                  dir="s", state="M")
+                    k += 1
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    ET.ElementTree(root).write(path, encoding="utf-8", xml_declaration=True)
+    return path
+
+
+# =========================
+# SUMO outputs
+# =========================
+
+def write_detector_output(path, n_detectors=20, n_intervals=60, period=60, seed=0):
+    """E1 detector output (<interval id begin end flow speed occupancy nVehContrib>)."""
+    rng = np.random.default_rng(seed)
+    flow = rng.poisson(600, size=(n_intervals, n_detectors))
+    speed = np.where(flow > 0, rng.uniform(2, 25, size=flow.shape), -1.0)
+    occ = rng.uniform(0, 60, size=flow.shape)
+
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', "<detector>"]
+    for t in range(n_intervals):
+        begin = t * period
+        for d in range(n_detectors):
+            lines.append(
+                f'    <interval begin="{begin:.2f}" end="{begin + period:.2f}" id="e1_{d}" '
+                f'nVehContrib="{flow[t, d] * period // 3600}" flow="{flow[t, d]:.2f}" '
+                f'occupancy="{occ[t, d]:.2f}" speed="{speed[t, d]:.2f}" length="5.00"/>'
+            )
+    lines.append("</detector>")
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return path
+
+
+def write_summary(path, n_steps=3600, seed=0):
+    """summary.xml with one <step> per simulated second."""
+    rng = np.random.default_rng(seed)
+    running = np.clip(np.cumsum(rng.integers(-2, 4, size=n_steps)), 0, None)
+    halting = (running * rng.uniform(0, 0.5, size=n_steps)).astype(int)
+    speed = rng.uniform(5, 15, size=n_steps)
+    arrived = np.cumsum(rng.integers(0, 2, size=n_steps))
+
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', "<summary>"]
+    for t in range(n_steps):
+        mtt = -1.0 if arrived[t] == 0 else 60 + 0.01 * t
+        lines.append(
+            f'    <step time="{t:.2f}" loaded="{running[t] + arrived[t]}" inserted="{running[t] + arrived[t]}" '
+            f'running="{running[t]}" waiting="0" ended="{arrived[t]}" arrived="{arrived[t]}" collisions="0" '
+            f'teleports="0" halting="{halting[t]}" stopped="0" meanWaitingTime="0.00" '
+            f'meanTravelTime="{mtt:.2f}" meanSpeed="{speed[t]:.2f}" meanSpeedRelative="0.50" duration="100"/>'
+        )
+    lines.append("</summary>")
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return path
+
+
+# =========================
+# SHAP exports
+# =========================
+
+def write_shap_exports(out_dir, n_rows=1000, n_features=23, seed=0):
+    """
+    shap_values.csv, X_explain_sample.csv and predictions.csv in the layout
+    convert_shap_json.build_llm_json reads (index column first).
+    """
+    rng = np.random.default_rng(seed)
+    names = [SHAP_FEATURES[j] if j < len(SHAP_FEATURES) else f"f{j}" for j in range(n_features)]
+    index = pd.RangeIndex(n_rows, name="row")
+    weights = rng.exponential(20, size=n_features)
+    shap_df = pd.DataFrame(rng.normal(0, 1, size=(n_rows, n_features)) * weights, index=index, columns=names)
+    X_df = pd.DataFrame(rng.uniform(0, 500, size=(n_rows, n_features)), index=index, columns=names)
+    pred = pd.DataFrame({"y_hat": shap_df.sum(axis=1) + 250}, index=index)
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    paths = {
+        "shap_csv": out_dir / "shap_values.csv",
+        "features_csv": out_dir / "X_explain_sample.csv",
+        "pred_csv": out_dir / "predictions.csv",
+    }
+    shap_df.to_csv(paths["shap_csv"])
+    X_df.to_csv(paths["features_csv"])
+    pred.to_csv(paths["pred_csv"])
+    return {k: str(v) for k, v in paths.items()}
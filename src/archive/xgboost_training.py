@@ -79,6 +79,12 @@ def train_xgb(train, valid, features, TARGET="Volume"):
     X_train, y_train = train[features], train[TARGET]
     X_valid, y_valid = valid[features], valid[TARGET]
 
+    es = EarlyStopping(
+        rounds=100,     # patience
+        save_best=True, # keep the best iteration
+        maximize=False  # for RMSE lower is better
+    )
+
     model = xgb.XGBRegressor(
         objective="reg:squarederror",
         n_estimators=2000,
@@ -90,19 +96,13 @@ def train_xgb(train, valid, features, TARGET="Volume"):
         tree_method="hist",
         enable_categorical=True,   # keep if your features include pandas categoricals
         eval_metric="rmse",        # set here (not in fit)
+        callbacks=[es],            # constructor, not fit (fit(callbacks=) is gone in xgboost >= 2)
         random_state=42,
     )
 
-    es = EarlyStopping(
-        rounds=100,     # patience
-        save_best=True, # keep the best iteration
-        maximize=False  # for RMSE lower is better
-    )
-
     model.fit(
         X_train, y_train,
         eval_set=[(X_valid, y_valid)],
-        callbacks=[es],
         verbose=False
     )
     return model
@@ -111,7 +111,7 @@ def evaluate(model, df, features, split_name="set"):
     preds = model.predict(df[features])
     y = df[TARGET].values
     mae = mean_absolute_error(y, preds)
-    rmse = mean_squared_error(y, preds, squared=False)
+    rmse = np.sqrt(mean_squared_error(y, preds))
 
     # sMAPE (robust to zeros)
     denom = (np.abs(y) + np.abs(preds))
@@ -122,26 +122,25 @@ def evaluate(model, df, features, split_name="set"):
 
 # ---------- USAGE ----------
 
-print("Python:", sys.version)
-print("XGBoost:", xgb.__version__)
-print("fit signature:", inspect.signature(xgb.XGBRegressor.fit))
-
-script_dir = os.path.dirname(os.path.abspath(__file__)) 
-file_path = os.path.join(script_dir, "..", "data", "at-dataset", "final_data.csv")
-
-df = pd.read_csv(file_path)
-feat_df = make_features(df)
+if __name__ == "__main__":
+    print("Python:", sys.version)
+    print("XGBoost:", xgb.__version__)
+    print("fit signature:", inspect.signature(xgb.XGBRegressor.fit))
 
-# Select features (exclude target and timestamp explicitly)
-drop_cols = [TARGET, TIME_COL]
-features = [c for c in feat_df.columns if c not in drop_cols]
+    script_dir = os.path.dirname(os.path.abspath(__file__)) 
+    file_path = os.path.join(script_dir, "..", "data", "at-dataset", "final_data.csv")
 
-train, valid, test = time_split(feat_df, valid_days=14, test_days=14)
-model = train_xgb(train, valid, features)
+    df = pd.read_csv(file_path)
+    feat_df = make_features(df)
 
-print("Best iteration:", model.best_iteration)
-evaluate(model, train, features, "train")
-evaluate(model, valid, features, "valid")
-evaluate(model, test,  features, "test")
+    # Select features (exclude target and timestamp explicitly)
+    drop_cols = [TARGET, TIME_COL]
+    features = [c for c in feat_df.columns if c not in drop_cols]
 
+    train, valid, test = time_split(feat_df, valid_days=14, test_days=14)
+    model = train_xgb(train, valid, features)
 
+    print("Best iteration:", model.best_iteration)
+    evaluate(model, train, features, "train")
+    evaluate(model, valid, features, "valid")
+    evaluate(model, test,  features, "test")
@@ -0,0 +1,402 @@
+# artifact_store.py — content-addressed, compressed store for networks and run outputs, with lineage
+import argparse
+import gzip
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+import profiling
+
+STORE_DIR = Path("results") / ".artifacts"
+
+# =========================
+# Layout
+# =========================
+#   objects/<h[:2]>/<h>.gz|.zst   compressed content, h = sha256 of the raw bytes
+#   meta/<h>.json                 {hash, size, codec, kind, name, parents: [h...], meta, created}
+#   refs/<ref>.json               named pointers ({"hash": h}), e.g. "2906/default/rebuilt"
+#   plain/<h>                     decompressed copies made on demand for mmap access
+#   paths/<sha1(abs path)>.json   {path, hash}: a working copy that was archived and then deleted
+# A folder (e.g. one SUMO run) is stored file by file plus a "tree" object:
+# JSON {relative path: hash}. Identical files across variants / runs are
+# stored once. GC keeps everything reachable from refs through tree entries
+# and lineage parents and deletes the rest.
+
+CHUNK = 1 << 20
+
+
+def _codec():
+    try:
+        import zstandard  # noqa: F401
+        return "zst"
+    except ImportError:
+        return "gz"
+
+
+def _open_write(path, codec):
+    if codec == "zst":
+        import zstandard
+
+        return zstandard.ZstdCompressor(level=10).stream_writer(open(path, "wb"), closefd=True)
+    return gzip.open(path, "wb", compresslevel=6)
+
+
+def _open_read(path, codec):
+    if codec == "zst":
+        import zstandard
+
+        return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+    return gzip.open(path, "rb")
+
+
+class ArtifactStore:
+    def __init__(self, root=STORE_DIR):
+        self.root = Path(root)
+        for sub in ("objects", "meta", "refs", "plain", "paths"):
+            (self.root / sub).mkdir(parents=True, exist_ok=True)
+
+    # ---------- paths ----------
+
+    def _meta_path(self, h):
+        return self.root / "meta" / f"{h}.json"
+
+    def _object_path(self, h, codec):
+        return self.root / "objects" / h[:2] / f"{h}.{codec}"
+
+    def _ref_path(self, ref):
+        return self.root / "refs" / f"{ref.replace(':', '__')}.json"
+
+    def exists(self, h):
+        return self._meta_path(h).exists()
+
+    def info(self, h):
+        return json.loads(self._meta_path(h).read_text(encoding="utf-8"))
+
+    # ---------- write ----------
+
+    def _write_meta(self, h, record):
+        """Create or extend the meta record; parents from later puts are unioned in."""
+        path = self._meta_path(h)
+        if path.exists():
+            old = json.loads(path.read_text(encoding="utf-8"))
+            new_parents = [p for p in record["parents"] if p not in old["parents"]]
+            if not new_parents:
+                return old
+            old["parents"] += new_parents
+            record = old
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(record, indent=2), encoding="utf-8")
+        os.replace(tmp, path)
+        return record
+
+    def put(self, path, kind="file", parents=(), meta=None, name=None):
+        """
+        Store one file (streamed: hashed and compressed in one pass). Returns its
+        hash; content already in the store is not written again, only its
+        lineage parents are extended.
+        """
+        codec = _codec()
+        fd, tmp = tempfile.mkstemp(dir=self.root / "objects", suffix=".tmp")
+        os.close(fd)
+        h, size = hashlib.sha256(), 0
+        try:
+            with open(path, "rb") as src, _open_write(tmp, codec) as dst:
+                for block in iter(lambda: src.read(CHUNK), b""):
+                    h.update(block)
+                    size += len(block)
+                    dst.write(block)
+            digest = h.hexdigest()
+            if not self.exists(digest):
+                obj = self._object_path(digest, codec)
+                obj.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(tmp, obj)
+        finally:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+        self._write_meta(digest, {
+            "hash": digest, "size": size, "codec": codec, "kind": kind, "name": name or Path(path).name,
+            "parents": [self.resolve(p) for p in parents], "meta": meta or {},
+            "created": datetime.now().isoformat(timespec="seconds"),
+        })
+        return digest
+
+    def put_bytes(self, data, name, kind="file", parents=(), meta=None):
+        fd, tmp = tempfile.mkstemp(dir=self.root / "plain", suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        try:
+            return self.put(tmp, kind, parents, meta, name=name)
+        finally:
+            os.unlink(tmp)
+
+    def put_dir(self, folder, parents=(), meta=None):
+        """Store every file under folder plus a tree object listing them; returns the tree hash."""
+        folder = Path(folder)
+        entries = {str(p.relative_to(folder)).replace(os.sep, "/"): self.put(p, kind="file")
+                   for p in sorted(folder.rglob("*")) if p.is_file()}
+        blob = json.dumps({"tree": entries}, sort_keys=True, indent=2).encode("utf-8")
+        return self.put_bytes(blob, f"{folder.name}.tree.json", kind="tree", parents=parents, meta=meta)
+
+    # ---------- refs ----------
+
+    def tag(self, ref, h):
+        path = self._ref_path(ref)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps({"hash": h, "tagged": datetime.now().isoformat(timespec="seconds")}),
+                        encoding="utf-8")
+        return h
+
+    def untag(self, ref):
+        self._ref_path(ref).unlink(missing_ok=True)
+
+    def refs(self):
+        out = {}
+        for p in (self.root / "refs").rglob("*.json"):
+            name = str(p.relative_to(self.root / "refs"))[:-len(".json")].replace(os.sep, "/").replace("__", ":")
+            out[name] = json.loads(p.read_text(encoding="utf-8"))["hash"]
+        return out
+
+    def resolve(self, ref_or_hash):
+        """Hash for a ref name, full hash or unique hash prefix."""
+        ref = self._ref_path(str(ref_or_hash))
+        if ref.exists():
+            return json.loads(ref.read_text(encoding="utf-8"))["hash"]
+        h = str(ref_or_hash)
+        if self.exists(h):
+            return h
+        matches = [p.stem for p in (self.root / "meta").glob(f"{h}*.json")] if len(h) >= 6 else []
+        if len(matches) == 1:
+            return matches[0]
+        raise KeyError(f"unknown artifact or ref: {ref_or_hash}")
+
+    # ---------- read ----------
+
+    def open(self, ref_or_hash):
+        """Read-only binary stream of the raw content (decompressed while reading)."""
+        info = self.info(self.resolve(ref_or_hash))
+        return _open_read(self._object_path(info["hash"], info["codec"]), info["codec"])
+
+    def read_bytes(self, ref_or_hash):
+        with self.open(ref_or_hash) as f:
+            return f.read()
+
+    def tree(self, ref_or_hash):
+        return json.loads(self.read_bytes(ref_or_hash))["tree"]
+
+    def plain_path(self, ref_or_hash):
+        """Path to a decompressed copy (made once, then reused) — for tools that need a real file."""
+        h = self.resolve(ref_or_hash)
+        path = self.root / "plain" / h
+        if not path.exists():
+            tmp = path.with_suffix(f".{os.getpid()}.tmp")
+            with self.open(h) as src, open(tmp, "wb") as dst:
+                shutil.copyfileobj(src, dst, CHUNK)
+            os.replace(tmp, path)
+        return path
+
+    def mmap(self, ref_or_hash):
+        """Read-only memory map of the decompressed content."""
+        with open(self.plain_path(ref_or_hash), "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def checkout(self, ref_or_hash, dest):
+        """Write a file (or a whole tree) back out to dest."""
+        h = self.resolve(ref_or_hash)
+        dest = Path(dest)
+        if self.info(h)["kind"] == "tree":
+            for rel, child in self.tree(h).items():
+                self.checkout(child, dest / rel)
+            return dest
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        with self.open(h) as src, open(dest, "wb") as dst:
+            shutil.copyfileobj(src, dst, CHUNK)
+        return dest
+
+    # ---------- archived working copies ----------
+
+    def _path_entry(self, path):
+        key = hashlib.sha1(str(Path(path).resolve()).encode("utf-8")).hexdigest()
+        return self.root / "paths" / f"{key}.json"
+
+    def archive_path(self, path, ref_or_hash):
+        """Remember what `path` (file or folder) held, so it can be deleted and restored later."""
+        entry = self._path_entry(path)
+        tmp = entry.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps({"path": str(Path(path).resolve()), "hash": self.resolve(ref_or_hash)}),
+                       encoding="utf-8")
+        os.replace(tmp, entry)
+
+    def lookup_path(self, path):
+        """Hash of an archived path, also for a file inside an archived folder; None if unknown."""
+        p = Path(path).resolve()
+        for anc in (p, *p.parents):
+            entry = self._path_entry(anc)
+            if not entry.exists():
+                continue
+            h = json.loads(entry.read_text(encoding="utf-8"))["hash"]
+            if not self.exists(h):
+                return None
+            if anc == p:
+                return h
+            return self.tree(h).get(p.relative_to(anc).as_posix()) if self.info(h)["kind"] == "tree" else None
+        return None
+
+    def restore(self, path):
+        """Check an archived path out again in place; False if the store does not know it."""
+        h = self.lookup_path(path)
+        if h is None:
+            return False
+        self.checkout(h, path)
+        return True
+
+    # ---------- lineage ----------
+
+    def lineage(self, ref_or_hash):
+        """All ancestors of an artifact as [{hash, name, kind, parents}], nearest first."""
+        seen, order, todo = set(), [], [self.resolve(ref_or_hash)]
+        while todo:
+            h = todo.pop(0)
+            if h in seen or not self.exists(h):
+                continue
+            seen.add(h)
+            info = self.info(h)
+            order.append({k: info[k] for k in ("hash", "name", "kind", "parents")})
+            todo.extend(info["parents"])
+        return order
+
+    # ---------- GC ----------
+
+    def _reachable(self):
+        live, todo = set(), list(self.refs().values())
+        while todo:
+            h = todo.pop()
+            if h in live or not self.exists(h):
+                continue
+            live.add(h)
+            info = self.info(h)
+            todo.extend(info["parents"])
+            if info["kind"] == "tree":
+                todo.extend(self.tree(h).values())
+        return live
+
+    @profiling.traced()
+    def gc(self, dry_run=False):
+        """Delete artifacts not reachable from any ref. Returns {"removed", "freed_bytes"}."""
+        live = self._reachable()
+        removed, freed = [], 0
+        for meta in (self.root / "meta").glob("*.json"):
+            h = meta.stem
+            if h in live:
+                continue
+            info = json.loads(meta.read_text(encoding="utf-8"))
+            paths = [self._object_path(h, info["codec"]), self.root / "plain" / h, meta]
+            freed += sum(p.stat().st_size for p in paths if p.exists())
+            removed.append(h)
+            if not dry_run:
+                for p in paths:
+                    p.unlink(missing_ok=True)
+                if not any(paths[0].parent.iterdir()):
+                    paths[0].parent.rmdir()
+        # plain copies are a cache: drop those of live artifacts too
+        if not dry_run:
+            gone = set(removed)
+            for p in (self.root / "paths").glob("*.json"):
+                if json.loads(p.read_text(encoding="utf-8"))["hash"] in gone:
+                    p.unlink()
+            for p in (self.root / "plain").iterdir():
+                if p.is_file():
+                    freed += p.stat().st_size
+                    p.unlink()
+        print(f"GC: {len(removed)} unreferenced artifacts, {freed / 1e6:.2f} MB {'reclaimable' if dry_run else 'freed'}")
+        return {"removed": removed, "freed_bytes": freed}
+
+    def usage(self):
+        """Stored (compressed) vs raw bytes over all artifacts."""
+        raw = stored = n = 0
+        for meta in (self.root / "meta").glob("*.json"):
+            info = json.loads(meta.read_text(encoding="utf-8"))
+            obj = self._object_path(info["hash"], info["codec"])
+            raw += info["size"]
+            stored += obj.stat().st_size if obj.exists() else 0
+            n += 1
+        return {"artifacts": n, "raw_bytes": raw, "stored_bytes": stored}
+
+
+# =========================
+# Pipeline helpers
+# =========================
+
+def record_variant(store, prefix, base_net, llm_raw, tuning, merged, linked, ensured,
+                   rebuilt=None, run_dir=None, meta=None):
+    """
+    Store one policy variant with its lineage
+    (base net + LLM output + tuning → merged → linked → ensured → rebuilt → run)
+    and tag every step under `prefix` (e.g. "2906/default"). Returns {step: hash}.
+    """
+    h = {
+        "base_net": store.put(base_net, kind="network"),
+        "llm_raw": store.put(llm_raw, kind="llm_output"),
+        "tuning": store.put(tuning, kind="tuning"),
+    }
+    h["merged"] = store.put(merged, kind="network", parents=[h["base_net"], h["llm_raw"]], meta=meta)
+    h["linked"] = store.put(linked, kind="network", parents=[h["merged"]], meta=meta)
+    h["ensured"] = store.put(ensured, kind="network", parents=[h["linked"], h["tuning"]], meta=meta)
+    last = h["ensured"]
+    if rebuilt and Path(rebuilt).exists():
+        h["rebuilt"] = last = store.put(rebuilt, kind="network", parents=[h["ensured"]], meta=meta)
+    if run_dir and Path(run_dir).exists():
+        h["run"] = store.put_dir(run_dir, parents=[last], meta=meta)
+    for step, digest in h.items():
+        store.tag(f"{prefix}/{step}", digest)
+    return h
+
+
+# =========================
+# CLI
+# =========================
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Content-addressed artifact store.")
+    ap.add_argument("--store", default=str(STORE_DIR))
+    profiling.add_cli_args(ap)
+    sub = ap.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("put", help="store a file or folder")
+    p.add_argument("path")
+    p.add_argument("--tag", default=None)
+    p.add_argument("--parent", action="append", default=[], help="lineage parent (ref or hash, repeatable)")
+    p = sub.add_parser("get", help="write an artifact (file or tree) to a path")
+    p.add_argument("ref")
+    p.add_argument("dest")
+    p = sub.add_parser("lineage")
+    p.add_argument("ref")
+    sub.add_parser("refs")
+    sub.add_parser("du", help="raw vs stored size")
+    p = sub.add_parser("gc", help="delete unreferenced artifacts")
+    p.add_argument("--dry-run", action="store_true")
+    args = ap.parse_args()
+    profiling.configure_from_args(args)
+
+    st = ArtifactStore(args.store)
+    if args.command == "put":
+        put = st.put_dir if Path(args.path).is_dir() else st.put
+        digest = put(args.path, parents=args.parent)
+        if args.tag:
+            st.tag(args.tag, digest)
+        print(digest)
+    elif args.command == "get":
+        print(st.checkout(args.ref, args.dest))
+    elif args.command == "lineage":
+        for a in st.lineage(args.ref):
+            print(f"{a['hash'][:12]}  {a['kind']:<10} {a['name']}  ← {', '.join(p[:12] for p in a['parents']) or '-'}")
+    elif args.command == "refs":
+        for name, digest in sorted(st.refs().items()):
+            print(f"{digest[:12]}  {name}")
+    elif args.command == "du":
+        print(json.dumps(st.usage(), indent=2))
+    elif args.command == "gc":
+        st.gc(dry_run=args.dry_run)
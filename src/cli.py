@@ -0,0 +1,270 @@
+# cli.py — one entry point for every step: python src/cli.py <command> [options]
+#
+# Only argparse is imported up front; each command imports pandas / xgboost /
+# shap / openai inside its handler, so `--help` and argument errors stay fast.
+# The OpenAI key is read only by the `policy` command.
+import argparse
+import os
+import sys
+
+import profiling
+
+BASELINE_DIR = os.path.join("results", "traffic_simulation_results", "baseline")
+SIM_DIR = os.path.join("traffic simulation", "2906")
+
+
+# =========================
+# Commands
+# =========================
+
+def cmd_clean(args):
+    import pipeline
+
+    pipeline.clean_stage(args.raw, args.out)
+    print(f"Cleaned data → {args.out}")
+
+
+def cmd_train(args):
+    import pipeline
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    features = os.path.join(args.out_dir, "features.csv")
+    model = args.model_out or os.path.join(args.out_dir, f"xgb-model-{args.detector}.json")
+    pipeline.features_stage(args.clean, features, args.detector)
+    pipeline.train_stage(features, model, valid_days=args.valid_days, test_days=args.test_days)
+    print(f"Features → {features}\nModel → {model}")
+
+
+def cmd_evaluate(args):
+    import pandas as pd
+
+    import evaluation as ev
+    from model_update import load_features, load_regressor
+
+    df, features = load_features(args.features)
+    if args.test_days:
+        df = df[df[ev.TIME_COL] > df[ev.TIME_COL].max() - pd.Timedelta(days=args.test_days)]
+    table = ev.evaluate_by_series(load_regressor(args.model), df, features, chunk_rows=args.chunk_rows)
+    table.to_csv(args.out, index=False)
+    print(f"{ev.summary_line(table)}\nPer-series metrics → {args.out}")
+
+
+def cmd_shap(args):
+    import pipeline
+
+    pipeline.shap_stage(args.features, args.model, args.out_dir, test_days=args.test_days, backend=args.backend)
+    print(f"SHAP exports → {args.out_dir}")
+
+
+def cmd_pack(args):
+    import pipeline
+
+    pipeline.pack_stage(args.shap, args.pred, args.out_json, args.out_jsonl, units=args.units, k_top=args.k_top)
+
+
+def cmd_prompt(args):
+    import pipeline
+
+    pipeline.prompt_stage(args.network, args.detectors, args.summary, args.context, args.out, args.pack)
+    print(f"Prompt → {args.out}")
+
+
+def cmd_policy(args):
+    if args.stream:
+        import main
+
+        with open(args.prompt, "r", encoding="utf-8") as f:
+            prompt = f.read()
+        text, _ = main.stream_policy(prompt, args.network, args.merged_out, model=args.model)
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        import pipeline
+
+        pipeline.llm_stage(args.prompt, args.out, model=args.model)
+    print(f"LLM output → {args.out}")
+
+
+def cmd_patch(args):
+    import pipeline
+
+    paths = {s: os.path.join(args.out_dir, f"osm_policy_{s}.net.xml") for s in ("merged", "linked", "ensured", "rebuilt")}
+    pipeline.patch_stage(args.network, args.llm_json, args.tuning, paths["merged"], paths["linked"], paths["ensured"])
+    if args.rebuild:
+        pipeline.rebuild_stage(paths["ensured"], paths["rebuilt"], netconvert_path=args.netconvert_path)
+
+
+def cmd_simulate(args):
+    import scenario_runner as sr
+
+    scenarios = [{"name": f"{args.name}-seed{s}", "net": args.net, "trips": args.trips,
+                  "detectors": args.detectors, "base_cfg": args.base_cfg, "seed": s} for s in args.seeds]
+    batch = sr.run_scenarios(scenarios, out_dir=args.out_dir, max_workers=args.max_workers,
+                             timeout=args.timeout, sumo_binary=args.sumo_binary, batch_name=args.batch_name)
+    return 0 if batch["n_failed"] == 0 else 1
+
+
+def cmd_rollup(args):
+    import detector_rollup as dr
+
+    cube = dr.build_cube(args.detectors, args.cache_dir, force=args.force)
+    df = dr.query(cube, args.resolution, ids=args.ids, begin=args.begin, end=args.end)
+    if args.out:
+        df.to_csv(args.out, index=False)
+        print(f"{len(df)} rows → {args.out}")
+    else:
+        print(df.head(20).to_string(index=False))
+
+
+def cmd_hotspots(args):
+    import hotspots as hs
+
+    ranked = hs.rank_hotspots(args.pred, args.sites, args.pred_col, args.shap_values, args.shap_features,
+                              args.sim_detectors, args.loop_sites, args.cluster_m, args.min_score,
+                              args.out, args.out_csv)
+    print(f"{len(ranked)} sites ranked → {args.out_csv}, map → {args.out}")
+
+
+def cmd_compare(args):
+    import compare_runs as cr
+
+    runs = [r for m in args.manifest for r in cr.runs_from_manifest(m)]
+    report = cr.compare_runs(runs, args.baseline_detectors, args.baseline_summary, n_boot=args.n_boot)
+    if args.out:
+        report.to_csv(args.out, index=False)
+        print(f"Comparison → {args.out}")
+    print(report.to_string(index=False))
+
+
+# =========================
+# Parser
+# =========================
+
+def build_parser():
+    ap = argparse.ArgumentParser(prog="xai-traffic", description="SCATS → XGBoost → SHAP → LLM policy → SUMO toolkit.")
+    profiling.add_cli_args(ap)
+    sub = ap.add_subparsers(dest="command", metavar="command", required=True)
+
+    p = sub.add_parser("clean", help="parse and hourly-interpolate the raw SCATS export")
+    p.add_argument("--raw", default=os.path.join("data", "at-dataset", "SCATS-data", "Scats-Data.csv"))
+    p.add_argument("--out", default=os.path.join("data", "at-dataset", "SCATS-data", "Scats-Data-Clean.csv"))
+    p.set_defaults(func=cmd_clean)
+
+    p = sub.add_parser("train", help="build features for one detector and train its XGBoost model")
+    p.add_argument("--clean", required=True, help="cleaned SCATS CSV")
+    p.add_argument("--detector", type=int, default=2906)
+    p.add_argument("--out-dir", default=os.path.join("results", "pipeline", "2906"))
+    p.add_argument("--model-out", default=None, help="default <out-dir>/xgb-model-<detector>.json")
+    p.add_argument("--valid-days", type=int, default=14)
+    p.add_argument("--test-days", type=int, default=14)
+    p.set_defaults(func=cmd_train)
+
+    p = sub.add_parser("evaluate", help="MAE / RMSE / sMAPE per detector, lane and hour (chunked)")
+    p.add_argument("--features", required=True)
+    p.add_argument("--model", required=True)
+    p.add_argument("--test-days", type=int, default=14, help="score the last N days (0 = all rows)")
+    p.add_argument("--chunk-rows", type=int, default=1 << 18)
+    p.add_argument("--out", default="metrics_by_series.csv")
+    p.set_defaults(func=cmd_evaluate)
+
+    p = sub.add_parser("shap", help="SHAP values + predictions on the test split (shap lib or native XGBoost)")
+    p.add_argument("--features", required=True)
+    p.add_argument("--model", required=True)
+    p.add_argument("--out-dir", required=True)
+    p.add_argument("--test-days", type=int, default=14)
+    p.add_argument("--backend", choices=["auto", "shap", "contribs", "approx"], default="auto")
+    p.set_defaults(func=cmd_shap)
+
+    p = sub.add_parser("pack", help="turn SHAP exports into the LLM JSON pack")
+    p.add_argument("--shap", required=True, help="shap_values.csv")
+    p.add_argument("--pred", default=None, help="predictions.csv")
+    p.add_argument("--out-json", default=os.path.join("shap_exports", "llm_pack.json"))
+    p.add_argument("--out-jsonl", default=os.path.join("shap_exports", "llm_pack_local.jsonl"))
+    p.add_argument("--units", default="veh/hr")
+    p.add_argument("--k-top", type=int, default=5)
+    p.set_defaults(func=cmd_pack)
+
+    p = sub.add_parser("prompt", help="build the policy prompt from network, detectors and summary")
+    p.add_argument("--network", default=os.path.join(SIM_DIR, "osm.net.xml"))
+    p.add_argument("--detectors", default=os.path.join(BASELINE_DIR, "baseline_detector_output.xml"))
+    p.add_argument("--summary", default=os.path.join(BASELINE_DIR, "baseline_summary.xml"))
+    p.add_argument("--context", default=os.path.join("results", "llm", "context.txt"))
+    p.add_argument("--pack", default=None, help="llm_pack.json from `pack` (adds the SHAP summary)")
+    p.add_argument("--out", default="llm_policy_prompt.txt")
+    p.set_defaults(func=cmd_prompt)
+
+    p = sub.add_parser("policy", help="send a prompt to the LLM (reads OPENAI_API_KEY)")
+    p.add_argument("--prompt", default="llm_policy_prompt.txt")
+    p.add_argument("--out", required=True, help="raw LLM output file")
+    p.add_argument("--model", default="gpt-5")
+    p.add_argument("--stream", action="store_true", help="merge tlLogic snippets into --merged-out while streaming")
+    p.add_argument("--network", default=os.path.join(SIM_DIR, "osm.net.xml"))
+    p.add_argument("--merged-out", default=os.path.join("results", "road-rebuild", "osm_policy_merged-stream.net.xml"))
+    p.set_defaults(func=cmd_policy)
+
+    p = sub.add_parser("patch", help="merge LLM tlLogic snippets, link and tune signals")
+    p.add_argument("--network", default=os.path.join(SIM_DIR, "osm.net.xml"))
+    p.add_argument("--llm-json", required=True, help="raw LLM output (JSON)")
+    p.add_argument("--tuning", default=os.path.join("src", "signal_tuning.json"))
+    p.add_argument("--out-dir", default=os.path.join("results", "road-rebuild"))
+    p.add_argument("--rebuild", action="store_true", help="run netconvert on the ensured network")
+    p.add_argument("--netconvert-path", default="netconvert")
+    p.set_defaults(func=cmd_patch)
+
+    p = sub.add_parser("simulate", help="run SUMO headless for one network over several seeds")
+    p.add_argument("--net", required=True)
+    p.add_argument("--trips", default=os.path.join(SIM_DIR, "my_entry_exit_trips.trips.xml"))
+    p.add_argument("--detectors", default=os.path.join(SIM_DIR, "detectors.add.xml"))
+    p.add_argument("--base-cfg", default=os.path.join(SIM_DIR, "osm.sumocfg"))
+    p.add_argument("--seeds", type=int, nargs="+", default=[1])
+    p.add_argument("--name", default="policy", help="run name prefix")
+    p.add_argument("--out-dir", default=os.path.join("results", "traffic_simulation_results"))
+    p.add_argument("--batch-name", default=None)
+    p.add_argument("-j", "--max-workers", type=int, default=None)
+    p.add_argument("--timeout", type=float, default=None)
+    p.add_argument("--sumo-binary", default=os.environ.get("SUMO_BINARY", "sumo"))
+    p.set_defaults(func=cmd_simulate)
+
+    p = sub.add_parser("rollup", help="1/5/15/60-minute detector aggregates (built once, then queried)")
+    p.add_argument("detectors", help="SUMO induction-loop output XML")
+    p.add_argument("--resolution", type=int, choices=[60, 300, 900, 3600], default=300, help="bin size in seconds")
+    p.add_argument("--ids", nargs="*", default=None)
+    p.add_argument("--begin", type=float, default=None)
+    p.add_argument("--end", type=float, default=None)
+    p.add_argument("--cache-dir", default=os.path.join("results", "traffic_simulation_results", ".cache"))
+    p.add_argument("--force", action="store_true")
+    p.add_argument("--out", default=None)
+    p.set_defaults(func=cmd_rollup)
+
+    p = sub.add_parser("hotspots", help="rank congestion hotspots and render the hotspot map")
+    p.add_argument("pred", help="predictions.csv from the shap stage (Detector_ID, Lane, DateTime, y_hat, Volume)")
+    p.add_argument("sites", help="Site-List-Coordinates.csv")
+    p.add_argument("--pred-col", default="y_hat")
+    p.add_argument("--shap-values", default=None, help="shap_values.csv (same rows as --shap-features)")
+    p.add_argument("--shap-features", default=None, help="features.csv from the shap stage (has Detector_ID)")
+    p.add_argument("--sim-detectors", default=None, help="SUMO detector output for congestion levels")
+    p.add_argument("--loop-sites", default=None, help="JSON {loop id: Detector_ID} for --sim-detectors")
+    p.add_argument("--cluster-m", type=float, default=400.0)
+    p.add_argument("--min-score", type=float, default=0.5)
+    p.add_argument("--out", default=os.path.join("results", "heatmap", "hotspots_map.html"))
+    p.add_argument("--out-csv", default=os.path.join("results", "heatmap", "hotspots.csv"))
+    p.set_defaults(func=cmd_hotspots)
+
+    p = sub.add_parser("compare", help="policy runs vs baseline with bootstrap CIs")
+    p.add_argument("manifest", nargs="+", help="scenario_runner batch manifest.json")
+    p.add_argument("--baseline-detectors", default=os.path.join(BASELINE_DIR, "baseline_detector_output.xml"))
+    p.add_argument("--baseline-summary", default=os.path.join(BASELINE_DIR, "baseline_summary.xml"))
+    p.add_argument("--n-boot", type=int, default=2000)
+    p.add_argument("--out", default=None)
+    p.set_defaults(func=cmd_compare)
+    return ap
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    profiling.configure_from_args(args)
+    return args.func(args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+# compare_runs.py — baseline vs policy comparison over many SUMO runs
+import argparse
+import hashlib
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import scenario_runner as sr
+import sumo_outputs as so
+
+BASELINE_DIR = Path("results") / "traffic_simulation_results" / "baseline"
+DEFAULT_CACHE_DIR = Path("results") / "traffic_simulation_results" / ".cache"
+METRICS = ("flow", "speed", "occupancy")
+
+
+# =========================
+# Baseline cache
+# =========================
+
+def file_hash(path, chunk=1 << 20):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def load_detector_arrays(path, cache_dir=DEFAULT_CACHE_DIR):
+    """Parsed detector output, cached as .npz keyed by the file's content hash."""
+    cache_dir = Path(cache_dir)
+    cached = cache_dir / f"det-{file_hash(path)}.npz"
+    if cached.exists():
+        with np.load(cached) as z:
+            return {k: z[k] for k in z.files}
+    arrays = so.detector_arrays(path)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    np.savez(cached, **arrays)
+    return arrays
+
+
+# =========================
+# Alignment + deltas
+# =========================
+
+def align(base, pol):
+    """
+    Row indices (ib, ip) of intervals present in both runs, matched on
+    (detector id, interval begin) with one sorted-key intersection.
+    """
+    ids, codes = np.unique(np.concatenate([base["id"], pol["id"]]), return_inverse=True)
+    nb = len(base["id"])
+    begins = np.rint(np.concatenate([base["begin"], pol["begin"]]) * 1000).astype(np.int64)
+    steps, bins = np.unique(begins, return_inverse=True)
+    key = codes.astype(np.int64) * len(steps) + bins
+    _, ib, ip = np.intersect1d(key[:nb], key[nb:], assume_unique=True, return_indices=True)
+    return ib, ip
+
+
+def detector_deltas(base, pol):
+    """Per-detector mean policy − baseline delta of flow, speed and occupancy."""
+    ib, ip = align(base, pol)
+    det, inv = np.unique(base["id"][ib], return_inverse=True)
+    n = np.bincount(inv, minlength=len(det))
+    out = {"id": det, "n_intervals": n}
+    for m in METRICS:
+        d = pol[m][ip] - base[m][ib]
+        valid = np.ones_like(d, dtype=bool)
+        if m == "speed":  # -1 means "no vehicle": compare only intervals with traffic in both
+            valid = (pol[m][ip] >= 0) & (base[m][ib] >= 0)
+        cnt = np.bincount(inv, weights=valid, minlength=len(det))
+        s = np.bincount(inv, weights=np.where(valid, d, 0.0), minlength=len(det))
+        out[f"d_{m}"] = np.divide(s, cnt, out=np.full(len(det), np.nan), where=cnt > 0)
+    return pd.DataFrame(out)
+
+
+def run_deltas(base, pol):
+    """Network-wide mean deltas for one run (aligned intervals only)."""
+    ib, ip = align(base, pol)
+    out = {"n_aligned": int(len(ib))}
+    for m in METRICS:
+        b, p = base[m][ib], pol[m][ip]
+        if m == "speed":
+            ok = (b >= 0) & (p >= 0)
+            b, p = b[ok], p[ok]
+        out[f"d_{m}"] = float((p - b).mean()) if len(b) else np.nan
+    return out
+
+
+def bootstrap_ci(values, n_boot=2000, alpha=0.05, seed=0):
+    """Percentile bootstrap CI of the mean across seeds (all resamples drawn at once)."""
+    v = np.asarray(values, dtype=float)
+    v = v[~np.isnan(v)]
+    if len(v) == 0:
+        return np.nan, np.nan
+    if len(v) == 1:
+        return v[0], v[0]
+    rng = np.random.default_rng(seed)
+    means = v[rng.integers(0, len(v), size=(n_boot, len(v)))].mean(axis=1)
+    lo, hi = np.quantile(means, [alpha / 2, 1 - alpha / 2])
+    return float(lo), float(hi)
+
+
+# =========================
+# Many runs → report
+# =========================
+
+def runs_from_manifest(manifest_path):
+    """
+    Successful runs of a scenario_runner batch. The policy is the one recorded
+    in the run manifest (scenario "policy" field, else the net's file stem),
+    so every seed of the same network is grouped together.
+    """
+    batch = json.loads(Path(manifest_path).read_text(encoding="utf-8"))
+    runs = []
+    for r in batch["runs"]:
+        if r["status"] != "ok":
+            continue
+        runs.append({
+            "policy": r.get("policy") or sr.scenario_policy(r["scenario"]),
+            "seed": r["scenario"].get("seed"),
+            "detectors": r["outputs"]["detectors"],
+            "summary": r["outputs"]["summary"],
+        })
+    return runs
+
+
+def compare_runs(
+    runs,
+    baseline_detectors=BASELINE_DIR / "baseline_detector_output.xml",
+    baseline_summary=BASELINE_DIR / "baseline_summary.xml",
+    cache_dir=DEFAULT_CACHE_DIR,
+    n_boot=2000,
+):
+    """
+    runs: [{"policy", "seed", "detectors", "summary"}, ...]
+    Returns one row per policy: mean deltas vs baseline across seeds with
+    bootstrap CIs, ranked by travel-time delta (most negative = best).
+    """
+    if not runs:
+        print("No successful runs to compare.")
+        return pd.DataFrame(columns=["rank", "policy", "n_seeds"])
+    base = load_detector_arrays(baseline_detectors, cache_dir)
+    base_tt = so.summary_stats(baseline_summary)["mean_travel_time"]
+
+    rows = []
+    for r in runs:
+        row = {"policy": r["policy"], "seed": r.get("seed")}
+        if r.get("detectors") and Path(r["detectors"]).exists():
+            row.update(run_deltas(base, so.detector_arrays(r["detectors"])))
+        stats = so.summary_stats(r["summary"]) if r.get("summary") and Path(r["summary"]).exists() else None
+        tt = stats["mean_travel_time"] if stats else None
+        row["d_travel_time"] = tt - base_tt if tt is not None and base_tt is not None else np.nan
+        rows.append(row)
+    per_run = pd.DataFrame(rows)
+
+    report = []
+    for policy, g in per_run.groupby("policy", sort=False):
+        rec = {"policy": policy, "n_seeds": len(g)}
+        for col in [f"d_{m}" for m in METRICS] + ["d_travel_time"]:
+            if col not in g:
+                continue
+            rec[col] = g[col].mean()
+            rec[f"{col}_lo"], rec[f"{col}_hi"] = bootstrap_ci(g[col].to_numpy(), n_boot=n_boot)
+        report.append(rec)
+    report = pd.DataFrame(report).sort_values("d_travel_time", na_position="last").reset_index(drop=True)
+    report.insert(0, "rank", np.arange(1, len(report) + 1))
+    return report
+
+
+# =========================
+# CLI
+# =========================
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Rank policy runs against the baseline.")
+    ap.add_argument("manifests", nargs="+", help="scenario_runner batch manifest.json file(s)")
+    ap.add_argument("--baseline-detectors", default=str(BASELINE_DIR / "baseline_detector_output.xml"))
+    ap.add_argument("--baseline-summary", default=str(BASELINE_DIR / "baseline_summary.xml"))
+    ap.add_argument("--out", default=None, help="write the report table as CSV")
+    args = ap.parse_args()
+
+    runs = [r for m in args.manifests for r in runs_from_manifest(m)]
+    report = compare_runs(runs, args.baseline_detectors, args.baseline_summary)
+    print(report.round(3).to_string(index=False))
+    if args.out:
+        report.to_csv(args.out, index=False)
+        print(f"Report → {args.out}")
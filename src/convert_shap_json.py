@@ -1,5 +1,7 @@
 import json, numpy as np, pandas as pd, pathlib
+import profiling
 
+@profiling.traced(count=lambda p: len(p["local_explanations"]))
 def build_llm_json(
     shap_csv="shap_exports/shap_values.csv",
     features_csv=None,                 # e.g., "shap_exports/X_explain_sample.csv"
@@ -94,6 +96,7 @@ def build_llm_json(
             f.write(json.dumps(rec, ensure_ascii=False) + "\n")
 
     print(f"Wrote:\n- {out_json}\n- {out_jsonl}")
+    return pack
 
 # build_llm_json(
 #     shap_csv="shap_exports/shap_values.csv",
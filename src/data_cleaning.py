@@ -1,12 +1,17 @@
 import pandas as pd
 import numpy as np
 import os
+import warnings
+
+import profiling
 
 script_dir = os.path.dirname(os.path.abspath(__file__)) 
 
-def pre_processing_data() -> pd.DataFrame:
+@profiling.traced(count=len)
+def pre_processing_data(file_path=None) -> pd.DataFrame:
     # file_path = os.path.join(script_dir, "..", "data", "at-dataset", "Scats_Data.csv")
-    file_path = os.path.join(script_dir, "..", "data", "at-dataset", "SCATS-data", "Scats-Data.csv")
+    if file_path is None:
+        file_path = os.path.join(script_dir, "..", "data", "at-dataset", "SCATS-data", "Scats-Data.csv")
 
     df = pd.read_csv(file_path, sep="\t")
 
@@ -22,7 +27,13 @@ def pre_processing_data() -> pd.DataFrame:
     
     return df
 
-def interpolate_data(df: pd.DataFrame) -> pd.DataFrame:
+@profiling.traced(count=len)
+def interpolate_data(df: pd.DataFrame, spans: pd.DataFrame = None) -> pd.DataFrame:
+    # spans (from quality_scan): readings inside stuck / zero / outlier spans are
+    # treated as missing, and long gaps / stuck / zero stretches stay <NA> after
+    # interpolation instead of being filled across
+    if spans is not None:
+        df = df[~span_mask(df, spans, kinds=["zero", "stuck", "outlier"])]
     site_list = df['Detector_ID'].unique()
     full_time_index = pd.date_range(df["DateTime"].min(), df["DateTime"].max(), freq="h")
     main_df = pd.DataFrame()
@@ -63,13 +74,168 @@ def interpolate_data(df: pd.DataFrame) -> pd.DataFrame:
             df_lane_list = pd.concat([df_lane_list, interpolate_df], ignore_index=True)
 
         main_df = pd.concat([main_df, df_lane_list], ignore_index=True)
+    if spans is not None:
+        main_df.loc[span_mask(main_df, spans, kinds=["gap", "zero", "stuck"]), "Volume"] = pd.NA
     return main_df
 
+# =========================
+# Quality scan
+# =========================
+# All series are pivoted into one dense (series x hour) array, and every check
+# is a whole-array operation; gap / zero runs come from run-length encoding the
+# boolean flags row by row, stuck runs from the points where the value changes.
+
+QUALITY_DEFAULTS = {
+    "max_gap_hours": 6,    # longer gaps are left unfilled by interpolate_data
+    "zero_hours": 12,      # zero volume for at least this long → dead detector
+    "stuck_hours": 4,      # same non-zero volume for at least this long → stuck detector
+    "outlier_z": 6.0,      # robust z (median / MAD per series and hour of day)
+    "outlier_min_scale": 5.0,  # floor on the MAD scale (vehicles), so mostly-zero night hours
+                               # do not flag ordinary small counts
+}
+
+
+def _series_grid(df):
+    """Dense (S, T) hourly Volume array (NaN = no reading) plus series keys, time axis and row positions."""
+    t0 = df["DateTime"].min()
+    times = pd.date_range(t0, df["DateTime"].max(), freq="h")
+    step = (df["DateTime"] - t0) // pd.Timedelta(hours=1)
+    codes, keys = pd.MultiIndex.from_frame(df[["Detector_ID", "Lane"]]).factorize()
+    grid = np.full((len(keys), len(times)), np.nan)
+    grid[codes, step.to_numpy()] = pd.to_numeric(df["Volume"], errors="coerce").to_numpy(dtype=float)
+    return grid, keys, times, codes, step.to_numpy()
+
+
+def _runs(flags):
+    """Run-length encode each row of a bool array → (row, start, length) arrays of True runs."""
+    padded = np.zeros((flags.shape[0], flags.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = flags
+    d = np.diff(padded, axis=1)
+    rows, starts = np.nonzero(d == 1)
+    _, ends = np.nonzero(d == -1)   # same row-major order as the starts
+    return rows, starts, ends - starts
+
+
+def _value_runs(grid):
+    """Runs of one repeated non-zero reading per row → (row, start, length); a value change ends a run."""
+    change = np.ones(grid.shape, dtype=bool)
+    change[:, 1:] = grid[:, 1:] != grid[:, :-1]   # NaN != NaN, so missing hours split runs too
+    rows, starts = np.nonzero(change)
+    flat = rows * grid.shape[1] + starts          # every row opens with a run at column 0
+    lengths = np.diff(np.append(flat, grid.size))
+    value = grid[rows, starts]
+    keep = ~np.isnan(value) & (value != 0)
+    return rows[keep], starts[keep], lengths[keep]
+
+
+def _robust_z(grid, times, min_scale=QUALITY_DEFAULTS["outlier_min_scale"]):
+    """|x - median| / max(1.4826 MAD, min_scale) per series and hour of day."""
+    z = np.full(grid.shape, np.nan)
+    hours = times.hour.to_numpy()
+    with np.errstate(invalid="ignore", divide="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN slices
+        for h in range(24):
+            cols = grid[:, hours == h]
+            med = np.nanmedian(cols, axis=1, keepdims=True)
+            mad = 1.4826 * np.nanmedian(np.abs(cols - med), axis=1, keepdims=True)
+            z[:, hours == h] = np.abs(cols - med) / np.maximum(mad, min_scale)
+    return z
+
+
+@profiling.traced(count=lambda r: len(r[0]))
+def quality_scan(df: pd.DataFrame, **params):
+    """
+    Scan every (Detector_ID, Lane) series of pre_processing_data output at once.
+    Returns (report, spans):
+      report  one row per series — hours, missing share, gap / zero / stuck runs, outliers, bad share
+      spans   one row per flagged stretch — Detector_ID, Lane, kind (gap / zero / stuck / outlier),
+              start, end (inclusive), hours; long gaps only (see QUALITY_DEFAULTS)
+    """
+    cfg = {**QUALITY_DEFAULTS, **params}
+    grid, keys, times, _, _ = _series_grid(df)
+    missing = np.isnan(grid)
+
+    kinds = {
+        "gap": (_runs(missing), cfg["max_gap_hours"] + 1),
+        "zero": (_runs(grid == 0), cfg["zero_hours"]),
+        "stuck": (_value_runs(grid), cfg["stuck_hours"]),
+    }
+    bad = np.zeros_like(missing)
+    span_parts = []
+    report = pd.DataFrame(keys.to_list(), columns=["Detector_ID", "Lane"])
+    report["hours"] = len(times)
+    report["missing"] = missing.sum(axis=1)
+    report["missing_pct"] = (100 * report["missing"] / len(times)).round(2)
+
+    for kind, ((rows, starts, lengths), min_len) in kinds.items():
+        if kind == "gap":
+            longest = np.zeros(len(keys), dtype=int)
+            np.maximum.at(longest, rows, lengths)
+            report["all_gap_runs"] = np.bincount(rows, minlength=len(keys))
+            report["longest_gap"] = longest
+        keep = lengths >= min_len
+        rows, starts, lengths = rows[keep], starts[keep], lengths[keep]
+        report[f"{kind}_runs"] = np.bincount(rows, minlength=len(keys))
+        report[f"{kind}_hours"] = np.bincount(rows, weights=lengths, minlength=len(keys)).astype(int)
+        span_parts.append(pd.DataFrame({"row": rows, "kind": kind, "start_i": starts, "hours": lengths}))
+        # mark the runs in the mask: +1 at start, -1 after end, cumulative sum > 0
+        marks = np.zeros((len(keys), len(times) + 1), dtype=np.int32)
+        np.add.at(marks, (rows, starts), 1)
+        np.add.at(marks, (rows, starts + lengths), -1)
+        bad |= np.cumsum(marks[:, :-1], axis=1) > 0
+
+    z = _robust_z(grid, times, cfg["outlier_min_scale"])
+    outlier = z > cfg["outlier_z"]
+    report["outliers"] = outlier.sum(axis=1)
+    rows, cols = np.nonzero(outlier)
+    span_parts.append(pd.DataFrame({"row": rows, "kind": "outlier", "start_i": cols, "hours": 1}))
+    bad |= outlier
+    report["bad_pct"] = (100 * bad.sum(axis=1) / len(times)).round(2)
+
+    spans = pd.concat(span_parts, ignore_index=True)
+    spans.insert(0, "Lane", report["Lane"].to_numpy()[spans["row"]])
+    spans.insert(0, "Detector_ID", report["Detector_ID"].to_numpy()[spans["row"]])
+    spans["start"] = times[spans["start_i"]]
+    spans["end"] = times[spans["start_i"] + spans["hours"] - 1]
+    spans = spans.drop(columns=["row", "start_i"]).sort_values(["Detector_ID", "Lane", "start"], ignore_index=True)
+    return report, spans
+
+
+def span_mask(df: pd.DataFrame, spans: pd.DataFrame, kinds=None) -> np.ndarray:
+    """Boolean array over df rows: True where (Detector_ID, Lane, DateTime) falls in a span of `kinds`."""
+    if kinds is not None:
+        spans = spans[spans["kind"].isin(kinds)]
+    if spans.empty or df.empty:
+        return np.zeros(len(df), dtype=bool)
+    t0 = min(df["DateTime"].min(), spans["start"].min())
+    n_t = int((max(df["DateTime"].max(), spans["end"].max()) - t0) // pd.Timedelta(hours=1)) + 2
+    ids = pd.MultiIndex.from_frame(pd.concat([df[["Detector_ID", "Lane"]], spans[["Detector_ID", "Lane"]]]))
+    codes, keys = ids.factorize()
+    row_codes, span_codes = codes[:len(df)], codes[len(df):]
+
+    start = ((spans["start"] - t0) // pd.Timedelta(hours=1)).to_numpy()
+    end = ((spans["end"] - t0) // pd.Timedelta(hours=1)).to_numpy()
+    marks = np.zeros((len(keys), n_t), dtype=np.int32)
+    np.add.at(marks, (span_codes, start), 1)
+    np.add.at(marks, (span_codes, end + 1), -1)
+    covered = np.cumsum(marks, axis=1) > 0
+    return covered[row_codes, ((df["DateTime"] - t0) // pd.Timedelta(hours=1)).to_numpy()]
+
+
+def write_quality_report(report, spans, out_dir):
+    os.makedirs(out_dir, exist_ok=True)
+    report.to_csv(os.path.join(out_dir, "quality_report.csv"), index=False)
+    spans.to_csv(os.path.join(out_dir, "quality_spans.csv"), index=False)
+    print(f"Quality report: {int((report['bad_pct'] > 0).sum())}/{len(report)} series flagged → {out_dir}")
+
+
 if __name__ == "__main__":
     df = pd.DataFrame()
     main_df = pd.DataFrame()
     df = pre_processing_data()
-    main_df = interpolate_data(df)
+    report, spans = quality_scan(df)
+    write_quality_report(report, spans, os.path.join(script_dir, "..", "data", "at-dataset", "SCATS-data"))
+    main_df = interpolate_data(df, spans)
     file_path = os.path.join(script_dir, "..", "data", "at-dataset", "SCATS-data", "Scats-Data-Clean.csv")
     main_df.to_csv(file_path, index=False)
     print(f"---Data cleaned and stored in {file_path}---")
@@ -0,0 +1,224 @@
+# demand_generator.py — SUMO trips/flows from per-lane hourly volume forecasts
+import argparse
+import gzip
+import json
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import pandas as pd
+
+ROUTES_HEADER = ('<routes xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+                 'xsi:noNamespaceSchemaLocation="http://sumo.dlr.de/xsd/routes_file.xsd">\n')
+WRITE_CHUNK = 100_000
+
+
+# =========================
+# Network boundary
+# =========================
+
+def _open(path):
+    return gzip.open(path, "rb") if str(path).endswith(".gz") else open(path, "rb")
+
+
+def boundary_edges(net_file):
+    """
+    Entry edges (no incoming connection) and exit edges (no outgoing connection),
+    internal edges excluded. Same rule as the notebook's sumolib loop, without sumolib.
+    """
+    edges, has_in, has_out = [], set(), set()
+    with _open(net_file) as f:
+        for _, elem in ET.iterparse(f, events=("end",)):
+            if elem.tag == "edge" and elem.get("function") != "internal":
+                edges.append(elem.get("id"))
+            elif elem.tag == "connection" and not elem.get("from", "").startswith(":"):
+                has_out.add(elem.get("from"))
+                has_in.add(elem.get("to"))
+            if elem.tag in ("edge", "connection", "junction"):
+                elem.clear()
+    entries = [e for e in edges if e not in has_in]
+    exits = [e for e in edges if e not in has_out]
+    return entries, exits
+
+
+# =========================
+# Forecasts → entry-edge demand
+# =========================
+
+def forecast_volumes(model_path, lanes_df, start, hours=24):
+    """
+    Hourly volume forecast for every lane in lanes_df (Detector_ID, Lane, Direction)
+    over `hours` hours from `start`, in one batched model call.
+    Returns DateTime, Detector_ID, Lane, Volume.
+    """
+    import surrogate
+
+    times = pd.date_range(pd.Timestamp(start), periods=hours, freq="h")
+    X = pd.concat([surrogate.calendar_features(lanes_df, t) for t in times], ignore_index=True)
+    out = X[["Detector_ID", "Lane"]].copy()
+    out.insert(0, "DateTime", np.repeat(times, len(lanes_df)))
+    out["Volume"] = np.clip(surrogate.predict_lane_volumes(model_path, X), 0, None)
+    return out
+
+
+def entry_demand(forecast, lane_to_edge, entries, value_col="Volume", scale=1.0):
+    """
+    forecast: DateTime, Detector_ID, Lane, <value_col> (veh per hour per lane)
+    lane_to_edge: {"<Detector_ID>-<Lane>": entry_edge}, the SCATS "Detector" key format
+    Returns (hour_starts, matrix of expected vehicles per (hour, entry)).
+    """
+    key = forecast["Detector_ID"].astype(int).astype(str) + "-" + forecast["Lane"].astype(int).astype(str)
+    edge = key.map(lane_to_edge)
+    unmapped = edge.isna().sum()
+    if unmapped:
+        print(f"{unmapped} forecast rows have no entry edge and are ignored")
+    entry_idx = pd.Series(np.arange(len(entries)), index=entries)
+    col = edge.map(entry_idx)
+    keep = col.notna().to_numpy()
+
+    times = pd.to_datetime(forecast["DateTime"])
+    hour_starts = np.sort(times[keep].unique())
+    row = np.searchsorted(hour_starts, times[keep].to_numpy())
+    lam = np.zeros((len(hour_starts), len(entries)))
+    np.add.at(lam, (row, col[keep].astype(int).to_numpy()), forecast.loc[keep, value_col].to_numpy(float) * scale)
+    return hour_starts, lam
+
+
+def od_probabilities(entries, exits, forbidden_pairs=(), exit_weights=None):
+    """(n_entries, n_exits) destination probabilities with forbidden (from, to) pairs masked out."""
+    w = np.ones(len(exits)) if exit_weights is None else np.asarray(exit_weights, dtype=float)
+    allowed = np.ones((len(entries), len(exits)), dtype=bool)
+    e_idx = {e: i for i, e in enumerate(entries)}
+    x_idx = {x: i for i, x in enumerate(exits)}
+    for a, b in forbidden_pairs:
+        if a in e_idx and b in x_idx:
+            allowed[e_idx[a], x_idx[b]] = False
+    p = allowed * w[None, :]
+    total = p.sum(axis=1, keepdims=True)
+    if (total == 0).any():
+        bad = [entries[i] for i in np.flatnonzero(total[:, 0] == 0)]
+        raise ValueError(f"No allowed exit for entries: {bad}")
+    return p / total
+
+
+# =========================
+# Sampling + writing
+# =========================
+
+def sample_trips(lam, od_p, period=3600.0, seed=0, mode="poisson"):
+    """
+    Vectorized trip sampling. lam: expected vehicles per (hour, entry).
+    Returns depart (s, sorted), entry index, exit index.
+    """
+    rng = np.random.default_rng(seed)
+    counts = rng.poisson(lam) if mode == "poisson" else np.rint(lam).astype(int)
+    hours, ent = np.nonzero(counts)
+    n = counts[hours, ent]
+    hour_of = np.repeat(hours, n)
+    entry = np.repeat(ent, n)
+    depart = (hour_of + rng.random(len(entry))) * period
+
+    # one searchsorted over all entries: row e of the cumulative OD table is
+    # shifted into [e, e + 1], so u + e only lands in its own entry's row
+    n_exits = od_p.shape[1]
+    cum = np.cumsum(od_p, axis=1)
+    cum[:, -1] = 1.0
+    cum += np.arange(len(cum))[:, None]
+    u = rng.random(len(entry))
+    exit_ = np.searchsorted(cum.ravel(), u + entry, side="right") - entry * n_exits
+    np.clip(exit_, 0, n_exits - 1, out=exit_)
+
+    order = np.argsort(depart, kind="stable")
+    return depart[order], entry[order], exit_[order]
+
+
+def write_trips(path, depart, entry, exit_, entries, exits):
+    entries, exits = np.asarray(entries), np.asarray(exits)
+    frm, to = entries[entry], exits[exit_]
+    with open(path, "w", encoding="utf-8") as out:
+        out.write(ROUTES_HEADER)
+        for s in range(0, len(depart), WRITE_CHUNK):
+            sl = slice(s, s + WRITE_CHUNK)
+            out.write("".join(
+                f'    <trip id="{i}" depart="{d:.2f}" from="{a}" to="{b}"/>\n'
+                for i, d, a, b in zip(range(s, s + len(depart[sl])), depart[sl], frm[sl], to[sl])
+            ))
+        out.write("</routes>\n")
+    print(f"Generated {len(depart)} trips in {path}")
+
+
+def write_flows(path, lam, od_p, entries, exits, period=3600.0, min_rate=0.5):
+    """One <flow> per (hour, from, to) with vehsPerHour = demand × OD share."""
+    rate = lam[:, :, None] * od_p[None, :, :] * (3600.0 / period)
+    h, e, x = np.nonzero(rate >= min_rate)
+    entries, exits = np.asarray(entries), np.asarray(exits)
+    with open(path, "w", encoding="utf-8") as out:
+        out.write(ROUTES_HEADER)
+        for s in range(0, len(h), WRITE_CHUNK):
+            hh, ee, xx = h[s:s + WRITE_CHUNK], e[s:s + WRITE_CHUNK], x[s:s + WRITE_CHUNK]
+            out.write("".join(
+                f'    <flow id="f{i}" begin="{b:.0f}" end="{b + period:.0f}" '
+                f'from="{a}" to="{t}" vehsPerHour="{r:.2f}"/>\n'
+                for i, b, a, t, r in zip(range(s, s + len(hh)), hh * period, entries[ee], exits[xx], rate[hh, ee, xx])
+            ))
+        out.write("</routes>\n")
+    print(f"Generated {len(h)} flows in {path}")
+
+
+def generate_demand(
+    forecast,
+    lane_to_edge,
+    output_file,
+    net_file=None,
+    entries=None,
+    exits=None,
+    forbidden_pairs=(),
+    value_col="Volume",
+    scale=1.0,
+    kind="trips",
+    seed=0,
+):
+    """Forecast frame → SUMO <trip> or <flow> file. Entry/exit edges come from net_file if not given."""
+    if entries is None or exits is None:
+        net_entries, net_exits = boundary_edges(net_file)
+        entries = entries or net_entries
+        exits = exits or net_exits
+    _, lam = entry_demand(forecast, lane_to_edge, entries, value_col, scale)
+    od_p = od_probabilities(entries, exits, forbidden_pairs)
+    if kind == "flows":
+        write_flows(output_file, lam, od_p, entries, exits)
+    else:
+        write_trips(output_file, *sample_trips(lam, od_p, seed=seed), entries, exits)
+    return output_file
+
+
+# =========================
+# CLI
+# =========================
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Generate SUMO demand from hourly lane forecasts.")
+    ap.add_argument("forecast_csv", help="DateTime, Detector_ID, Lane, <value column>")
+    ap.add_argument("lane_map", help='JSON {"2906-4": "<entry edge id>", ...}')
+    ap.add_argument("output")
+    ap.add_argument("--net", default=None, help="net.xml(.gz) to find entry/exit edges")
+    ap.add_argument("--entries", nargs="*", default=None)
+    ap.add_argument("--exits", nargs="*", default=None)
+    ap.add_argument("--forbidden", default=None, help='JSON [["from", "to"], ...]')
+    ap.add_argument("--value-col", default="Volume")
+    ap.add_argument("--scale", type=float, default=1.0)
+    ap.add_argument("--kind", choices=["trips", "flows"], default="trips")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    with open(args.lane_map, "r", encoding="utf-8") as f:
+        lane_map = json.load(f)
+    forbidden = ()
+    if args.forbidden:
+        with open(args.forbidden, "r", encoding="utf-8") as f:
+            forbidden = {tuple(p) for p in json.load(f)}
+
+    generate_demand(
+        pd.read_csv(args.forecast_csv), lane_map, args.output, net_file=args.net,
+        entries=args.entries, exits=args.exits, forbidden_pairs=forbidden,
+        value_col=args.value_col, scale=args.scale, kind=args.kind, seed=args.seed,
+    )
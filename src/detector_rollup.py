@@ -0,0 +1,190 @@
+# detector_rollup.py — 1/5/15/60-minute rollups of E1 detector outputs, stored as columnar .npz
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import profiling
+import sumo_outputs as so
+
+DEFAULT_CACHE_DIR = Path("results") / "traffic_simulation_results" / ".cache"
+RESOLUTIONS = (60, 300, 900, 3600)  # seconds
+
+# =========================
+# Layout
+# =========================
+# One cube directory per detector output (keyed by its content hash):
+#   ids.npy          detector ids (loop_<edge>_<lane>), index = id code
+#   res-<s>.npz      one row per (id code, bin), sorted by id then time:
+#     id, begin                       int32 id code, bin start (s)
+#     n                               int32 intervals in the bin
+#     flow_sum, occupancy_sum         float64 sums over the n intervals
+#     speed_sum, speed_n              sum / int32 count over intervals with vehicles (speed >= 0)
+#     veh                             int32 nVehContrib total
+# Stored uncompressed: loading is a plain read, so queries stay in the
+# millisecond range even at 1-minute resolution. Every column is a sum or a count, so bins of any level (or several runs)
+# merge by adding rows with the same key; means are derived only on query.
+
+SUM_COLS = ("n", "flow_sum", "occupancy_sum", "speed_sum", "speed_n", "veh")
+COUNT_COLS = ("n", "speed_n", "veh")
+
+
+def _aggregate(codes, bins, cols):
+    """Sum `cols` per (code, bin) key. Returns key columns + summed columns, sorted by key."""
+    key = codes.astype(np.int64) << 32 | bins.astype(np.int64)
+    uniq, inv = np.unique(key, return_inverse=True)
+    out = {"id": (uniq >> 32).astype(np.int32), "bin": (uniq & 0xFFFFFFFF).astype(np.int64)}
+    for k, v in cols.items():
+        out[k] = np.bincount(inv, weights=v, minlength=len(uniq))
+    return out
+
+
+def rollup_arrays(arrays, resolutions=RESOLUTIONS):
+    """
+    detector_arrays output → (ids, {resolution: columns}). The finest level
+    is built from the raw intervals, every coarser one from the level below
+    by adding sums.
+    """
+    ids, codes = np.unique(arrays["id"], return_inverse=True)
+    valid = arrays["speed"] >= 0
+    cols = {
+        "n": np.ones(len(codes)),
+        "flow_sum": arrays["flow"],
+        "occupancy_sum": arrays["occupancy"],
+        "speed_sum": np.where(valid, arrays["speed"], 0.0),
+        "speed_n": valid.astype(float),
+        "veh": arrays["nVehContrib"],
+    }
+    begins = np.floor(arrays["begin"]).astype(np.int64)
+    levels = {}
+    for res in sorted(resolutions):
+        level = _aggregate(codes, begins // res, cols)
+        codes, begins = level["id"], level["bin"] * res
+        cols = {k: level[k] for k in SUM_COLS}
+        levels[res] = {"id": codes, "begin": begins.astype(np.int32),
+                       **{k: v.astype(np.int32) if k in COUNT_COLS else v for k, v in cols.items()}}
+    return ids, levels
+
+
+# =========================
+# Storage
+# =========================
+
+def cube_dir(detector_file, cache_dir=DEFAULT_CACHE_DIR):
+    from compare_runs import file_hash
+
+    return Path(cache_dir) / f"rollup-{file_hash(detector_file)}"
+
+
+@profiling.traced()
+def build_cube(detector_file, cache_dir=DEFAULT_CACHE_DIR, resolutions=RESOLUTIONS, force=False):
+    """Stream the detector output once and write every resolution; reuses an existing cube."""
+    out = cube_dir(detector_file, cache_dir)
+    if not force and all((out / f"res-{r}.npz").exists() for r in resolutions):
+        return out
+    ids, levels = rollup_arrays(so.detector_arrays(detector_file), resolutions)
+    out.mkdir(parents=True, exist_ok=True)
+    np.save(out / "ids.npy", ids)
+    for res, cols in levels.items():
+        np.savez(out / f"res-{res}.npz", **cols)
+    print(f"Rollup: {len(ids)} detectors × {len(levels)} resolutions → {out}")
+    return out
+
+
+def load_level(cube, resolution=300):
+    cube = Path(cube)
+    with np.load(cube / f"res-{resolution}.npz") as z:
+        cols = {k: z[k] for k in z.files}
+    return np.load(cube / "ids.npy"), cols
+
+
+# =========================
+# Queries
+# =========================
+
+def _lanes(ids):
+    """Lane index from loop_<edge>_<lane> ids (-1 if the id has no numeric suffix)."""
+    tail = np.char.rpartition(ids.astype(str), "_")[:, 2]
+    return np.array([int(t) if t.isdigit() else -1 for t in tail], dtype=np.int32)
+
+
+def _means(ids, cols, resolution):
+    n = cols["n"]
+    return pd.DataFrame({
+        "id": pd.Categorical.from_codes(cols["id"], ids),
+        "lane": _lanes(ids)[cols["id"]],
+        "begin": cols["begin"],
+        "end": cols["begin"] + resolution,
+        "n_intervals": n.astype(np.int32),
+        "flow": cols["flow_sum"] / n,
+        "occupancy": cols["occupancy_sum"] / n,
+        "speed": np.divide(cols["speed_sum"], cols["speed_n"],
+                           out=np.full(len(n), np.nan), where=cols["speed_n"] > 0),
+        "veh": cols["veh"].astype(np.int64),
+    })
+
+
+def query(cube, resolution=300, ids=None, begin=None, end=None):
+    """
+    Mean flow / speed / occupancy per detector and bin at one resolution,
+    optionally restricted to detector ids and a [begin, end) time window (s).
+    """
+    all_ids, cols = load_level(cube, resolution)
+    keep = np.ones(len(cols["id"]), dtype=bool)
+    if ids is not None:
+        keep &= np.isin(all_ids, list(ids))[cols["id"]]
+    if begin is not None:
+        keep &= cols["begin"] >= begin
+    if end is not None:
+        keep &= cols["begin"] < end
+    return _means(all_ids, {k: v[keep] for k, v in cols.items()}, resolution)
+
+
+def detector_totals(cube, resolution=3600):
+    """Whole-run mean per detector (the view main.parse_detectors gives), from any level."""
+    ids, cols = load_level(cube, resolution)
+    total = {k: np.bincount(cols["id"], weights=cols[k], minlength=len(ids)) for k in SUM_COLS}
+    total["id"] = np.arange(len(ids))
+    total["begin"] = np.zeros(len(ids), dtype=np.int32)
+    return _means(ids, total, 0).drop(columns=["begin", "end"])
+
+
+def merge_cubes(cubes, resolution=300):
+    """Add several runs' bins of one resolution (same key → summed), e.g. seeds of one policy."""
+    ids = np.unique(np.concatenate([load_level(c, resolution)[0] for c in cubes]))
+    codes, begins, cols = [], [], {k: [] for k in SUM_COLS}
+    for c in cubes:
+        own_ids, level = load_level(c, resolution)
+        codes.append(np.searchsorted(ids, own_ids)[level["id"]])
+        begins.append(level["begin"] // resolution)
+        for k in SUM_COLS:
+            cols[k].append(level[k])
+    merged = _aggregate(np.concatenate(codes), np.concatenate(begins), {k: np.concatenate(v) for k, v in cols.items()})
+    merged["begin"] = (merged.pop("bin") * resolution).astype(np.int32)
+    return _means(ids, merged, resolution)
+
+
+# =========================
+# CLI
+# =========================
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Roll an E1 detector output up to 1/5/15/60-minute bins.")
+    ap.add_argument("detectors", help="SUMO induction-loop output XML")
+    ap.add_argument("--cache-dir", default=str(DEFAULT_CACHE_DIR))
+    ap.add_argument("--resolution", type=int, choices=RESOLUTIONS, default=300, help="level to print / export")
+    ap.add_argument("--ids", nargs="*", default=None)
+    ap.add_argument("--out", default=None, help="write the queried level to CSV")
+    ap.add_argument("--force", action="store_true", help="rebuild even if the cube exists")
+    profiling.add_cli_args(ap)
+    args = ap.parse_args()
+    profiling.configure_from_args(args)
+
+    cube = build_cube(args.detectors, args.cache_dir, force=args.force)
+    df = query(cube, args.resolution, ids=args.ids)
+    if args.out:
+        df.to_csv(args.out, index=False)
+        print(f"{len(df)} rows → {args.out}")
+    else:
+        print(df.head(20).to_string(index=False))
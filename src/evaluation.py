@@ -0,0 +1,182 @@
+# evaluation.py — per-series MAE / RMSE / sMAPE over large splits, predicted and accumulated in chunks
+import argparse
+
+import numpy as np
+import pandas as pd
+
+import profiling
+
+TARGET = "Volume"
+TIME_COL = "DateTime"
+CHUNK_ROWS = 1 << 18
+
+# Groupings reported by default; "overall" is always added.
+LEVELS = {
+    "detector": ["Detector_ID"],
+    "lane": ["Detector_ID", "Lane"],
+    "hour": ["hour"],
+}
+
+# =========================
+# Accumulator
+# =========================
+# Per group only sufficient statistics are kept (n, Σ|e|, Σe², Σe, Σ sMAPE
+# term), so memory is O(groups) however many rows stream through. sMAPE uses
+# the same definition as xgboost_training.evaluate: 2|y−ŷ| / (|y|+|ŷ|), 0 when
+# both are 0.
+
+STATS = ("n", "abs_err", "sq_err", "err", "smape")
+
+
+class SeriesMetrics:
+    def __init__(self, by):
+        self.by = list(by)
+        self.keys = {}                       # group key tuple -> group id
+        self.sums = {k: np.zeros(0) for k in STATS}
+
+    def _codes(self, chunk):
+        """Global group id per row; new keys are registered as they appear."""
+        if not self.by:
+            return np.zeros(len(chunk), dtype=np.int64)
+        # factorize column by column and combine the codes (mixed radix), so
+        # key tuples are only built for the few distinct groups in the chunk
+        combined = np.zeros(len(chunk), dtype=np.int64)
+        values = []
+        for col in self.by:
+            codes, uniq = pd.factorize(chunk[col], use_na_sentinel=False)
+            combined = combined * len(uniq) + codes
+            values.append(uniq)
+        groups, local = np.unique(combined, return_inverse=True)
+        lookup = np.empty(len(groups), dtype=np.int64)
+        for i, g in enumerate(groups):
+            key = []
+            for uniq in reversed(values):
+                g, c = divmod(g, len(uniq))
+                key.append(uniq[c])
+            lookup[i] = self.keys.setdefault(tuple(reversed(key)), len(self.keys))
+        return lookup[local]
+
+    def update(self, chunk, y, pred):
+        codes = self._codes(chunk)
+        n_groups = max(len(self.keys), 1)
+        err = pred - y
+        denom = np.abs(y) + np.abs(pred)
+        terms = {
+            "n": None,
+            "abs_err": np.abs(err),
+            "sq_err": err * err,
+            "err": err,
+            "smape": np.divide(2 * np.abs(err), denom, out=np.zeros_like(denom), where=denom != 0),
+        }
+        for k, w in terms.items():
+            add = np.bincount(codes, weights=w, minlength=n_groups)
+            old = self.sums[k]
+            if len(old) < n_groups:
+                old = np.concatenate([old, np.zeros(n_groups - len(old))])
+            self.sums[k] = old + add
+
+    def table(self):
+        n = self.sums["n"]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out = pd.DataFrame({
+                "n": n.astype(np.int64),
+                "mae": self.sums["abs_err"] / n,
+                "rmse": np.sqrt(self.sums["sq_err"] / n),
+                "smape": self.sums["smape"] / n * 100,
+                "bias": self.sums["err"] / n,
+            })
+        if self.by:
+            keys = pd.DataFrame(list(self.keys), columns=self.by)
+            out = pd.concat([keys, out], axis=1).sort_values(self.by, ignore_index=True)
+        return out
+
+
+# =========================
+# Chunked evaluation
+# =========================
+
+def _predictor(model):
+    """Chunk → predictions; XGBRegressor / Booster via inplace_predict (no DMatrix copy)."""
+    booster = model.get_booster() if hasattr(model, "get_booster") else model
+    if hasattr(booster, "inplace_predict"):
+        return lambda X: np.asarray(booster.inplace_predict(X), dtype=np.float64)
+    return lambda X: np.asarray(model.predict(X), dtype=np.float64)
+
+
+def iter_chunks(df, chunk_rows=CHUNK_ROWS):
+    """A frame in fixed-size row slices, or pass an iterable of frames through unchanged."""
+    if isinstance(df, pd.DataFrame):
+        for start in range(0, len(df), chunk_rows):
+            yield df.iloc[start:start + chunk_rows]
+    else:
+        yield from df
+
+
+@profiling.traced(count=lambda t: int(t.loc[t["level"] == "overall", "n"].iloc[0]) if len(t) else 0)
+def evaluate_by_series(model, data, features, levels=None, chunk_rows=CHUNK_ROWS, target=TARGET):
+    """
+    MAE / RMSE / sMAPE / bias per group for every level in `levels`
+    ({name: key columns}, default LEVELS restricted to columns present),
+    plus one "overall" row. `data` is a feature frame (sliced into
+    chunk_rows) or an iterable of frames, e.g. make_features output per
+    detector. Categorical features must carry the training categories.
+    Returns one long table: level, key columns, n, mae, rmse, smape, bias.
+    """
+    predict = _predictor(model)
+    levels = dict(levels or LEVELS)
+    accs = None
+    for chunk in iter_chunks(data, chunk_rows):
+        if chunk.empty:
+            continue
+        if "hour" not in chunk.columns and TIME_COL in chunk.columns:
+            chunk = chunk.assign(hour=pd.to_datetime(chunk[TIME_COL]).dt.hour)
+        if accs is None:
+            levels = {k: v for k, v in levels.items() if all(c in chunk.columns for c in v)}
+            accs = {"overall": SeriesMetrics([]), **{k: SeriesMetrics(v) for k, v in levels.items()}}
+        y = chunk[target].to_numpy(dtype=np.float64)
+        pred = predict(chunk[features])
+        for acc in accs.values():
+            acc.update(chunk, y, pred)
+
+    if accs is None:
+        return pd.DataFrame(columns=["level", "n", "mae", "rmse", "smape", "bias"])
+    tables = [acc.table().assign(level=name) for name, acc in accs.items()]
+    out = pd.concat(tables, ignore_index=True)
+    key_cols = [c for c in out.columns if c not in ("level", *("n", "mae", "rmse", "smape", "bias"))]
+    for c in key_cols:
+        # levels without this column leave NaN, which turns integer ids into floats
+        vals = pd.to_numeric(out[c], errors="coerce")
+        if vals.notna().sum() == out[c].notna().sum() and (vals.dropna() % 1 == 0).all():
+            out[c] = vals.astype("Int64")
+    return out[["level", *key_cols, "n", "mae", "rmse", "smape", "bias"]]
+
+
+def summary_line(table):
+    o = table[table["level"] == "overall"].iloc[0]
+    return f"MAE={o['mae']:.2f}, RMSE={o['rmse']:.2f}, sMAPE={o['smape']:.2f}% over {int(o['n'])} rows"
+
+
+# =========================
+# CLI
+# =========================
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Per-detector / lane / hour accuracy of a model on a feature CSV.")
+    ap.add_argument("model", help="XGBoost model JSON")
+    ap.add_argument("features", help="make_features CSV")
+    ap.add_argument("--test-days", type=int, default=None, help="score only the last N days")
+    ap.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    ap.add_argument("--out", default="metrics_by_series.csv")
+    profiling.add_cli_args(ap)
+    args = ap.parse_args()
+    profiling.configure_from_args(args)
+
+    from model_update import load_features, load_regressor
+
+    df, features = load_features(args.features)
+    if args.test_days:
+        df = df[df[TIME_COL] > df[TIME_COL].max() - pd.Timedelta(days=args.test_days)]
+    table = evaluate_by_series(load_regressor(args.model), df, features, chunk_rows=args.chunk_rows)
+    table.to_csv(args.out, index=False)
+    print(summary_line(table))
+    print(f"{len(table)} rows → {args.out}")
@@ -0,0 +1,241 @@
+# forecasting.py — batched recursive H-hour forecasts for every (detector, lane) series at once
+import argparse
+
+import numpy as np
+import pandas as pd
+
+import profiling
+
+# =========================
+# Feature layout
+# =========================
+# Mirrors archive/xgboost_training.make_features: calendar + cyclical terms,
+# lag_k, roll_mean_w / roll_std_w over the previous w hours and the expanding
+# same-hour mean (hod_mean_past). Any other model feature (Direction, ...) is
+# taken per series from the last history row and held constant.
+
+ID_COLS = ["Detector_ID", "Lane"]
+TIME_COL = "DateTime"
+TARGET = "Volume"
+
+CALENDAR = {
+    "hour": lambda t: t.hour,
+    "dow": lambda t: t.dayofweek,
+    "dayofweek": lambda t: t.dayofweek,
+    "day": lambda t: t.day,
+    "month": lambda t: t.month,
+    "year": lambda t: t.year,
+    "is_weekend": lambda t: int(t.dayofweek >= 5),
+    "sin_hour": lambda t: np.sin(2 * np.pi * t.hour / 24),
+    "cos_hour": lambda t: np.cos(2 * np.pi * t.hour / 24),
+    "sin_dow": lambda t: np.sin(2 * np.pi * t.dayofweek / 7),
+    "cos_dow": lambda t: np.cos(2 * np.pi * t.dayofweek / 7),
+}
+
+
+def load_booster(model_path):
+    import xgboost as xgb
+
+    booster = xgb.Booster()
+    booster.load_model(model_path)
+    return booster
+
+
+def model_categories(booster):
+    """
+    Training categories stored in the model ({feature: values}), as XGBoost
+    >= 3.1 saves them. Empty for older models; pass them from the training
+    feature file instead (categories_from_features).
+    """
+    import json
+
+    model = json.loads(booster.save_raw("json"))["learner"]["gradient_booster"]["model"]
+    enc = model.get("cats", {}).get("enc", [])
+    out = {}
+    for name, col in zip(booster.feature_names or [], enc):
+        if not col.get("values"):
+            continue
+        if "offsets" in col:                                 # strings: utf-8 bytes + offsets
+            raw, offs = bytes(col["values"]), col["offsets"]
+            out[name] = [raw[a:b].decode("utf-8") for a, b in zip(offs[:-1], offs[1:])]
+        else:
+            out[name] = list(col["values"])
+    return out
+
+
+def categories_from_features(features_csv, cols=ID_COLS):
+    """Id categories of a training feature CSV, as make_features' astype("category") built them."""
+    ids = pd.read_csv(features_csv, usecols=cols)
+    return {c: ids[c].astype("category").cat.categories for c in cols}
+
+
+def _parse_window(name, prefix):
+    return int(name[len(prefix):]) if name.startswith(prefix) and name[len(prefix):].isdigit() else None
+
+
+def feature_plan(feature_names):
+    """Split the model's features into lag / rolling / hod / calendar / static groups (by column index)."""
+    plan = {"lag": [], "roll_mean": [], "roll_std": [], "hod": [], "calendar": [], "static": []}
+    for j, name in enumerate(feature_names):
+        if _parse_window(name, "lag_") is not None:
+            plan["lag"].append((j, _parse_window(name, "lag_")))
+        elif _parse_window(name, "roll_mean_") is not None:
+            plan["roll_mean"].append((j, _parse_window(name, "roll_mean_")))
+        elif _parse_window(name, "roll_std_") is not None:
+            plan["roll_std"].append((j, _parse_window(name, "roll_std_")))
+        elif name == "hod_mean_past":
+            plan["hod"].append(j)
+        elif name in CALENDAR:
+            plan["calendar"].append((j, CALENDAR[name]))
+        else:
+            plan["static"].append((j, name))
+    windows = [k for _, k in plan["lag"]] + [w for _, w in plan["roll_mean"] + plan["roll_std"]]
+    plan["lookback"] = max(windows, default=1)
+    return plan
+
+
+# =========================
+# State
+# =========================
+
+def series_state(history, lookback, categorical=(), categories=None):
+    """
+    Pivot the hourly history (DateTime, Detector_ID, Lane, Volume, ...) into
+    preallocated arrays:
+      keys        (S, 2) detector / lane per series
+      window      (S, lookback) last `lookback` hourly volumes, oldest first (NaN = missing)
+      hod_sum/cnt (S, 24) running same-hour sums for hod_mean_past
+      static      {col: (S,) last value}, categorical columns as training codes
+    Every categorical column needs its training categories in `categories`:
+    codes taken from the history alone would shift whenever it covers only
+    some of the training detectors.
+    """
+    df = history[[TIME_COL, *ID_COLS, TARGET]].copy()
+    df[TIME_COL] = pd.to_datetime(df[TIME_COL])
+    wide = df.pivot_table(index=TIME_COL, columns=ID_COLS, values=TARGET, aggfunc="mean")
+    wide = wide.reindex(pd.date_range(wide.index.min(), wide.index.max(), freq="h"))
+    values = wide.to_numpy(dtype=np.float64).T                      # (S, T)
+    keys = np.array(wide.columns.tolist())
+
+    window = np.full((len(keys), lookback), np.nan)
+    tail = values[:, -lookback:]
+    window[:, lookback - tail.shape[1]:] = tail
+
+    hours = wide.index.hour.to_numpy()
+    observed = ~np.isnan(values)
+    hod_sum = np.zeros((len(keys), 24))
+    hod_cnt = np.zeros((len(keys), 24))
+    for h in range(24):
+        cols = hours == h
+        hod_sum[:, h] = np.where(observed[:, cols], values[:, cols], 0).sum(axis=1)
+        hod_cnt[:, h] = observed[:, cols].sum(axis=1)
+
+    last = history.sort_values(TIME_COL).groupby(ID_COLS).tail(1).set_index(ID_COLS)
+    last = last.reindex(pd.MultiIndex.from_arrays(keys.T, names=ID_COLS))
+    static = {}
+    for col in set(last.columns) | set(ID_COLS):
+        vals = np.asarray(last.index.get_level_values(col) if col in ID_COLS else last[col])
+        if col in categorical:
+            vals = pd.Index((categories or {})[col]).get_indexer(vals).astype(np.float64)
+            vals[vals < 0] = np.nan
+        static[col] = vals
+    return {"keys": keys, "window": window, "hod_sum": hod_sum, "hod_cnt": hod_cnt,
+            "static": static, "last_time": wide.index[-1]}
+
+
+# =========================
+# Forecast loop
+# =========================
+
+@profiling.traced(count=lambda df: len(df))
+def forecast(model, history, horizon=24, categories=None, clip=True):
+    """
+    H-step recursive forecast for every series in `history` (cleaned hourly
+    SCATS rows). One booster.inplace_predict call per step covers all series;
+    lag / rolling / same-hour state is updated in place in NumPy arrays.
+    model: xgboost Booster or path. Categories of categorical features come
+    from `categories` ({col: training categories}) or else from the model;
+    without either the forecast is refused. Returns a long frame
+    DateTime, Detector_ID, Lane, step, Volume_pred.
+    """
+    booster = load_booster(model) if isinstance(model, str) else model
+    names = booster.feature_names
+    if not names:
+        raise ValueError("model has no feature names; train it from a DataFrame")
+    types = booster.feature_types or ["float"] * len(names)
+    categorical = {n for n, t in zip(names, types) if t == "c"}
+    plan = feature_plan(names)
+    categories = {**model_categories(booster), **(categories or {})}
+    unknown = sorted(c for c in categorical if categories.get(c) is None)
+    if unknown:
+        raise ValueError(f"no training categories for {unknown}; pass the training feature CSV (--features)")
+
+    state = series_state(history, plan["lookback"], categorical, categories)
+    missing = [name for _, name in plan["static"] if name not in state["static"]]
+    if missing:
+        raise KeyError(f"features not in history and not derivable: {missing}")
+
+    S, L = state["window"].shape
+    buf = np.empty((S, L + horizon))                      # lookback window + forecasts
+    buf[:, :L] = state["window"]
+    hod_sum, hod_cnt = state["hod_sum"], state["hod_cnt"]
+    X = np.empty((S, len(names)), dtype=np.float32)
+    for j, name in plan["static"]:
+        X[:, j] = state["static"][name]
+
+    times = pd.date_range(state["last_time"] + pd.Timedelta(hours=1), periods=horizon, freq="h")
+    for h, t in enumerate(times):
+        p = L + h                                         # column being predicted
+        for j, fn in plan["calendar"]:
+            X[:, j] = fn(t)
+        for j, k in plan["lag"]:
+            X[:, j] = buf[:, p - k]
+        for j, w in plan["roll_mean"]:
+            X[:, j] = buf[:, p - w:p].mean(axis=1)
+        for j, w in plan["roll_std"]:
+            X[:, j] = buf[:, p - w:p].std(axis=1, ddof=1)
+        if plan["hod"]:
+            with np.errstate(invalid="ignore", divide="ignore"):
+                X[:, plan["hod"][0]] = hod_sum[:, t.hour] / hod_cnt[:, t.hour]
+
+        y = booster.inplace_predict(X)
+        if clip:
+            y = np.maximum(y, 0)
+        buf[:, p] = y
+        hod_sum[:, t.hour] += y
+        hod_cnt[:, t.hour] += 1
+
+    preds = buf[:, L:]
+    return pd.DataFrame({
+        TIME_COL: np.tile(times, S),
+        "Detector_ID": np.repeat(state["keys"][:, 0], horizon),
+        "Lane": np.repeat(state["keys"][:, 1], horizon),
+        "step": np.tile(np.arange(1, horizon + 1), S),
+        "Volume_pred": preds.ravel(),
+    })
+
+
+# =========================
+# CLI
+# =========================
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Recursive multi-hour forecast for all detector lanes.")
+    ap.add_argument("model", help="XGBoost model JSON")
+    ap.add_argument("history", help="cleaned hourly CSV (DateTime, Detector_ID, Lane, Volume, ...)")
+    ap.add_argument("--horizon", type=int, default=24)
+    ap.add_argument("--detectors", type=int, nargs="*", default=None)
+    ap.add_argument("--features", default=None,
+                    help="training feature CSV for the id categories (needed if the model does not store them)")
+    ap.add_argument("--out", default="forecast.csv")
+    profiling.add_cli_args(ap)
+    args = ap.parse_args()
+    profiling.configure_from_args(args)
+
+    hist = pd.read_csv(args.history, parse_dates=[TIME_COL])
+    if args.detectors:
+        hist = hist[hist["Detector_ID"].isin(args.detectors)]
+    cats = categories_from_features(args.features) if args.features else None
+    out = forecast(args.model, hist, horizon=args.horizon, categories=cats)
+    out.to_csv(args.out, index=False)
+    print(f"{out['Detector_ID'].nunique()} detectors, {len(out) // args.horizon} series × {args.horizon} h → {args.out}")
@@ -0,0 +1,343 @@
+# hotspots.py — vectorized congestion hotspot ranking, grid clustering and a single-file Leaflet map
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import profiling
+
+OUT_DIR = Path("results") / "heatmap"
+PEAK_HOURS = (7, 8, 9, 15, 16, 17, 18)
+PER_LANE_CAPACITY = 200      # veh/h per active lane, as in the training notebook
+CONGESTED_UTIL = 0.85
+SEVERITY = [(1.0, "Severe", "red"), (0.85, "High", "orange"), (0.60, "Moderate", "yellow"), (0.0, "Free", "green")]
+SIM_LEVEL_SCORE = {"High": 1.0, "Moderate": 0.5, "Low": 0.0}
+
+# score = Σ weight · component, every component scaled to [0, 1]
+DEFAULT_WEIGHTS = {
+    "util": 0.45,        # util_95 / 1.2, clipped
+    "hours": 0.25,       # share of peak hours at util >= CONGESTED_UTIL
+    "residual": 0.15,    # demand above prediction: mean positive residual / capacity
+    "sim": 0.15,         # congestion_level from main.parse_detectors (SUMO loops mapped to sites)
+}
+
+
+# =========================
+# Site KPIs
+# =========================
+
+@profiling.traced(count=len)
+def site_kpis(pred, pred_col="y_hat", actual_col="Volume", per_lane_capacity=PER_LANE_CAPACITY,
+              peak_hours=PEAK_HOURS):
+    """
+    Per-site peak-hour utilisation from lane-level rows (Detector_ID, Lane,
+    DateTime, <pred_col>[, <actual_col>]), with the notebook's definitions:
+    capacity = 95th-pct active lanes × per_lane_capacity, util_95 / util_avg /
+    congested_hours over the peak hours of the day. Site volume is summed over
+    lanes per (day, hour) and then averaged over days, so util stays in veh/h
+    whatever the length of the period (the notebook summed one test day).
+    """
+    t = pd.to_datetime(pred["DateTime"])
+    hour = t.dt.hour.to_numpy()
+    peak = np.isin(hour, peak_hours)
+    vol = pred[pred_col].to_numpy(dtype=float)[peak]
+    df = pd.DataFrame({
+        "Detector_ID": pred["Detector_ID"].to_numpy()[peak],
+        "day": t.dt.normalize().to_numpy()[peak],
+        "hour": hour[peak],
+        "vol": vol,
+        "active": vol > 0,
+    })
+    has_actual = actual_col in pred.columns
+    if has_actual:
+        df["resid"] = pred[actual_col].to_numpy(dtype=float)[peak] - vol
+
+    sums = {"vol": "sum", "active": "sum", **({"resid": "sum"} if has_actual else {})}
+    daily = df.groupby(["Detector_ID", "day", "hour"], sort=False).agg(sums).reset_index()
+    lanes = (daily.groupby("Detector_ID")["active"].quantile(0.95)
+             .round().clip(lower=1).astype(int).rename("n_lanes_eff"))
+    site_hour = (daily.groupby(["Detector_ID", "hour"])
+                 .agg(site_volume=("vol", "mean"), **({"resid": ("resid", "mean")} if has_actual else {}))
+                 .reset_index().join(lanes, on="Detector_ID"))
+    site_hour["capacity"] = site_hour["n_lanes_eff"] * per_lane_capacity
+    site_hour["util"] = site_hour["site_volume"] / site_hour["capacity"]
+    site_hour["congested"] = site_hour["util"] >= CONGESTED_UTIL
+
+    by = site_hour.groupby("Detector_ID")
+    kpi = pd.DataFrame({
+        "util_95": by["util"].quantile(0.95),
+        "util_avg": by["util"].mean(),
+        "congested_hours": by["congested"].sum().astype(int),
+        "peak_hours": by["util"].size(),
+        "site_capacity": by["capacity"].first(),
+        "peak_volume": by["site_volume"].mean(),
+    })
+    if has_actual:
+        kpi["residual"] = by["resid"].mean()  # actual − predicted site volume (veh/h), same scale as util
+    return kpi.reset_index()
+
+
+def shap_drivers(shap_values, detector_ids, k=1):
+    """Top-k features by mean |SHAP| per site (vectorized groupby over the whole matrix)."""
+    mean_abs = shap_values.abs().groupby(np.asarray(detector_ids)).mean()
+    share = mean_abs.div(mean_abs.sum(axis=1), axis=0)
+    order = np.argsort(-mean_abs.to_numpy(), axis=1)[:, :k]
+    cols = np.asarray(mean_abs.columns)
+    out = pd.DataFrame({"Detector_ID": mean_abs.index})
+    out["top_driver"] = cols[order[:, 0]]
+    out["driver_share"] = share.to_numpy()[np.arange(len(order)), order[:, 0]]
+    if k > 1:
+        out["drivers"] = [", ".join(row) for row in cols[order]]
+    return out
+
+
+def sim_congestion(detector_records, loop_sites):
+    """
+    parse_detectors output ([{id, congestion_level, ...}]) → per-site score,
+    using loop_sites {SUMO loop id: Detector_ID}; the worst loop per site wins.
+    """
+    df = pd.DataFrame(detector_records)
+    df["Detector_ID"] = df["id"].map(loop_sites)
+    df["sim_score"] = df["congestion_level"].astype(str).map(SIM_LEVEL_SCORE)
+    return df.dropna(subset=["Detector_ID", "sim_score"]).groupby("Detector_ID", as_index=False)["sim_score"].max()
+
+
+# =========================
+# Scoring
+# =========================
+
+@profiling.traced(count=len)
+def score_sites(kpi, sites, drivers=None, sim=None, weights=None):
+    """
+    Join KPIs with coordinates (sites: Detector_ID, Latitude, Longitude) and
+    optional SHAP drivers / simulation scores; add score, severity, rank.
+    Missing components count as 0 and their weight is dropped.
+    """
+    w = dict(DEFAULT_WEIGHTS, **(weights or {}))
+    df = kpi.merge(sites.rename(columns={"Latitude": "lat", "Longitude": "lon"})[["Detector_ID", "lat", "lon"]],
+                   on="Detector_ID", how="inner")
+    if drivers is not None:
+        df = df.merge(drivers, on="Detector_ID", how="left")
+    if sim is not None:
+        df = df.merge(sim, on="Detector_ID", how="left")
+
+    comp = {
+        "util": np.clip(df["util_95"].to_numpy() / 1.2, 0, 1),
+        "hours": df["congested_hours"].to_numpy() / np.maximum(df["peak_hours"].to_numpy(), 1),
+    }
+    if "residual" in df:
+        comp["residual"] = np.clip(df["residual"].fillna(0).to_numpy() / df["site_capacity"].to_numpy(), 0, 1)
+    if "sim_score" in df:
+        comp["sim"] = df["sim_score"].fillna(0).to_numpy()
+    total_w = sum(w[k] for k in comp)
+    df["score"] = sum(w[k] * v for k, v in comp.items()) / total_w
+
+    u = df["util_95"].to_numpy()
+    df["severity"] = np.select([u >= t for t, _, _ in SEVERITY], [s for _, s, _ in SEVERITY], "Free")
+    df = df.sort_values(["score", "congested_hours"], ascending=False, ignore_index=True)
+    df["rank"] = np.arange(1, len(df) + 1)
+    return df
+
+
+# =========================
+# Grid clustering
+# =========================
+
+def _local_xy(lat, lon):
+    """Equirectangular metres around the mean latitude (good enough at city/region scale)."""
+    lat0 = np.deg2rad(np.nanmean(lat))
+    return np.deg2rad(lon) * 6371000 * np.cos(lat0), np.deg2rad(lat) * 6371000
+
+
+def grid_clusters(df, cell_m=400.0, min_score=0.5):
+    """
+    Cluster hotspots (score >= min_score): sites share a cluster when their
+    grid cells touch (8-neighbourhood). Adds `cluster` (-1 = not a hotspot)
+    to df and returns per-cluster summaries.
+    """
+    df = df.copy()
+    df["cluster"] = -1
+    hot = df["score"].to_numpy() >= min_score
+    if not hot.any():
+        return df, pd.DataFrame(columns=["cluster", "n_sites", "max_score", "lat", "lon", "sites"])
+
+    x, y = _local_xy(df["lat"].to_numpy()[hot], df["lon"].to_numpy()[hot])
+    ij = np.floor(np.column_stack([x, y]) / cell_m).astype(np.int64)
+    cells, cell_of = np.unique(ij, axis=0, return_inverse=True)
+    cell_of = cell_of.ravel()
+
+    # union-find over occupied cells only
+    parent = np.arange(len(cells))
+
+    def find(a):
+        while parent[a] != a:
+            parent[a] = parent[parent[a]]
+            a = parent[a]
+        return a
+
+    index = {tuple(c): n for n, c in enumerate(cells)}
+    for n, (ci, cj) in enumerate(cells):
+        for di, dj in ((1, -1), (1, 0), (1, 1), (0, 1)):   # each touching pair visited once
+            m = index.get((ci + di, cj + dj))
+            if m is not None:
+                ra, rb = find(n), find(m)
+                if ra != rb:
+                    parent[max(ra, rb)] = min(ra, rb)
+    roots = np.array([find(n) for n in range(len(cells))])
+    _, cluster_of_cell = np.unique(roots, return_inverse=True)
+    df.loc[hot, "cluster"] = cluster_of_cell[cell_of]
+
+    h = df[hot]
+    wsum = h.groupby("cluster")["score"].sum()
+    clusters = pd.DataFrame({
+        "n_sites": h.groupby("cluster").size(),
+        "max_score": h.groupby("cluster")["score"].max(),
+        "lat": (h["lat"] * h["score"]).groupby(h["cluster"]).sum() / wsum,
+        "lon": (h["lon"] * h["score"]).groupby(h["cluster"]).sum() / wsum,
+        "sites": h.groupby("cluster")["Detector_ID"].agg(lambda s: " ".join(map(str, s))),
+    }).reset_index().sort_values("max_score", ascending=False, ignore_index=True)
+    return df, clusters
+
+
+def heat_bins(df, cell_m=150.0, value="score"):
+    """Pre-aggregated heat layer: one [lat, lon, weight] per occupied grid cell (max weight)."""
+    x, y = _local_xy(df["lat"].to_numpy(), df["lon"].to_numpy())
+    ij = np.floor(np.column_stack([x, y]) / cell_m).astype(np.int64)
+    _, inv = np.unique(ij, axis=0, return_inverse=True)
+    inv = inv.ravel()
+    n = np.bincount(inv)
+    lat = np.bincount(inv, weights=df["lat"].to_numpy()) / n
+    lon = np.bincount(inv, weights=df["lon"].to_numpy()) / n
+    weight = np.zeros(len(n))
+    np.maximum.at(weight, inv, df[value].to_numpy())
+    return np.round(np.column_stack([lat, lon, weight]), 5).tolist()
+
+
+# =========================
+# Rendering
+# =========================
+
+_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"/><title>__TITLE__</title>
+<meta name="viewport" content="width=device-width, initial-scale=1.0"/>
+<link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/leaflet@1.9.3/dist/leaflet.css"/>
+<script src="https://cdn.jsdelivr.net/npm/leaflet@1.9.3/dist/leaflet.js"></script>
+<script src="https://cdn.jsdelivr.net/npm/leaflet.heat@0.2.0/dist/leaflet-heat.js"></script>
+<style>html,body,#map{height:100%;margin:0}.lbl{font:600 11px sans-serif;background:rgba(255,255,255,.7);padding:1px 3px;border-radius:3px;border:0;box-shadow:none}</style>
+</head><body><div id="map"></div><script>
+const DATA = __DATA__;
+const COLORS = {Severe: "red", High: "orange", Moderate: "yellow", Free: "green"};
+const map = L.map("map", {preferCanvas: true});
+L.tileLayer("https://{s}.basemaps.cartocdn.com/dark_all/{z}/{x}/{y}{r}.png",
+  {attribution: "&copy; OpenStreetMap &copy; CARTO", maxZoom: 19}).addTo(map);
+const heat = L.heatLayer(DATA.heat, {radius: 18, max: 1});
+const sites = L.geoJSON(DATA.sites, {
+  pointToLayer: (f, ll) => L.circleMarker(ll, {radius: 4 + 10 * Math.min(f.properties.u, 1.2),
+    color: COLORS[f.properties.sev], fillOpacity: 0.8, weight: 2}),
+  onEachFeature: (f, layer) => layer.bindPopup(() => {
+    const p = f.properties;
+    return `Site ${p.id} (#${p.rank})<br>score: ${p.s}<br>util_95: ${p.u}<br>congested_hours: ${p.h}` +
+           (p.drv ? `<br>driver: ${p.drv}` : "") + (p.c >= 0 ? `<br>cluster: ${p.c}` : "");
+  }),
+});
+const clusters = L.geoJSON(DATA.clusters, {
+  pointToLayer: (f, ll) => L.circle(ll, {radius: 150 + 60 * f.properties.n, color: "#fff", weight: 1, fill: false})
+    .bindTooltip(`${f.properties.n} sites`, {className: "lbl"}),
+});
+heat.addTo(map); sites.addTo(map); clusters.addTo(map);
+L.control.layers(null, {"Heat": heat, "Sites": sites, "Clusters": clusters}).addTo(map);
+map.fitBounds(sites.getBounds(), {padding: [20, 20]});
+</script></body></html>
+"""
+
+
+def _features(points, props):
+    return [{"type": "Feature", "geometry": {"type": "Point", "coordinates": [lon, lat]}, "properties": p}
+            for (lat, lon), p in zip(points, props)]
+
+
+@profiling.traced(count=len)
+def render_map(df, clusters, out_html, heat_cell_m=150.0, title="Congestion hotspots"):
+    """One self-contained HTML: all sites in one GeoJSON layer, clusters, pre-binned heat layer."""
+    r = df.round({"lat": 5, "lon": 5, "score": 3, "util_95": 2})
+    props = pd.DataFrame({"id": r["Detector_ID"], "rank": r["rank"], "s": r["score"], "u": r["util_95"],
+                          "h": r["congested_hours"], "sev": r["severity"], "c": r["cluster"]})
+    if "top_driver" in r:
+        props["drv"] = r["top_driver"].fillna("")
+    data = {
+        "sites": {"type": "FeatureCollection",
+                  "features": _features(r[["lat", "lon"]].to_numpy().tolist(), props.to_dict("records"))},
+        "clusters": {"type": "FeatureCollection",
+                     "features": _features(clusters[["lat", "lon"]].round(5).to_numpy().tolist(),
+                                           [{"n": int(n)} for n in clusters["n_sites"]])},
+        "heat": heat_bins(df, heat_cell_m),
+    }
+    out_html = Path(out_html)
+    out_html.parent.mkdir(parents=True, exist_ok=True)
+    page = _PAGE.replace("__TITLE__", title).replace("__DATA__", json.dumps(data, separators=(",", ":"), default=str))
+    out_html.write_text(page, encoding="utf-8")
+    print(f"Hotspot map: {len(df)} sites, {len(clusters)} clusters, {len(data['heat'])} heat bins "
+          f"→ {out_html} ({out_html.stat().st_size / 1024:.0f} KB)")
+    return out_html
+
+
+# =========================
+# End to end
+# =========================
+
+def rank_hotspots(pred_csv, sites_csv, pred_col="y_hat", shap_values=None, shap_features=None,
+                  sim_detectors=None, loop_sites=None, cluster_m=400.0, min_score=0.5,
+                  out=OUT_DIR / "hotspots_map.html", out_csv=OUT_DIR / "hotspots.csv"):
+    """
+    predictions.csv of the shap stage (Detector_ID, Lane, DateTime, y_hat, Volume)
+    → ranked sites CSV + map. SHAP drivers need shap_values.csv with the
+    features.csv written next to it (same rows); the simulation component needs
+    a SUMO detector output plus a JSON {loop id: Detector_ID}.
+    """
+    kpi = site_kpis(pd.read_csv(pred_csv), pred_col=pred_col)
+    drivers = sim = None
+    if shap_values and shap_features:
+        shap_df = pd.read_csv(shap_values, index_col=0)
+        ids = pd.read_csv(shap_features, usecols=["Detector_ID"])["Detector_ID"].to_numpy()
+        drivers = shap_drivers(shap_df, ids)
+    if sim_detectors and loop_sites:
+        import main
+
+        sim = sim_congestion(main.parse_detectors(sim_detectors),
+                             json.loads(Path(loop_sites).read_text(encoding="utf-8")))
+    ranked = score_sites(kpi, pd.read_csv(sites_csv), drivers, sim)
+    ranked, clusters = grid_clusters(ranked, cluster_m, min_score)
+    Path(out_csv).parent.mkdir(parents=True, exist_ok=True)
+    ranked.to_csv(out_csv, index=False)
+    render_map(ranked, clusters, out)
+    return ranked
+
+
+# =========================
+# CLI
+# =========================
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Rank congestion hotspots and render the hotspot map.")
+    ap.add_argument("pred", help="predictions.csv from the shap stage (Detector_ID, Lane, DateTime, y_hat, Volume)")
+    ap.add_argument("sites", help="Site-List-Coordinates.csv (Detector_ID, Latitude, Longitude)")
+    ap.add_argument("--pred-col", default="y_hat")
+    ap.add_argument("--shap-values", default=None, help="shap_values.csv (same rows as --shap-features)")
+    ap.add_argument("--shap-features", default=None, help="features.csv from the shap stage (has Detector_ID)")
+    ap.add_argument("--sim-detectors", default=None, help="SUMO detector output for congestion levels")
+    ap.add_argument("--loop-sites", default=None, help="JSON {loop id: Detector_ID} for --sim-detectors")
+    ap.add_argument("--cluster-m", type=float, default=400.0)
+    ap.add_argument("--min-score", type=float, default=0.5)
+    ap.add_argument("--out", default=str(OUT_DIR / "hotspots_map.html"))
+    ap.add_argument("--out-csv", default=str(OUT_DIR / "hotspots.csv"))
+    profiling.add_cli_args(ap)
+    args = ap.parse_args()
+    profiling.configure_from_args(args)
+
+    ranked = rank_hotspots(args.pred, args.sites, args.pred_col, args.shap_values, args.shap_features,
+                           args.sim_detectors, args.loop_sites, args.cluster_m, args.min_score,
+                           args.out, args.out_csv)
+    print(ranked[["rank", "Detector_ID", "score", "util_95", "congested_hours", "severity", "cluster"]]
+          .head(10).to_string(index=False))
@@ -0,0 +1,122 @@
+# llm_stream.py — incremental parsing of the policy JSON while the LLM is still answering
+import json
+
+# The policy response is one JSON object (see main.build_prompt):
+#   {"reasoning": [...], "actions": [{...}, ...], "modified_snippets": ["<tlLogic ...>", ...]}
+# ActionStreamParser is fed raw text chunks and emits ("actions", dict) and
+# ("modified_snippets", str) events as soon as each array element is complete,
+# so a snippet can be validated and merged before the rest has arrived.
+STREAM_KEYS = ("actions", "modified_snippets")
+
+
+class ActionStreamParser:
+    """
+    Character-level JSON tokenizer that only tracks what it needs: nesting
+    depth, string/escape state and the current top-level key. Anything before
+    the first "{" (```json fences, prose) is skipped. An element that fails to
+    decode is reported as ("error", {"key", "raw", "error"}) instead of
+    stopping the stream.
+    """
+
+    def __init__(self, keys=STREAM_KEYS):
+        self.keys = set(keys)
+        self.stack = []            # open containers: "{" or "["
+        self.in_string = False
+        self.escape = False
+        self.expect_key = False    # next string in the top-level object is a key
+        self.key_buf = None        # characters of the top-level key being read
+        self.key = None            # last completed top-level key
+        self.capture_key = None    # key whose array elements are being captured
+        self.elem = None           # characters of the element being captured
+        self.done = False
+
+    def feed(self, chunk):
+        """Consume a text chunk; returns the list of events it completed."""
+        events = []
+        for ch in chunk:
+            if self.done:
+                break
+            self._step(ch, events)
+        return events
+
+    def _finish_elem(self, events):
+        raw = "".join(self.elem)
+        self.elem = None
+        try:
+            events.append((self.capture_key, json.loads(raw)))
+        except json.JSONDecodeError as e:
+            events.append(("error", {"key": self.capture_key, "raw": raw, "error": str(e)}))
+
+    def _step(self, ch, events):
+        depth = len(self.stack)
+        if self.elem is not None:
+            self.elem.append(ch)
+
+        if self.in_string:
+            if self.key_buf is not None and not self.escape and ch != '"':
+                self.key_buf.append(ch)
+            if self.escape:
+                self.escape = False
+            elif ch == "\\":
+                self.escape = True
+            elif ch == '"':
+                self.in_string = False
+                if self.key_buf is not None:
+                    self.key = "".join(self.key_buf)
+                    self.key_buf = None
+                elif self.elem is not None and depth == 2:
+                    self._finish_elem(events)  # string element, e.g. one snippet
+            return
+
+        if ch == '"':
+            self.in_string = True
+            if depth == 1 and self.expect_key:
+                self.key_buf = []
+                self.expect_key = False
+            elif depth == 2 and self.capture_key and self.elem is None:
+                self.elem = [ch]
+        elif ch in "{[":
+            if depth == 2 and self.capture_key and self.elem is None:
+                self.elem = [ch]
+            self.stack.append(ch)
+            if depth == 0:
+                self.expect_key = ch == "{"
+            elif depth == 1 and ch == "[" and self.key in self.keys:
+                self.capture_key = self.key
+        elif ch in "}]":
+            if not self.stack:
+                return
+            self.stack.pop()
+            depth = len(self.stack)
+            if depth == 2 and self.elem is not None:
+                self._finish_elem(events)
+            elif depth == 1:
+                self.capture_key = None
+            elif depth == 0:
+                self.done = True
+        elif ch == "," and depth == 1:
+            self.expect_key = True
+
+
+def iter_events(chunks, raw=None, keys=STREAM_KEYS):
+    """
+    Parse an iterable of text chunks (e.g. streamed completion deltas) and yield
+    (key, value) events as elements complete. Every chunk is appended to `raw`
+    (a list) when given, so the full response can still be saved afterwards.
+    """
+    parser = ActionStreamParser(keys)
+    for chunk in chunks:
+        if not chunk:
+            continue
+        if raw is not None:
+            raw.append(chunk)
+        yield from parser.feed(chunk)
+
+
+def salvage(text, keys=STREAM_KEYS):
+    """Complete actions / snippets from a truncated or malformed response (None if there are none)."""
+    out = {k: [] for k in keys}
+    for key, value in iter_events([text], keys=keys):
+        if key in out:
+            out[key].append(value)
+    return out if any(out.values()) else None
@@ -1,17 +1,20 @@
 import datetime
 import json
-import textwrap
-from openai import OpenAI
-import dotenv
+import os
+import time
 import xml.etree.ElementTree as ET
+from types import SimpleNamespace
 import pandas as pd
 import convert_shap_json as csj
-
-apikey = dotenv.get_key('.env', 'OPENAI_API_KEY')
+import llm_stream
+import modified_network as mn
+import profiling
+import prompt_assembler as pa
 
 # ------------------------------------------------------------
 # 1. Network parser -> summarized JSON for context
 # ------------------------------------------------------------
+@profiling.traced(count=lambda r: r["summary"]["total_edges"] + r["summary"]["total_junctions"])
 def parse_network(file):
     print("Parsing network structure...")
     tree = ET.parse(file)
@@ -52,6 +55,7 @@ def parse_network(file):
     return {"summary": summary, "edges": edges[:10], "junctions": junctions}  # trim for token limit
 
 
+@profiling.traced(count=len)
 def parse_detectors(file):
     tree = ET.parse(file)
     root = tree.getroot()
@@ -76,6 +80,7 @@ def parse_detectors(file):
     )
     return summary.to_dict(orient="records")
 
+@profiling.traced(count=lambda r: r["simulation_steps"])
 def parse_summary(file):
     tree = ET.parse(file)
     root = tree.getroot()
@@ -98,94 +103,19 @@ def parse_summary(file):
 # ------------------------------------------------------------
 # 2. Build COT JSON prompt
 # ------------------------------------------------------------
-def build_prompt(network_info, detector_info, summary_info, context_info, network_text):
-    schema_hint = json.dumps({
-        "reasoning": [
-            {
-                "edge_or_junction_id": "string",
-                "issue_detected": "string",
-                "proposed_policy": "string",
-                "justification": "string"
-            }
-        ],
-        "actions": [
-            {
-                "type": "update_attribute or create_element",
-                "target": "edge/junction/tlLogic",
-                "id": "string",
-                "attribute": "string (optional)",
-                "new_value": "string (for updates)",
-                "xml_snippet": "string (for new tlLogic creation)"
-            }
-        ],
-        "modified_snippets": [
-            "<edge ...>...</edge>",
-            "<junction ...>...</junction>",
-            "<tlLogic ...>...</tlLogic>"
-        ]
-    }, indent=2)
-
-    prompt = textwrap.dedent(f"""
-    You are an expert in Intelligent Transport Systems (ITS) and SUMO traffic simulation.
-
-    ### GOAL
-    Analyze the provided network, detector data, and simulation summary to:
-    - Identify congestion and inefficiencies.
-    - Propose policy-based changes (lane speed, junction control, signal timing).
-    - **Add traffic lights (tlLogic) to junctions that need signalization**.
-
-    ### INPUTS
-    **1. Network Summary**
-    {json.dumps(network_info, indent=2)}
-
-    **2. Detector Data**
-    {detector_info}
-
-    **3. Simulation Summary**
-    {json.dumps(summary_info, indent=2)}
-
-    **4. Metadata / Context**
-    {context_info}
-
-    **5. Original Network XML**
-    ```xml
-    {network_text}
-    ```
-
-    ### OUTPUT FORMAT
-    Respond in valid JSON using this schema:
-    {schema_hint}
-
-    ### RULES
-    - Modify only necessary elements:
-      - Update `lane` speed, `junction` type, or `tlLogic` phases.
-      - If a junction shows high congestion and is currently `priority` or `unregulated`, **create a new tlLogic** with reasonable phase durations (e.g., 45–60 s cycles).
-    - When creating a new tlLogic:
-      - Include a valid `<tlLogic id="..." type="actuated">` element in `modified_snippets`.
-      - Make sure the `tlLogic` ID matches the `junction` ID or use a prefix like `TL_`.
-      - Include at least 3–4 `<phase>` elements (e.g., green/yellow/red combinations).
-    - Do not return the entire network XML — only the modified snippets.
-    - Escape double quotes (") inside XML as (\") to maintain valid JSON.
-
-    ### EXAMPLES
-    **New traffic light creation**
-    ```json
-    {{
-      "actions": [
-        {{
-          "type": "create_element",
-          "target": "tlLogic",
-          "id": "TL_cluster_25772784",
-          "xml_snippet": "<tlLogic id=\\"TL_cluster_25772784\\" type=\\"actuated\\" programID=\\"0\\" offset=\\"0\\">\\n  <phase duration=\\"45\\" state=\\"GGgrrr\\"/>\\n  <phase duration=\\"5\\" state=\\"yygrrr\\"/>\\n  <phase duration=\\"45\\" state=\\"rrrGGg\\"/>\\n  <phase duration=\\"5\\" state=\\"rrryyy\\"/>\\n</tlLogic>"
-        }}
-      ]
-    }}
-    ```
-
-    ### OUTPUT REQUIREMENTS
-    - Return **only JSON** with `reasoning`, `actions`, and `modified_snippets`.
-    - Each XML snippet in `modified_snippets` must be a complete element (`<edge>...</edge>`, `<junction>...</junction>`, or `<tlLogic>...</tlLogic>`).
-    """)
+@profiling.traced(count=len)
+def build_prompt(network_info, detector_info, summary_info, context_info, network_text, shap_pack=None):
+    """
+    Static segments (role, schema, rules, examples, network, context) first and
+    memoized, this run's detector / summary / SHAP data last — see prompt_assembler.
+    """
+    prompt, segments = pa.assemble_prompt(
+        network_info, detector_info, summary_info, context_info, network_text, shap_pack
+    )
+    report = pa.segment_report(segments)
+    print(f"Prompt ≈ {report['total_tokens']} tokens "
+          f"(static prefix {report['static_prefix_tokens']}, dynamic {report['dynamic_tokens']}; "
+          f"{sum(s['cached'] for s in segments)}/{sum(s['kind'] == 'static' for s in segments)} static segments cached)")
     return prompt
 
 # ------------------------------------------------------------
@@ -196,7 +126,9 @@ def generate_policy_network(
     detector_file="results/traffic_simulation_results/baseline/baseline_detector_output.xml",
     summary_file="results/traffic_simulation_results/baseline/baseline_summary.xml",
     context_file="results/llm/context.txt",
-    xai_file = "results/shap_exports/2906-20251009-165634/shap_values.json" ## need to change 
+    xai_file = "results/shap_exports/2906-20251009-165634/shap_values.json", ## need to change 
+    stream=False,
+    merged_out="results/road-rebuild/osm_policy_merged-stream.net.xml",
 ):
     # --- Read inputs ---
     net_info = parse_network(network_file)
@@ -214,26 +146,86 @@ def generate_policy_network(
         xai_info = json.load(f)
 
     # --- Build prompt ---
-    prompt = build_prompt(net_info, detector_info, summary_info, context_info, net_text)
+    prompt = build_prompt(net_info, detector_info, summary_info, context_info, net_text, xai_info)
     with open("llm_policy_prompt.txt", "w", encoding="utf-8") as f:
         f.write(prompt)
 
     # return prompt
     # --- LLM call ---
+    if stream:
+        # tlLogic snippets are validated and merged into merged_out while the answer streams in
+        text, _ = stream_policy(prompt, network_file, merged_out)
+        message = SimpleNamespace(content=text)
+    else:
+        message = call_llm(prompt)
+
+    with open(f"results/llm/raw_llm_output-{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}.txt", "w", encoding="utf-8") as f: # to test
+        f.write(message.content)
+    return message
+
+
+def load_api_key():
+    """OPENAI_API_KEY from the environment, else from .env (read only when an LLM call is made)."""
+    key = os.environ.get("OPENAI_API_KEY")
+    if key:
+        return key
+    import dotenv
+    return dotenv.get_key('.env', 'OPENAI_API_KEY')
+
+
+@profiling.traced("llm_call", count=lambda m: len(m.content or ""))
+def call_llm(prompt, model="gpt-5"):
+    # imported here so the parsers / prompt builder work without openai installed
+    from openai import OpenAI
+
     print("Sending prompt to OpenAI model...")
-    client = OpenAI(api_key=apikey)
+    client = OpenAI(api_key=load_api_key())
     response = client.chat.completions.create(
-        model="gpt-5",
+        model=model,
         response_format={"type": "json_object"},
         messages=[{"role": "user", "content": prompt}],
         # temperature=0.3,
     )
+    return response.choices[0].message
 
-    message = response.choices[0].message
+def stream_llm(prompt, model="gpt-5"):
+    """Yield the completion text chunk by chunk as the model produces it."""
+    from openai import OpenAI
 
-    with open(f"results/llm/raw_llm_output-{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}.txt", "w", encoding="utf-8") as f: # to test
-        f.write(message.content)
-    return message
+    print("Streaming prompt to OpenAI model...")
+    client = OpenAI(api_key=load_api_key())
+    response = client.chat.completions.create(
+        model=model,
+        response_format={"type": "json_object"},
+        messages=[{"role": "user", "content": prompt}],
+        stream=True,
+    )
+    for chunk in response:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+@profiling.traced("llm_stream", count=lambda r: len(r[0]))
+def stream_policy(prompt, network_file, merged_out, model="gpt-5", chunks=None):
+    """
+    Stream the policy answer and merge each tlLogic snippet / action into
+    network_file as soon as it is complete. chunks replaces the live stream
+    (e.g. a saved response split into pieces). Returns (raw_text, merged tree).
+    """
+    raw = []
+    t0 = time.perf_counter()
+
+    def timed(events):
+        first = True
+        for ev in events:
+            if first:
+                print(f"First complete element after {time.perf_counter() - t0:.1f} s")
+                first = False
+            yield ev
+
+    events = llm_stream.iter_events(chunks if chunks is not None else stream_llm(prompt, model), raw)
+    tree = mn.merge_tlLogic_stream(network_file, timed(events), merged_out)
+    return "".join(raw), tree
 
 # ------------------------------------------------------------
 # 4. Main entry
@@ -0,0 +1,253 @@
+# model_update.py — warm-start model updates on the newest SCATS window, full retrain only as fallback
+import argparse
+import json
+import os
+import time
+from datetime import datetime
+
+import pandas as pd
+
+import profiling
+from archive import xgboost_training as xt
+
+# =========================
+# Config
+# =========================
+# Same hyper-parameters as train_xgb, so continued trees look like the original ones.
+UPDATE_PARAMS = {
+    "objective": "reg:squarederror",
+    "learning_rate": 0.05,
+    "max_depth": 6,
+    "subsample": 0.8,
+    "colsample_bytree": 0.8,
+    "reg_lambda": 1.0,
+    "tree_method": "hist",
+    "enable_categorical": True,
+    "eval_metric": "rmse",
+    "random_state": 42,
+}
+DEFAULT_ROUNDS = 200     # max extra trees per update (early stopping on the end of the new window)
+EARLY_STOP_SHARE = 0.2   # share of the new window's hours held back for early stopping
+DEFAULT_TOLERANCE = 0.05 # accept the update unless holdout RMSE gets >5% worse than the current model
+
+
+def latest_model(detector_id, models_dir="models"):
+    import surrogate
+
+    return surrogate.latest_model(detector_id, models_dir)
+
+
+def load_regressor(model_path):
+    import xgboost as xgb
+
+    model = xgb.XGBRegressor()
+    model.load_model(model_path)
+    return model
+
+
+def load_features(features_csv, start=None, stop=None):
+    """
+    make_features output from CSV, ids back as categoricals (as in training).
+    With start / stop only rows [start, stop) are parsed (index kept as row
+    numbers); the id categories still come from the whole file, so category
+    codes match a full load.
+    """
+    rows = {}
+    if start is not None or stop is not None:
+        start = start or 0
+        rows = {"skiprows": range(1, start + 1), "nrows": None if stop is None else max(stop - start, 0)}
+    df = pd.read_csv(features_csv, parse_dates=[xt.TIME_COL], **rows)
+    ids = pd.read_csv(features_csv, usecols=xt.ID_COLS) if rows else df
+    for c in xt.ID_COLS:
+        df[c] = pd.Categorical(df[c], categories=ids[c].astype("category").cat.categories)
+    if rows:
+        df.index = pd.RangeIndex(start, start + len(df))
+    features = [c for c in df.columns if c not in (xt.TARGET, xt.TIME_COL)]
+    return df, features
+
+
+def split_window(df, days=3, holdout_days=1):
+    """Last `days` of data: update rows first, the final holdout_days kept back for checking."""
+    end = df[xt.TIME_COL].max()
+    start = end - pd.Timedelta(days=days) + pd.Timedelta(hours=1)
+    holdout_start = end - pd.Timedelta(days=holdout_days) + pd.Timedelta(hours=1)
+    window = df[df[xt.TIME_COL] >= start]
+    return window[window[xt.TIME_COL] < holdout_start], window[window[xt.TIME_COL] >= holdout_start]
+
+
+def split_early_stop(new, share=EARLY_STOP_SHARE):
+    """Last `share` of the new window's hours as early-stopping rows; the rest is fitted."""
+    times = new[xt.TIME_COL].drop_duplicates().sort_values()
+    if len(times) < 2:
+        raise ValueError("need at least two hours of new data to hold back an early-stopping slice")
+    cut = times.iloc[min(max(int(len(times) * (1 - share)), 1), len(times) - 1)]
+    return new[new[xt.TIME_COL] < cut], new[new[xt.TIME_COL] >= cut]
+
+
+# =========================
+# Update strategies
+# =========================
+
+def continue_boosting(model_path, new, features, rounds=DEFAULT_ROUNDS):
+    """
+    Add up to `rounds` trees fitted on the new window only, starting from the
+    saved booster. Early stopping watches the end of the new window
+    (split_early_stop), so the holdout stays unseen for the accept check.
+    """
+    import xgboost as xgb
+    from xgboost.callback import EarlyStopping
+
+    fit, stop = split_early_stop(new)
+    model = xgb.XGBRegressor(n_estimators=rounds, **UPDATE_PARAMS,
+                             callbacks=[EarlyStopping(rounds=20, save_best=True, maximize=False)])
+    model.fit(
+        fit[features], fit[xt.TARGET],
+        eval_set=[(stop[features], stop[xt.TARGET])],
+        xgb_model=model_path,
+        verbose=False,
+    )
+    return model
+
+
+def refresh_leaves(model_path, new, features):
+    """Keep every tree's structure, re-estimate the leaf values on the new window."""
+    import xgboost as xgb
+
+    old = load_regressor(model_path).get_booster()
+    dtrain = xgb.DMatrix(new[features], label=new[xt.TARGET], enable_categorical=True)
+    params = {"process_type": "update", "updater": "refresh", "refresh_leaf": True,
+              "objective": UPDATE_PARAMS["objective"]}
+    booster = xgb.train(params, dtrain, num_boost_round=old.num_boosted_rounds(), xgb_model=old)
+    model = xgb.XGBRegressor()
+    model.load_model(bytearray(booster.save_raw("json")))
+    return model
+
+
+def full_retrain(df, features, valid_days=14, holdout_start=None):
+    """Fallback: train_xgb from scratch on the feature history before holdout_start (all of it if None)."""
+    if holdout_start is not None:
+        df = df[df[xt.TIME_COL] < holdout_start]
+    train, valid, _ = xt.time_split(df, valid_days=valid_days, test_days=0)
+    return xt.train_xgb(train, valid, features)
+
+
+# =========================
+# Update + check
+# =========================
+
+@profiling.traced(count=lambda r: r["rows_used"])
+def update_model(
+    model_path,
+    features_df,
+    features,
+    mode="continue",
+    days=3,
+    holdout_days=1,
+    rounds=DEFAULT_ROUNDS,
+    tolerance=DEFAULT_TOLERANCE,
+    retrain_on_fail=True,
+    out_path=None,
+):
+    """
+    Update a saved model with the latest `days` of features_df.
+
+    mode "continue" adds trees, "refresh" re-fits leaf values. The candidate is
+    scored with evaluate() (MAE / RMSE / sMAPE) on the last holdout_days, next to
+    the current model. It is kept if its RMSE is within `tolerance` of the
+    current model's. Otherwise a full retrain on features_df up to the holdout
+    is tried (retrain_on_fail); it replaces the current model only if its RMSE
+    is no worse (no tolerance), else the current model is kept. Categorical ids must use
+    the same categories as in the original training (load_features does this
+    for the same detector set).
+    Returns a report dict; the accepted model is saved to out_path.
+    """
+    new, holdout = split_window(features_df, days, holdout_days)
+    if new.empty or holdout.empty:
+        raise ValueError(f"need more than {holdout_days} day(s) of new data to update (got {len(new)} rows)")
+
+    current = load_regressor(model_path)
+    base = xt.evaluate(current, holdout, features, "current")
+
+    t0 = time.perf_counter()
+    if mode == "continue":
+        candidate = continue_boosting(model_path, new, features, rounds)
+    elif mode == "refresh":
+        candidate = refresh_leaves(model_path, new, features)
+    else:
+        raise ValueError(f"unknown mode {mode!r} (continue / refresh)")
+    update_s = time.perf_counter() - t0
+    cand = xt.evaluate(candidate, holdout, features, mode)
+
+    report = {
+        "model_in": str(model_path),
+        "mode": mode,
+        "rows_used": len(new),
+        "holdout_rows": len(holdout),
+        "update_s": round(update_s, 3),
+        "current": dict(zip(("mae", "rmse", "smape"), map(float, base))),
+        "candidate": dict(zip(("mae", "rmse", "smape"), map(float, cand))),
+    }
+
+    if cand[1] <= base[1] * (1 + tolerance):
+        chosen, report["result"] = candidate, mode
+    elif retrain_on_fail:
+        print(f"{mode} update worse than tolerance (RMSE {cand[1]:.2f} vs {base[1]:.2f}); full retrain…")
+        t0 = time.perf_counter()
+        retrained = full_retrain(features_df, features, holdout_start=holdout[xt.TIME_COL].min())
+        report["retrain_s"] = round(time.perf_counter() - t0, 3)
+        ret = xt.evaluate(retrained, holdout, features, "retrained")
+        report["retrained"] = dict(zip(("mae", "rmse", "smape"), map(float, ret)))
+        if ret[1] <= base[1]:                # the tolerance is for cheap warm starts only
+            chosen, report["result"] = retrained, "full_retrain"
+        else:
+            print(f"retrain also worse (RMSE {ret[1]:.2f} vs {base[1]:.2f}); keeping the current model")
+            chosen, report["result"] = None, "kept_current"
+    else:
+        chosen, report["result"] = None, "kept_current"
+
+    if chosen is not None:
+        out_path = out_path or _stamped_path(model_path)
+        chosen.save_model(out_path)
+        report["model_out"] = str(out_path)
+        report_path = os.path.splitext(out_path)[0] + ".update.json"
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    print(f"Update result: {report['result']}")
+    return report
+
+
+def _stamped_path(model_path):
+    """models/xgb-model-<id>[-old stamp].json → models/xgb-model-<id>-<now>.json"""
+    folder, name = os.path.split(model_path)
+    parts = os.path.splitext(name)[0].split("-")
+    stem = "-".join(parts[:3]) if len(parts) >= 3 else os.path.splitext(name)[0]
+    return os.path.join(folder, f"{stem}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+
+
+# =========================
+# CLI
+# =========================
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Warm-start update of a detector model on the newest data.")
+    ap.add_argument("features", help="make_features CSV covering at least the update window")
+    ap.add_argument("--detector", type=int, default=2906)
+    ap.add_argument("--model", default=None, help="default: newest models/xgb-model-<detector>-*.json")
+    ap.add_argument("--mode", choices=["continue", "refresh"], default="continue")
+    ap.add_argument("--days", type=int, default=3, help="size of the new-data window")
+    ap.add_argument("--holdout-days", type=int, default=1)
+    ap.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS)
+    ap.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    ap.add_argument("--no-retrain", action="store_true", help="keep the current model instead of retraining")
+    ap.add_argument("--out", default=None)
+    profiling.add_cli_args(ap)
+    args = ap.parse_args()
+    profiling.configure_from_args(args)
+
+    df, features = load_features(args.features)
+    report = update_model(
+        args.model or latest_model(args.detector), df, features, mode=args.mode, days=args.days,
+        holdout_days=args.holdout_days, rounds=args.rounds, tolerance=args.tolerance,
+        retrain_on_fail=not args.no_retrain, out_path=args.out,
+    )
+    print(json.dumps(report, indent=2))
@@ -1,11 +1,13 @@
 # modified_network.py — actuated signals + robust linking + per-junction tuning
 import xml.etree.ElementTree as ET
 import json
-import re
 import subprocess
 import os
 from collections import defaultdict
 
+import llm_stream
+import profiling
+
 # ---------------------------
 # Helpers
 # ---------------------------
@@ -20,13 +22,20 @@ def safe_load_llm_json(path_or_str):
         return json.loads(content)
     except json.JSONDecodeError:
         pass
-    m = re.search(r'\{.*\}', content, re.DOTALL)
-    if m:
-        candidate = m.group(0).replace('\r', '')
+    # first complete JSON object in the text (skips ```json fences / trailing prose)
+    cleaned = content.replace('\r', '')
+    start = cleaned.find("{")
+    if start != -1:
         try:
-            return json.loads(candidate)
+            return json.JSONDecoder().raw_decode(cleaned, start)[0]
         except json.JSONDecodeError:
             pass
+    # truncated or broken response: keep the elements that did come through
+    partial = llm_stream.salvage(content)
+    if partial is not None:
+        print(f"LLM JSON incomplete; salvaged {len(partial['actions'])} actions, "
+              f"{len(partial['modified_snippets'])} snippets")
+        return partial
     with open("invalid_llm_output.txt", "w", encoding="utf-8") as f:
         f.write(content)
     print("Could not parse LLM JSON; raw content saved to invalid_llm_output.txt")
@@ -39,6 +48,7 @@ def write_xml(tree, path):
     print(f"Saved: {path}")
 
 
+@profiling.traced("netconvert")
 def rebuild_with_netconvert(input_net, output_net, netconvert_path="netconvert"):
     os.makedirs(os.path.dirname(output_net), exist_ok=True)
     try:
@@ -168,6 +178,110 @@ def build_actuated_phases_from_cfg(n_links, cfg_for_tl):
 # Core functions
 # ---------------------------
 
+VALID_STATE_CHARS = set("rRyYgGuoOs")
+
+
+def tl_network_index(root):
+    """Junction ids, existing tlLogic ids and per-junction internal link counts, for snippet validation."""
+    junctions = {j.get("id") for j in root.findall("junction")}
+    n_links = defaultdict(int)
+    for conn in root.findall("connection"):
+        via = conn.get("via", "")
+        if via.startswith(":"):
+            n_links[via[1:].rsplit("_", 2)[0]] += 1
+    return {
+        "junctions": junctions,
+        "tl_ids": {tl.get("id") for tl in root.findall("tlLogic")},
+        "n_links": dict(n_links),
+    }
+
+
+def _find_junction(root, junc_id):
+    j = root.find(f".//junction[@id='{junc_id}']")
+    if j is None:
+        # cluster fallback
+        for jj in root.findall("junction"):
+            if junc_id in (jj.get("id") or ""):
+                return jj
+    return j
+
+
+def validate_tllogic_snippet(elem, net_index):
+    """
+    Problems with one <tlLogic> element (empty list = usable): it needs an id that
+    matches a junction (directly, via a TL_ prefix or a cluster id) or an existing
+    program, at least one phase, and equal-length states made of SUMO signal chars.
+    A state length that differs from the junction's link count is only a warning
+    (ensure_tllogic_programs regenerates those phases).
+    """
+    errors = []
+    tl_id = elem.get("id")
+    if not tl_id:
+        return ["tlLogic without id"]
+    junc_id = tl_id.replace("TL_", "")
+    known = (tl_id in net_index["tl_ids"] or junc_id in net_index["junctions"]
+             or any(junc_id in j for j in net_index["junctions"]))
+    if not known:
+        errors.append(f"no junction or program for {tl_id}")
+
+    states = [p.get("state", "") for p in elem.findall("phase")]
+    if not states:
+        errors.append(f"{tl_id} has no phases")
+    elif len({len(st) for st in states}) > 1:
+        errors.append(f"{tl_id} phase states differ in length")
+    bad = {c for st in states for c in st} - VALID_STATE_CHARS
+    if bad:
+        errors.append(f"{tl_id} has invalid state characters {''.join(sorted(bad))}")
+
+    n = net_index["n_links"].get(junc_id)
+    if states and n and len(states[0]) != n:
+        print(f"Note: {tl_id} states have {len(states[0])} links, junction has {n}")
+    return errors
+
+
+def merge_snippet(root, snip, net_index=None):
+    """Insert/replace one <tlLogic> snippet. Returns the tlLogic id, or None if skipped."""
+    try:
+        elem = ET.fromstring(snip)
+    except Exception as e:
+        print(f"Skipped non-XML or invalid snippet: {str(e)}")
+        return None
+    if elem.tag != "tlLogic":
+        return None
+    if net_index is not None:
+        errors = validate_tllogic_snippet(elem, net_index)
+        if errors:
+            print(f"Rejected tlLogic snippet: {'; '.join(errors)}")
+            return None
+    tl_id = elem.get("id")
+    existing = root.find(f".//tlLogic[@id='{tl_id}']")
+    if existing is not None:
+        root.remove(existing)
+        print(f"Replaced tlLogic {tl_id}")
+    else:
+        print(f"Added tlLogic {tl_id}")
+    root.append(elem)
+    if net_index is not None:
+        net_index["tl_ids"].add(tl_id)
+    return tl_id
+
+
+def apply_tl_action(root, act):
+    """Set junction type + tl attr for a create_element/tlLogic action. Returns the junction or None."""
+    if act.get("type") != "create_element" or act.get("target") != "tlLogic" or not act.get("id"):
+        return None
+    tl_id = act.get("id")
+    j = _find_junction(root, tl_id.replace("TL_", ""))
+    if j is not None:
+        j.set("type", "traffic_light")
+        j.set("tl", tl_id)
+        print(f"Linked junction {j.get('id')} → {tl_id}")
+    else:
+        print(f"Could not find junction for tlLogic {tl_id}")
+    return j
+
+
+@profiling.traced(count=lambda t: len(t.getroot()))
 def merge_tlLogic_snippets(original_net, llm_json, merged_out_path):
     """
     Merge new/updated <tlLogic> elements from LLM JSON and link junctions (type + tl attr).
@@ -183,49 +297,54 @@ def merge_tlLogic_snippets(original_net, llm_json, merged_out_path):
         write_xml(tree, merged_out_path)
         return tree
 
-    snippets = data.get("modified_snippets", [])
-    actions  = data.get("actions", [])
-
     # 1) Insert/replace tlLogic elements
-    for snip in snippets:
-        try:
-            elem = ET.fromstring(snip)
-            if elem.tag != "tlLogic":
-                continue
-            tl_id = elem.get("id")
-            existing = root.find(f".//tlLogic[@id='{tl_id}']")
-            if existing is not None:
-                root.remove(existing)
-                print(f"Replaced tlLogic {tl_id}")
-            else:
-                print(f"Added tlLogic {tl_id}")
-            root.append(elem)
-        except Exception as e:
-            print(f"Skipped non-XML or invalid snippet: {str(e)}")
+    for snip in data.get("modified_snippets", []):
+        merge_snippet(root, snip)
 
     # 2) Set junction type + tl attr from actions
-    for act in actions:
-        if act.get("type") == "create_element" and act.get("target") == "tlLogic":
-            tl_id = act.get("id")
-            junc_id = tl_id.replace("TL_", "")
-            j = root.find(f".//junction[@id='{junc_id}']")
-            if j is None:
-                # cluster fallback
-                for jj in root.findall("junction"):
-                    if junc_id in (jj.get("id") or ""):
-                        j = jj
-                        break
-            if j is not None:
-                j.set("type", "traffic_light")
-                j.set("tl", tl_id)
-                print(f"Linked junction {j.get('id')} → {tl_id}")
-            else:
-                print(f"Could not find junction for tlLogic {tl_id}")
+    for act in data.get("actions", []):
+        apply_tl_action(root, act)
+
+    write_xml(tree, merged_out_path)
+    return tree
+
+
+@profiling.traced(count=lambda t: len(t.getroot()))
+def merge_tlLogic_stream(original_net, events, merged_out_path):
+    """
+    Streaming counterpart of merge_tlLogic_snippets. events is an iterable of
+    (key, value) pairs from llm_stream.iter_events; each snippet is validated
+    against the network and merged, and each action applied, as soon as it
+    arrives. Actions are applied in arrival order, so a junction may be linked
+    before its program has been streamed; link/ensure resolve that afterwards.
+    """
+    print("Merging tlLogic snippets from stream…")
+    tree = ET.parse(original_net)
+    root = tree.getroot()
+    net_index = tl_network_index(root)
+    merged = rejected = 0
+
+    for key, value in events:
+        if key == "modified_snippets":
+            if not isinstance(value, str):
+                rejected += 1
+                print(f"Skipped non-string snippet: {value!r}")
+            elif merge_snippet(root, value, net_index) is not None:
+                merged += 1
+            elif value.lstrip().startswith("<tlLogic"):
+                rejected += 1
+        elif key == "actions" and isinstance(value, dict):
+            apply_tl_action(root, value)
+        elif key == "error":
+            rejected += 1
+            print(f"Skipped malformed {value['key']} element: {value['error']}")
 
     write_xml(tree, merged_out_path)
+    print(f"Stream merge complete ({merged} tlLogic merged, {rejected} rejected)")
     return tree
 
 
+@profiling.traced(count=lambda m: sum(len(c) for c in m.values()))
 def link_connections_to_tllogic(tree, linked_out_path):
     """
     For every junction with type='traffic_light' and a 'tl' id:
@@ -264,6 +383,7 @@ def link_connections_to_tllogic(tree, linked_out_path):
     return tl_to_conns
 
 
+@profiling.traced(count=lambda t: len(t.getroot().findall("tlLogic")))
 def ensure_tllogic_programs(tree, tl_to_conns, ensured_out_path, tuning_cfg):
     """
     Ensure each tlLogic exists and has actuated phases sized to number of controlled links,
@@ -335,6 +455,7 @@ def ensure_tllogic_programs(tree, tl_to_conns, ensured_out_path, tuning_cfg):
 # Orchestrator
 # ---------------------------
 
+@profiling.traced()
 def apply_policy_updates(
     original_net=os.path.join("traffic simulation", "2906", "osm.net.xml"),
     llm_json_path="results/llm/response/raw_llm_output-gpt5.txt",
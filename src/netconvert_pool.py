@@ -0,0 +1,184 @@
+# netconvert_pool.py — batched netconvert rebuilds, bounded concurrency, cached by input hash
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import profiling
+
+DEFAULT_CACHE_DIR = Path("results") / "road-rebuild" / ".cache"
+
+# =========================
+# Cache key
+# =========================
+# A rebuild is identified by sha1(input XML bytes, extra options, netconvert
+# version). Each key gets its own folder:
+#   <cache_dir>/<key>/out.net.xml      the rebuilt network (only written on success)
+#   <cache_dir>/<key>/netconvert.log   captured stdout + stderr of the run
+#   <cache_dir>/<key>/job.json         command, status, wall time
+# Requested outputs are copies of out.net.xml, so identical variants are
+# rebuilt once no matter how many jobs ask for them.
+
+_versions = {}
+
+
+def netconvert_version(netconvert_path="netconvert"):
+    """First line of `netconvert --version`; falls back to the binary's hash, memoized per path."""
+    if netconvert_path not in _versions:
+        version = "unknown"
+        try:
+            proc = subprocess.run([netconvert_path, "--version"], capture_output=True, text=True, timeout=30)
+            lines = (proc.stdout or proc.stderr).strip().splitlines()
+            version = lines[0] if lines else version
+        except (OSError, subprocess.TimeoutExpired):
+            binary = shutil.which(netconvert_path)
+            if binary:
+                version = "sha1:" + file_sha1(binary)
+        _versions[netconvert_path] = version
+    return _versions[netconvert_path]
+
+
+def file_sha1(path, chunk=1 << 20):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def job_key(input_net, options=(), version=""):
+    h = hashlib.sha1()
+    h.update(file_sha1(input_net).encode("utf-8"))
+    h.update(json.dumps(list(options)).encode("utf-8"))
+    h.update(version.encode("utf-8"))
+    return h.hexdigest()
+
+
+# =========================
+# One rebuild
+# =========================
+
+def _run(key, input_net, options, cache_dir, netconvert_path, timeout):
+    """Run netconvert for one cache key. Never raises; the outcome goes to job.json."""
+    entry = Path(cache_dir) / key
+    entry.mkdir(parents=True, exist_ok=True)
+    tmp = entry / f"out.{os.getpid()}.tmp.net.xml"
+    cmd = [netconvert_path, "-s", str(input_net), "-o", str(tmp), *options]
+    job = {"key": key, "input": str(input_net), "cmd": cmd, "status": "pending", "returncode": None}
+    t0 = time.perf_counter()
+    try:
+        with open(entry / "netconvert.log", "w", encoding="utf-8") as log:
+            proc = subprocess.run(cmd, stdout=log, stderr=subprocess.STDOUT, timeout=timeout)
+        job["returncode"] = proc.returncode
+        job["status"] = "ok" if proc.returncode == 0 and tmp.exists() else "failed"
+        if job["status"] == "ok":
+            os.replace(tmp, entry / "out.net.xml")
+    except subprocess.TimeoutExpired:
+        job["status"] = "timeout"
+    except OSError as e:
+        job["status"] = "error"
+        job["error"] = str(e)
+    finally:
+        tmp.unlink(missing_ok=True)
+    job["wall_time_s"] = round(time.perf_counter() - t0, 3)
+    (entry / "job.json").write_text(json.dumps(job, indent=2), encoding="utf-8")
+    return job
+
+
+# =========================
+# Batch API
+# =========================
+
+@profiling.traced(count=len)
+def rebuild_many(
+    jobs,
+    netconvert_path="netconvert",
+    cache_dir=DEFAULT_CACHE_DIR,
+    max_workers=None,
+    timeout=None,
+):
+    """
+    jobs: [{"input": ensured.net.xml, "output": rebuilt.net.xml, "options": [...]}, ...]
+    At most max_workers netconvert processes run at once (threads only wait on
+    them). Cache hits and duplicate inputs within the batch are not rebuilt.
+    Returns one result per job: input, output, key, status
+    (ok / cached / failed / timeout / error), log and wall_time_s.
+    """
+    cache_dir = Path(cache_dir)
+    version = netconvert_version(netconvert_path)
+    keys = [job_key(j["input"], j.get("options", ()), version) for j in jobs]
+
+    todo = {}
+    for job, key in zip(jobs, keys):
+        if key not in todo and not (cache_dir / key / "out.net.xml").exists():
+            todo[key] = job
+    print(f"netconvert: {len(jobs)} jobs, {len(todo)} to build, {len(jobs) - len(todo)} reused (cache or duplicate)")
+
+    runs = {}
+    if todo:
+        with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count()) as pool:
+            futures = {
+                key: pool.submit(_run, key, job["input"], list(job.get("options", ())), cache_dir,
+                                 netconvert_path, timeout)
+                for key, job in todo.items()
+            }
+            runs = {key: f.result() for key, f in futures.items()}
+
+    results = []
+    for job, key in zip(jobs, keys):
+        entry = cache_dir / key
+        run = runs.get(key)
+        res = {"input": str(job["input"]), "output": str(job["output"]), "key": key,
+               "log": str(entry / "netconvert.log"), "wall_time_s": run["wall_time_s"] if run else 0.0}
+        if (entry / "out.net.xml").exists():
+            Path(job["output"]).parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(entry / "out.net.xml", job["output"])
+            res["status"] = "ok" if run else "cached"
+        else:
+            res["status"] = run["status"] if run else "failed"
+        results.append(res)
+
+    failed = [r for r in results if r["status"] not in ("ok", "cached")]
+    for r in failed:
+        print(f"netconvert {r['status']} for {r['input']} (log: {r['log']})")
+    return results
+
+
+def rebuild_one(input_net, output_net, netconvert_path="netconvert", cache_dir=DEFAULT_CACHE_DIR,
+                options=(), timeout=None):
+    """Cached single rebuild; True on success (drop-in for mn.rebuild_with_netconvert)."""
+    res = rebuild_many([{"input": input_net, "output": output_net, "options": list(options)}],
+                       netconvert_path=netconvert_path, cache_dir=cache_dir, max_workers=1, timeout=timeout)[0]
+    if res["status"] in ("ok", "cached"):
+        print(f"Rebuilt with netconvert → {output_net}" + (" (cached)" if res["status"] == "cached" else ""))
+        return True
+    return False
+
+
+# =========================
+# CLI
+# =========================
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Rebuild many networks with netconvert (parallel, cached).")
+    ap.add_argument("inputs", nargs="+", help="ensured .net.xml files")
+    ap.add_argument("--out-dir", required=True, help="rebuilt networks go here, same file names")
+    ap.add_argument("--netconvert-path", default="netconvert")
+    ap.add_argument("--cache-dir", default=str(DEFAULT_CACHE_DIR))
+    ap.add_argument("-j", "--max-workers", type=int, default=None)
+    ap.add_argument("--timeout", type=float, default=None, help="per-job timeout in seconds")
+    ap.add_argument("--option", action="append", default=[], help="extra netconvert argument (repeatable)")
+    profiling.add_cli_args(ap)
+    args = ap.parse_args()
+    profiling.configure_from_args(args)
+
+    jobs = [{"input": p, "output": os.path.join(args.out_dir, os.path.basename(p)), "options": args.option}
+            for p in args.inputs]
+    results = rebuild_many(jobs, args.netconvert_path, args.cache_dir, args.max_workers, args.timeout)
+    print(json.dumps(results, indent=2))
+    raise SystemExit(0 if all(r["status"] in ("ok", "cached") for r in results) else 1)
@@ -0,0 +1,540 @@
+# pipeline.py — content-hash cached DAG: clean → features → train → shap → pack → prompt → llm → patch → (prescreen) → rebuild → simulate → compare → archive
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from pathlib import Path
+
+import profiling
+
+STATE_DIR = Path("results") / ".pipeline"
+
+
+class SkipStage(Exception):
+    """Raised by a stage function that decides not to run; the stage and its dependants are skipped."""
+
+
+# =========================
+# Stage definition
+# =========================
+
+def stage(name, func, inputs=(), outputs=(), params=None, deps=()):
+    """
+    One pipeline step. func(**params) does the work; inputs/outputs are the files
+    (or folders) it reads and writes. A stage is skipped when the hash of its
+    params and input contents matches the last successful run and all outputs exist.
+    Dependencies are inferred from inputs produced by other stages, plus `deps`.
+    """
+    return {
+        "name": name,
+        "func": func,
+        "inputs": [str(p) for p in inputs],
+        "outputs": [str(p) for p in outputs],
+        "params": params or {},
+        "deps": list(deps),
+    }
+
+
+# =========================
+# Hashing
+# =========================
+
+_file_hash_memo = {}
+
+
+def hash_path(path):
+    """
+    Content hash of a file (sha256, as in the artifact store), or of every file
+    under a folder; memoized by (mtime, size). A path that was archived and
+    removed (archive_stage) hashes to the same value through the store.
+    """
+    p = Path(path)
+    if not p.exists():
+        return _archived_hash(p)
+    if p.is_dir():
+        files = sorted((c.relative_to(p).as_posix(), c) for c in p.rglob("*") if c.is_file())
+        return _dir_hash((rel, hash_path(child) or "") for rel, child in files)
+    st = p.stat()
+    memo_key = (str(p.resolve()), st.st_mtime_ns, st.st_size)
+    if memo_key not in _file_hash_memo:
+        h = hashlib.sha256()
+        with open(p, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        _file_hash_memo[memo_key] = h.hexdigest()
+    return _file_hash_memo[memo_key]
+
+
+def _dir_hash(entries):
+    h = hashlib.sha1()
+    for rel, digest in entries:
+        h.update(rel.encode())
+        h.update(digest.encode())
+    return h.hexdigest()
+
+
+def _store():
+    import artifact_store as ast
+
+    return ast.ArtifactStore() if ast.STORE_DIR.exists() else None
+
+
+def _archived_hash(p):
+    store = _store()
+    h = store.lookup_path(p) if store else None
+    if h is None or store.info(h)["kind"] != "tree":
+        return h
+    return _dir_hash(sorted(store.tree(h).items()))
+
+
+def stage_key(st):
+    blob = json.dumps({
+        "name": st["name"],
+        "func": f"{st['func'].__module__}.{st['func'].__qualname__}",
+        "params": st["params"],
+        "inputs": {p: hash_path(p) for p in st["inputs"]},
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _state_file(name, state_dir):
+    return Path(state_dir) / (name.replace(":", "__").replace("/", "_") + ".json")
+
+
+def is_fresh(st, key, state_dir=STATE_DIR):
+    f = _state_file(st["name"], state_dir)
+    if not f.exists():
+        return False
+    state = json.loads(f.read_text(encoding="utf-8"))
+    return state.get("key") == key and all(Path(o).exists() or _archived_hash(Path(o)) for o in st["outputs"])
+
+
+# =========================
+# Scheduler
+# =========================
+
+def resolve_deps(stages):
+    producers = {o: st["name"] for st in stages for o in st["outputs"]}
+    names = {st["name"] for st in stages}
+    deps = {}
+    for st in stages:
+        d = set(st["deps"]) | {producers[i] for i in st["inputs"] if i in producers}
+        d.discard(st["name"])
+        missing = d - names
+        if missing:
+            raise ValueError(f"Stage {st['name']} depends on unknown stages: {sorted(missing)}")
+        deps[st["name"]] = d
+    # cycle check (Kahn)
+    remaining = {k: set(v) for k, v in deps.items()}
+    while remaining:
+        free = [k for k, v in remaining.items() if not v]
+        if not free:
+            raise ValueError(f"Dependency cycle among: {sorted(remaining)}")
+        for k in free:
+            remaining.pop(k)
+        for v in remaining.values():
+            v.difference_update(free)
+    return deps
+
+
+def run_pipeline(stages, max_workers=4, force=(), only=None, dry_run=False, state_dir=STATE_DIR):
+    """
+    Run stages as soon as their dependencies finish, independent branches in
+    parallel. force: stage names (or name prefixes) to re-run regardless of cache.
+    only: restrict to these stages and everything upstream of them.
+    Returns {stage name: "cached" | "ran" | "failed" | "skipped" | "would run"}.
+    """
+    state_dir = Path(state_dir)
+    state_dir.mkdir(parents=True, exist_ok=True)
+    deps = resolve_deps(stages)
+    by_name = {st["name"]: st for st in stages}
+
+    if only:
+        keep, todo = set(), [n for n in by_name if any(n == o or n.startswith(o + ":") for o in only)]
+        while todo:
+            n = todo.pop()
+            if n not in keep:
+                keep.add(n)
+                todo.extend(deps[n])
+        by_name = {n: st for n, st in by_name.items() if n in keep}
+
+    def forced(name):
+        return any(name == f or name.startswith(f + ":") for f in force)
+
+    status, running = {}, {}
+    pending = dict(by_name)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while pending or running:
+            for name in list(pending):
+                d = deps[name] & set(by_name)
+                if any(status.get(x) in ("failed", "skipped") for x in d):
+                    status[name] = "skipped"
+                    pending.pop(name)
+                    print(f"[skip]   {name} (upstream failed or skipped)")
+                elif all(status.get(x) in ("cached", "ran", "would run") for x in d):
+                    st = pending.pop(name)
+                    key = stage_key(st)
+                    if not forced(name) and is_fresh(st, key, state_dir):
+                        status[name] = "cached"
+                        print(f"[cached] {name}")
+                    elif dry_run:
+                        status[name] = "would run"
+                        print(f"[run]    {name}")
+                    else:
+                        print(f"[start]  {name}")
+                        running[pool.submit(_run_stage, st, key, state_dir)] = name
+            if not running:
+                continue  # everything left is now ready or skipped
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                name = running.pop(fut)
+                try:
+                    wall = fut.result()
+                    status[name] = "ran"
+                    print(f"[done]   {name} ({wall:.1f} s)")
+                except SkipStage as e:
+                    status[name] = "skipped"
+                    print(f"[skip]   {name} ({e})")
+                except Exception as e:
+                    status[name] = "failed"
+                    print(f"[failed] {name}: {e}")
+    return status
+
+
+def _run_stage(st, key, state_dir):
+    missing = [i for i in st["inputs"] if not Path(i).exists()]
+    store = _store() if missing else None
+    for i in missing if store else ():       # archived and removed upstream outputs
+        store.restore(i)
+    for o in st["outputs"]:
+        Path(o).parent.mkdir(parents=True, exist_ok=True)
+    t0 = time.perf_counter()
+    with profiling.span(f"stage:{st['name']}"):
+        st["func"](**st["params"])
+    wall = time.perf_counter() - t0
+    missing = [o for o in st["outputs"] if not Path(o).exists()]
+    if missing:
+        raise RuntimeError(f"outputs not produced: {missing}")
+    # outputs changed on disk → their hashes are recomputed by downstream stages
+    _state_file(st["name"], state_dir).write_text(json.dumps({
+        "key": key,
+        "finished": datetime.now().isoformat(timespec="seconds"),
+        "wall_time_s": round(wall, 3),
+        "outputs": {o: hash_path(o) for o in st["outputs"]},
+    }, indent=2), encoding="utf-8")
+    return wall
+
+
+# =========================
+# Stage functions (thin wrappers over the existing modules)
+# =========================
+
+def clean_stage(raw_csv, out_csv):
+    import data_cleaning as dc
+
+    df = dc.pre_processing_data(raw_csv)
+    report, spans = dc.quality_scan(df)
+    dc.write_quality_report(report, spans, os.path.dirname(out_csv) or ".")
+    dc.interpolate_data(df, spans).to_csv(out_csv, index=False)
+
+
+def features_stage(clean_csv, out_csv, detector_id):
+    import pandas as pd
+    from archive import xgboost_training as xt
+
+    df = pd.read_csv(clean_csv)
+    df = df[df["Detector_ID"] == detector_id]
+    xt.make_features(df).to_csv(out_csv, index=False)
+
+
+def _load_features(features_csv):
+    import pandas as pd
+    from archive import xgboost_training as xt
+
+    df = pd.read_csv(features_csv, parse_dates=[xt.TIME_COL])
+    for c in xt.ID_COLS:
+        df[c] = df[c].astype("category")
+    features = [c for c in df.columns if c not in (xt.TARGET, xt.TIME_COL)]
+    return df, features
+
+
+def train_stage(features_csv, model_out, valid_days=14, test_days=14):
+    from archive import xgboost_training as xt
+
+    df, features = _load_features(features_csv)
+    train, valid, _ = xt.time_split(df, valid_days=valid_days, test_days=test_days)
+    model = xt.train_xgb(train, valid, features)
+    model.save_model(model_out)
+
+
+def shap_stage(features_csv, model_path, out_dir, test_days=14, backend="auto"):
+    import pandas as pd
+    import xgboost as xgb
+    import shap_backends as sb
+    from archive import xgboost_training as xt
+
+    df, features = _load_features(features_csv)
+    _, _, test = xt.time_split(df, test_days=test_days)
+    model = xgb.XGBRegressor()
+    model.load_model(model_path)
+    X = test.set_index(xt.TIME_COL)[features]
+    out_dir = Path(out_dir)
+    sb.write_exports(*sb.explain(model, X, backend=backend), out_dir)
+    # ids and actuals alongside y_hat, so hotspots.site_kpis can read the file directly
+    pred = test[[*xt.ID_COLS, xt.TARGET]].set_axis(X.index).assign(y_hat=model.predict(X))
+    pred[[*xt.ID_COLS, "y_hat", xt.TARGET]].to_csv(out_dir / "predictions.csv")
+    X.to_csv(out_dir / "features.csv")
+
+
+def pack_stage(shap_csv, pred_csv, out_json, out_jsonl, units="veh/hr", k_top=5):
+    import convert_shap_json as csj
+
+    csj.build_llm_json(shap_csv=shap_csv, pred_csv=pred_csv, units=units, k_top=k_top,
+                       out_json=out_json, out_jsonl=out_jsonl)
+
+
+def prompt_stage(network_file, detector_file, summary_file, context_file, out_prompt, pack_json=None):
+    import main
+
+    with open(context_file, "r", encoding="utf-8") as f:
+        context_info = f.read().strip()
+    with open(network_file, "r", encoding="utf-8") as f:
+        net_text = f.read()
+    pack = json.loads(Path(pack_json).read_text(encoding="utf-8")) if pack_json else None
+    prompt = main.build_prompt(main.parse_network(network_file), main.parse_detectors(detector_file),
+                               main.parse_summary(summary_file), context_info, net_text, pack)
+    Path(out_prompt).write_text(prompt, encoding="utf-8")
+
+
+def llm_stage(prompt_file, out_raw, model="gpt-5"):
+    import main
+
+    message = main.call_llm(Path(prompt_file).read_text(encoding="utf-8"), model=model)
+    Path(out_raw).write_text(message.content, encoding="utf-8")
+
+
+def patch_stage(network_file, llm_raw, tuning_json, merged, linked, ensured):
+    import xml.etree.ElementTree as ET
+    import modified_network as mn
+
+    tuning_cfg = mn.load_tuning_config(tuning_json)
+    tree = mn.merge_tlLogic_snippets(network_file, llm_raw, merged)
+    tl_to_conns = mn.link_connections_to_tllogic(tree, linked)
+    mn.ensure_tllogic_programs(ET.parse(linked), tl_to_conns, ensured, tuning_cfg)
+
+
+def prescreen_stage(linked, tunings, model_path, lanes_csv, out_json, top_k=3, when=None):
+    """Rank the tuning variants of one LLM proposal by surrogate delay; rebuild_stage drops the rest."""
+    import pandas as pd
+
+    import modified_network as mn
+    import surrogate
+    import tuning_search as ts
+
+    names = list(tunings)
+    cfgs = [mn.load_tuning_config(tunings[n]) for n in names]
+    tl_volumes = surrogate.model_tl_volumes(model_path, pd.read_csv(lanes_csv), when)
+    keep, delay = ts.prescreen_variants(cfgs, ts.tl_link_counts(linked), tl_volumes, top_k)
+    ranking = {"kept": [names[i] for i in keep], "delay": {names[i]: d for i, d in delay.items()}}
+    Path(out_json).write_text(json.dumps(ranking, indent=2), encoding="utf-8")
+
+
+def rebuild_stage(ensured, rebuilt, netconvert_path="netconvert", prescreen_json=None, variant=None):
+    import netconvert_pool
+
+    if prescreen_json and variant not in json.loads(Path(prescreen_json).read_text(encoding="utf-8"))["kept"]:
+        raise SkipStage(f"variant {variant} screened out by the surrogate")
+    # identical ensured networks (e.g. variants whose tuning changes nothing) share one build
+    if not netconvert_pool.rebuild_one(ensured, rebuilt, netconvert_path=netconvert_path):
+        raise RuntimeError("netconvert failed")
+
+
+def simulate_stage(net, trips, detectors, base_cfg, out_dir, batch_name, seeds=(1,),
+                   sumo_binary="sumo", timeout=None, max_workers=None):
+    import scenario_runner as sr
+
+    scenarios = [{"name": f"policy-seed{s}", "net": net, "trips": trips, "detectors": detectors,
+                  "base_cfg": base_cfg, "seed": s} for s in seeds]
+    batch = sr.run_scenarios(scenarios, out_dir=out_dir, batch_name=batch_name, sumo_binary=sumo_binary,
+                             timeout=timeout, max_workers=max_workers)
+    if batch["n_ok"] == 0:
+        raise RuntimeError("all simulation runs failed")
+
+
+def compare_stage(manifest, baseline_detectors, baseline_summary, out_csv, policy):
+    import compare_runs as cr
+
+    runs = cr.runs_from_manifest(manifest)
+    for r in runs:
+        r["policy"] = policy
+    cr.compare_runs(runs, baseline_detectors, baseline_summary).to_csv(out_csv, index=False)
+
+
+def archive_stage(prefix, network_file, llm_raw, tuning_json, merged, linked, ensured, rebuilt, run_dir, out_json,
+                  keep_working=False):
+    """
+    Store the variant with its lineage. Unless keep_working, the generated
+    working copies are then deleted: stages stay cached because hash_path
+    reads archived hashes from the store, and a stage that has to run again
+    gets its inputs checked out of the store first (_run_stage).
+    """
+    import shutil
+
+    import artifact_store as ast
+
+    store = ast.ArtifactStore()
+    hashes = ast.record_variant(store, prefix, network_file, llm_raw, tuning_json,
+                                merged, linked, ensured, rebuilt, run_dir)
+    Path(out_json).write_text(json.dumps(hashes, indent=2), encoding="utf-8")
+    if keep_working:
+        return
+    for step, path in (("merged", merged), ("linked", linked), ("ensured", ensured), ("rebuilt", rebuilt),
+                       ("run", run_dir)):
+        if step in hashes:
+            store.archive_path(path, hashes[step])
+            shutil.rmtree(path) if Path(path).is_dir() else Path(path).unlink()
+
+
+# =========================
+# Default workflow
+# =========================
+
+def build_pipeline(
+    detector_ids=(2906,),
+    variants=None,
+    raw_csv=os.path.join("data", "at-dataset", "SCATS-data", "Scats-Data.csv"),
+    work_dir=os.path.join("results", "pipeline"),
+    seeds=(1,),
+    sumo_binary="sumo",
+    netconvert_path="netconvert",
+    llm_model="gpt-5",
+    prescreen_k=None,
+    lanes_csv=None,
+    keep_working=False,
+):
+    """
+    Stages for every detector (features … llm) and every (detector, tuning variant)
+    pair (patch … compare). variants: {name: tuning json path}; only the patch stage
+    reads it, so editing a tuning file re-runs patch and what follows, nothing earlier.
+    With prescreen_k and lanes_csv (see surrogate.model_tl_volumes) a prescreen
+    stage ranks the variants of each LLM proposal with the detector's model, and
+    only the prescreen_k best are rebuilt, simulated and compared. Generated
+    networks and run folders are moved into the artifact store by the archive
+    stage unless keep_working.
+    """
+    variants = variants or {"default": os.path.join("src", "signal_tuning.json")}
+    work = Path(work_dir)
+    clean_csv = work / "Scats-Data-Clean.csv"
+    baseline = Path("results") / "traffic_simulation_results" / "baseline"
+    stages = [stage("clean", clean_stage, [raw_csv], [clean_csv], {"raw_csv": raw_csv, "out_csv": str(clean_csv)})]
+
+    for det in detector_ids:
+        d = work / str(det)
+        sim = Path("traffic simulation") / str(det)
+        feats, model, shap_dir = d / "features.csv", d / f"xgb-model-{det}.json", d / "shap"
+        pack_json, pack_jsonl = d / "llm_pack.json", d / "llm_pack_local.jsonl"
+        prompt, raw = d / "llm_policy_prompt.txt", d / "raw_llm_output.txt"
+        net = sim / "osm.net.xml"
+        stages += [
+            stage(f"features:{det}", features_stage, [clean_csv], [feats],
+                  {"clean_csv": str(clean_csv), "out_csv": str(feats), "detector_id": det}),
+            stage(f"train:{det}", train_stage, [feats], [model],
+                  {"features_csv": str(feats), "model_out": str(model)}),
+            stage(f"shap:{det}", shap_stage, [feats, model], [shap_dir / "shap_values.csv", shap_dir / "predictions.csv"],
+                  {"features_csv": str(feats), "model_path": str(model), "out_dir": str(shap_dir)}),
+            stage(f"pack:{det}", pack_stage, [shap_dir / "shap_values.csv", shap_dir / "predictions.csv"],
+                  [pack_json, pack_jsonl],
+                  {"shap_csv": str(shap_dir / "shap_values.csv"), "pred_csv": str(shap_dir / "predictions.csv"),
+                   "out_json": str(pack_json), "out_jsonl": str(pack_jsonl)}),
+            stage(f"prompt:{det}", prompt_stage,
+                  [net, baseline / "baseline_detector_output.xml", baseline / "baseline_summary.xml",
+                   Path("results") / "llm" / "context.txt", pack_json],
+                  [prompt],
+                  {"network_file": str(net), "detector_file": str(baseline / "baseline_detector_output.xml"),
+                   "summary_file": str(baseline / "baseline_summary.xml"),
+                   "context_file": str(Path("results") / "llm" / "context.txt"), "out_prompt": str(prompt),
+                   "pack_json": str(pack_json)}),
+            stage(f"llm:{det}", llm_stage, [prompt], [raw],
+                  {"prompt_file": str(prompt), "out_raw": str(raw), "model": llm_model}),
+        ]
+        screen = None
+        if prescreen_k and lanes_csv:
+            # linked networks do not depend on the tuning, so any variant's will do
+            screen = d / "prescreen.json"
+            first_linked = d / next(iter(variants)) / "osm_policy_linked.net.xml"
+            stages.append(stage(f"prescreen:{det}", prescreen_stage, [first_linked, model, lanes_csv, *variants.values()],
+                                [screen],
+                                {"linked": str(first_linked), "tunings": {k: str(t) for k, t in variants.items()},
+                                 "model_path": str(model), "lanes_csv": str(lanes_csv), "out_json": str(screen),
+                                 "top_k": prescreen_k}))
+        for var, tuning in variants.items():
+            v = d / var
+            merged, linked, ensured, rebuilt = (v / f"osm_policy_{s}.net.xml" for s in ("merged", "linked", "ensured", "rebuilt"))
+            gate = {"prescreen_json": str(screen), "variant": var} if screen else {}
+            manifest = v / "runs" / "batch" / "manifest.json"
+            report = v / "comparison.csv"
+            stages += [
+                stage(f"patch:{det}:{var}", patch_stage, [net, raw, tuning], [merged, linked, ensured],
+                      {"network_file": str(net), "llm_raw": str(raw), "tuning_json": str(tuning),
+                       "merged": str(merged), "linked": str(linked), "ensured": str(ensured)}),
+                stage(f"rebuild:{det}:{var}", rebuild_stage, [ensured, *([screen] if screen else [])], [rebuilt],
+                      {"ensured": str(ensured), "rebuilt": str(rebuilt), "netconvert_path": netconvert_path, **gate}),
+                stage(f"simulate:{det}:{var}", simulate_stage,
+                      [rebuilt, sim / "my_entry_exit_trips.trips.xml", sim / "detectors.add.xml", sim / "osm.sumocfg"],
+                      [manifest],
+                      {"net": str(rebuilt), "trips": str(sim / "my_entry_exit_trips.trips.xml"),
+                       "detectors": str(sim / "detectors.add.xml"), "base_cfg": str(sim / "osm.sumocfg"),
+                       "out_dir": str(v / "runs"), "batch_name": "batch", "seeds": list(seeds),
+                       "sumo_binary": sumo_binary}),
+                stage(f"compare:{det}:{var}", compare_stage,
+                      [manifest, baseline / "baseline_detector_output.xml", baseline / "baseline_summary.xml"],
+                      [report],
+                      {"manifest": str(manifest), "baseline_detectors": str(baseline / "baseline_detector_output.xml"),
+                       "baseline_summary": str(baseline / "baseline_summary.xml"), "out_csv": str(report),
+                       "policy": f"{det}:{var}"}),
+                # the comparison is an input so the run folder is only removed after compare read it
+                stage(f"archive:{det}:{var}", archive_stage,
+                      [net, raw, tuning, merged, linked, ensured, rebuilt, manifest, report],
+                      [v / "artifacts.json"],
+                      {"prefix": f"{det}/{var}", "network_file": str(net), "llm_raw": str(raw),
+                       "tuning_json": str(tuning), "merged": str(merged), "linked": str(linked),
+                       "ensured": str(ensured), "rebuilt": str(rebuilt), "run_dir": str(manifest.parent),
+                       "out_json": str(v / "artifacts.json"), "keep_working": keep_working}),
+            ]
+    return stages
+
+
+# =========================
+# CLI
+# =========================
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Run the cached end-to-end pipeline.")
+    ap.add_argument("--detectors", type=int, nargs="+", default=[2906])
+    ap.add_argument("--variant", action="append", default=[], metavar="NAME=TUNING_JSON",
+                    help="tuning variant (repeatable); default: default=src/signal_tuning.json")
+    ap.add_argument("--seeds", type=int, nargs="+", default=[1])
+    ap.add_argument("--only", nargs="*", default=None, help="run only these stages (and their upstream)")
+    ap.add_argument("--force", nargs="*", default=[], help="re-run these stages even if cached")
+    ap.add_argument("-j", "--max-workers", type=int, default=4)
+    ap.add_argument("--dry-run", action="store_true")
+    ap.add_argument("--sumo-binary", default="sumo")
+    ap.add_argument("--netconvert-path", default="netconvert")
+    ap.add_argument("--prescreen-k", type=int, default=None,
+                    help="simulate only the k variants with the lowest surrogate delay (needs --lanes)")
+    ap.add_argument("--lanes", default=None, help="CSV Detector_ID, Lane, Direction, tl for the surrogate")
+    ap.add_argument("--keep-working", action="store_true", help="keep working copies after archiving")
+    profiling.add_cli_args(ap)
+    args = ap.parse_args()
+    profiling.configure_from_args(args)
+
+    variants = dict(v.split("=", 1) for v in args.variant) or None
+    stages = build_pipeline(args.detectors, variants, seeds=args.seeds,
+                            sumo_binary=args.sumo_binary, netconvert_path=args.netconvert_path,
+                            prescreen_k=args.prescreen_k, lanes_csv=args.lanes, keep_working=args.keep_working)
+    status = run_pipeline(stages, max_workers=args.max_workers, force=args.force,
+                          only=args.only, dry_run=args.dry_run)
+    raise SystemExit(1 if "failed" in status.values() else 0)
@@ -0,0 +1,233 @@
+# profiling.py — spans (wall / CPU / peak RSS / counts) for every pipeline stage
+import cProfile
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# =========================
+# Configuration
+# =========================
+# Spans are only recorded once a sink is configured, either with configure()
+# or through the environment (inherited by scenario_runner worker processes):
+#   XAI_TRACE=results/trace.jsonl        (or .json for a Chrome/Perfetto trace)
+#   XAI_PROFILE=results/profile          (cProfile + tracemalloc dump per top-level span)
+
+_config = {
+    "trace": os.environ.get("XAI_TRACE"),
+    "profile_dir": os.environ.get("XAI_PROFILE"),
+}
+_lock = threading.Lock()
+_local = threading.local()
+# tracemalloc is on only while a profiled top-level span runs, and only stopped
+# again if a span started it (a caller's own tracing is left alone)
+_tracing = {"active": 0, "owned": False}
+
+
+def configure(trace=None, profile_dir=None):
+    """Set the span sink (.jsonl = JSON Lines, .json = Chrome trace) and optional profile folder."""
+    _config["trace"] = str(trace) if trace else None
+    _config["profile_dir"] = str(profile_dir) if profile_dir else None
+    # exported so child processes (process pools, subprocess CLIs) record too
+    for key, value in (("XAI_TRACE", _config["trace"]), ("XAI_PROFILE", _config["profile_dir"])):
+        if value:
+            os.environ[key] = value
+        else:
+            os.environ.pop(key, None)
+
+
+def add_cli_args(ap):
+    ap.add_argument("--trace", default=None, help="write spans to FILE (.jsonl, or .json for chrome://tracing)")
+    ap.add_argument("--profile", default=None, metavar="DIR", help="dump cProfile/tracemalloc stats per stage into DIR")
+
+
+def configure_from_args(args):
+    if getattr(args, "trace", None) or getattr(args, "profile", None):
+        configure(args.trace or _config["trace"], args.profile)
+
+
+def enabled():
+    return bool(_config["trace"] or _config["profile_dir"])
+
+
+# =========================
+# Memory
+# =========================
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB (None if unavailable)."""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return round(getattr(info, "peak_wset", info.rss) / 2 ** 20, 1)
+    except ImportError:
+        return None
+
+
+# =========================
+# Sink
+# =========================
+
+def _emit(rec):
+    path = _config["trace"]
+    if not path:
+        return
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    if path.endswith(".json"):
+        # Chrome JSON array format; the closing "]" is optional for the viewers
+        event = {
+            "name": rec["name"], "ph": "X", "pid": rec["pid"], "tid": rec["tid"],
+            "ts": int(rec["start"] * 1e6), "dur": int(rec["wall_s"] * 1e6),
+            "args": {k: v for k, v in rec.items() if k not in ("name", "pid", "tid", "start", "wall_s")},
+        }
+        line = json.dumps(event, default=str) + ",\n"
+        with _lock:
+            new = not os.path.exists(path) or os.path.getsize(path) == 0
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(("[\n" if new else "") + line)
+    else:
+        with _lock, open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(rec, default=str) + "\n")
+
+
+def _safe_name(name):
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in name)
+
+
+# =========================
+# Spans
+# =========================
+
+@contextmanager
+def span(name, **fields):
+    """
+    Time a block. Yields a dict; set counts on it inside the block, e.g.
+        with span("parse_detectors") as sp:
+            ...
+            sp["rows"] = len(rows)
+    """
+    if not enabled():
+        yield {}
+        return
+
+    rec = dict(fields)
+    depth = getattr(_local, "depth", 0)
+    _local.depth = depth + 1
+    profile = _config["profile_dir"] and depth == 0
+    prof = None
+    if profile:
+        prof = cProfile.Profile()
+        with _lock:
+            if _tracing["active"] == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                _tracing["owned"] = True
+            _tracing["active"] += 1
+        tracemalloc.reset_peak()
+        try:
+            prof.enable()
+        except ValueError:  # another profiler is active (concurrent stage on 3.12+)
+            prof = None
+
+    start, t0, c0 = time.time(), time.perf_counter(), time.process_time()
+    status = "ok"
+    try:
+        yield rec
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        wall, cpu = time.perf_counter() - t0, time.process_time() - c0
+        _local.depth = depth
+        out = {
+            "name": name, "start": start, "wall_s": round(wall, 6), "cpu_s": round(cpu, 6),
+            "peak_rss_mb": peak_rss_mb(), "status": status, "depth": depth,
+            "pid": os.getpid(), "tid": threading.get_ident(),
+        }
+        if prof is not None:
+            prof.disable()
+            _, py_peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+            stem = Path(_config["profile_dir"]) / f"{_safe_name(name)}-{os.getpid()}-{int(start * 1000)}"
+            stem.parent.mkdir(parents=True, exist_ok=True)
+            prof.dump_stats(f"{stem}.prof")
+            with open(f"{stem}.mem.txt", "w", encoding="utf-8") as f:
+                for stat in snapshot.statistics("lineno")[:30]:
+                    f.write(f"{stat}\n")
+            out["py_peak_mb"] = round(py_peak / 2 ** 20, 2)
+            out["profile"] = f"{stem}.prof"
+        if profile:
+            with _lock:
+                _tracing["active"] -= 1
+                if _tracing["active"] == 0 and _tracing["owned"]:
+                    tracemalloc.stop()
+                    _tracing["owned"] = False
+        out.update(rec)
+        _emit(out)
+
+
+def traced(name=None, count=None):
+    """
+    Decorator form of span(). count(result) -> int is stored as "count"
+    (rows, elements, links, ...).
+    """
+    def deco(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled():
+                return func(*args, **kwargs)
+            with span(span_name) as sp:
+                result = func(*args, **kwargs)
+                if count is not None and result is not None:
+                    try:
+                        sp["count"] = int(count(result))
+                    except (TypeError, ValueError, KeyError, AttributeError):
+                        pass
+                return result
+        return wrapper
+    return deco
+
+
+# =========================
+# Reading traces
+# =========================
+
+def load_spans(path):
+    """Spans from a .jsonl or Chrome .json trace as a list of dicts."""
+    text = Path(path).read_text(encoding="utf-8").strip()
+    if path.endswith(".json"):
+        events = json.loads(text.rstrip(",") + ("" if text.endswith("]") else "]"))
+        return [{"name": e["name"], "wall_s": e["dur"] / 1e6, **e.get("args", {})} for e in events]
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def summarize(path):
+    """Total wall / CPU seconds, calls and max peak RSS per span name, slowest first."""
+    agg = {}
+    for s in load_spans(path):
+        a = agg.setdefault(s["name"], {"name": s["name"], "calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "peak_rss_mb": 0})
+        a["calls"] += 1
+        a["wall_s"] += s.get("wall_s", 0)
+        a["cpu_s"] += s.get("cpu_s", 0) or 0
+        a["peak_rss_mb"] = max(a["peak_rss_mb"], s.get("peak_rss_mb") or 0)
+    return sorted(agg.values(), key=lambda a: a["wall_s"], reverse=True)
+
+
+if __name__ == "__main__":
+    for row in summarize(sys.argv[1]):
+        print(f"{row['name']:<40} {row['calls']:>5}  wall {row['wall_s']:>9.3f} s  "
+              f"cpu {row['cpu_s']:>9.3f} s  rss {row['peak_rss_mb']} MB")
@@ -0,0 +1,203 @@
+# prompt_assembler.py — policy prompt as ordered segments: cached static prefix, per-iteration data last
+import hashlib
+import json
+
+# =========================
+# Layout
+# =========================
+# Provider-side prompt caching reuses the longest identical prefix, so
+# everything that stays the same across policy iterations (role, schema,
+# rules, examples, network) comes first and the per-run measurements last.
+# Static segments are rendered once per distinct input and memoized by a
+# content hash, so re-running with new detector data does not re-serialize
+# the network XML.
+
+_segment_memo = {}
+
+
+def content_hash(*parts):
+    """sha1 over the JSON form of parts (sorted keys), used as the memo key."""
+    h = hashlib.sha1()
+    for p in parts:
+        h.update(p.encode("utf-8") if isinstance(p, str) else
+                 json.dumps(p, sort_keys=True, default=str).encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def estimate_tokens(text):
+    """Token count with tiktoken when installed, else the ~4 characters per token rule of thumb."""
+    try:
+        import tiktoken
+    except ImportError:
+        return (len(text) + 3) // 4
+    return len(tiktoken.get_encoding("o200k_base").encode(text))
+
+
+# =========================
+# Static segments
+# =========================
+
+ROLE = """\
+You are an expert in Intelligent Transport Systems (ITS) and SUMO traffic simulation.
+
+### GOAL
+Analyze the provided network, detector data, and simulation summary to:
+- Identify congestion and inefficiencies.
+- Propose policy-based changes (lane speed, junction control, signal timing).
+- **Add traffic lights (tlLogic) to junctions that need signalization**.
+"""
+
+SCHEMA_HINT = {
+    "reasoning": [
+        {
+            "edge_or_junction_id": "string",
+            "issue_detected": "string",
+            "proposed_policy": "string",
+            "justification": "string"
+        }
+    ],
+    "actions": [
+        {
+            "type": "update_attribute or create_element",
+            "target": "edge/junction/tlLogic",
+            "id": "string",
+            "attribute": "string (optional)",
+            "new_value": "string (for updates)",
+            "xml_snippet": "string (for new tlLogic creation)"
+        }
+    ],
+    "modified_snippets": [
+        "<edge ...>...</edge>",
+        "<junction ...>...</junction>",
+        "<tlLogic ...>...</tlLogic>"
+    ]
+}
+
+RULES = """\
+### RULES
+- Modify only necessary elements:
+  - Update `lane` speed, `junction` type, or `tlLogic` phases.
+  - If a junction shows high congestion and is currently `priority` or `unregulated`, **create a new tlLogic** with reasonable phase durations (e.g., 45–60 s cycles).
+- When creating a new tlLogic:
+  - Include a valid `<tlLogic id="..." type="actuated">` element in `modified_snippets`.
+  - Make sure the `tlLogic` ID matches the `junction` ID or use a prefix like `TL_`.
+  - Include at least 3–4 `<phase>` elements (e.g., green/yellow/red combinations).
+- Do not return the entire network XML — only the modified snippets.
+- Escape double quotes (") inside XML as (\\") to maintain valid JSON.
+"""
+
+EXAMPLES = """\
+### EXAMPLES
+**New traffic light creation**
+```json
+{
+  "actions": [
+    {
+      "type": "create_element",
+      "target": "tlLogic",
+      "id": "TL_cluster_25772784",
+      "xml_snippet": "<tlLogic id=\\"TL_cluster_25772784\\" type=\\"actuated\\" programID=\\"0\\" offset=\\"0\\">\\n  <phase duration=\\"45\\" state=\\"GGgrrr\\"/>\\n  <phase duration=\\"5\\" state=\\"yygrrr\\"/>\\n  <phase duration=\\"45\\" state=\\"rrrGGg\\"/>\\n  <phase duration=\\"5\\" state=\\"rrryyy\\"/>\\n</tlLogic>"
+    }
+  ]
+}
+```
+
+### OUTPUT REQUIREMENTS
+- Return **only JSON** with `reasoning`, `actions`, and `modified_snippets`.
+- Each XML snippet in `modified_snippets` must be a complete element (`<edge>...</edge>`, `<junction>...</junction>`, or `<tlLogic>...</tlLogic>`).
+"""
+
+
+def _schema(schema_hint):
+    return "### OUTPUT FORMAT\nRespond in valid JSON using this schema:\n" + json.dumps(schema_hint, indent=2) + "\n"
+
+
+def _network(network_info, network_text):
+    return (
+        "### NETWORK (unchanged between iterations)\n"
+        "**Network Summary**\n" + json.dumps(network_info, indent=2) + "\n\n"
+        "**Original Network XML**\n```xml\n" + network_text.strip() + "\n```\n"
+    )
+
+
+def _context(context_info):
+    return "### METADATA / CONTEXT\n" + context_info.strip() + "\n"
+
+
+def _cached(name, render, *inputs):
+    """Render a static segment once per distinct input (keyed by name + content hash)."""
+    key = content_hash(name, *inputs)
+    hit = key in _segment_memo
+    if not hit:
+        text = render(*inputs)
+        _segment_memo[key] = {"text": text, "tokens": estimate_tokens(text)}
+    return {"name": name, "kind": "static", "hash": key, "cached": hit, **_segment_memo[key]}
+
+
+# =========================
+# Dynamic segments
+# =========================
+
+def shap_summary(pack, k=10):
+    """Compact SHAP block from a convert_shap_json pack: global top features only."""
+    if not isinstance(pack, dict) or "global_explanations" not in pack:
+        return None
+    top = pack["global_explanations"].get("top_features", [])[:k]
+    return {
+        "target": pack["global_explanations"].get("target"),
+        "top_features": [{"feature": t["feature"], "mean_abs_shap": round(t["mean_abs_shap"], 3)} for t in top],
+    }
+
+
+def _dynamic(name, title, value):
+    body = value if isinstance(value, str) else json.dumps(value, indent=2, default=str)
+    text = f"**{title}**\n{body}\n"
+    return {"name": name, "kind": "dynamic", "hash": content_hash(text), "cached": False,
+            "text": text, "tokens": estimate_tokens(text)}
+
+
+# =========================
+# Assembly
+# =========================
+
+def assemble_prompt(network_info, detector_info, summary_info, context_info, network_text, shap_pack=None):
+    """
+    Build the policy prompt. Returns (prompt, segments); each segment dict has
+    name, kind (static/dynamic), hash, cached, tokens and text, in prompt order.
+    """
+    segments = [
+        _cached("role", lambda: ROLE),
+        _cached("schema", _schema, SCHEMA_HINT),
+        _cached("rules", lambda: RULES),
+        _cached("examples", lambda: EXAMPLES),
+        _cached("network", _network, network_info, network_text),
+        _cached("context", _context, context_info),
+    ]
+    header = "### CURRENT MEASUREMENTS (this iteration)\n"
+    segments.append({"name": "measurements_header", "kind": "dynamic", "hash": content_hash(header),
+                     "cached": False, "text": header, "tokens": estimate_tokens(header)})
+    segments.append(_dynamic("detectors", "Detector Data", detector_info))
+    segments.append(_dynamic("summary", "Simulation Summary", summary_info))
+    shap = shap_summary(shap_pack)
+    if shap is not None:
+        segments.append(_dynamic("shap", "Model Explanations (SHAP, mean |contribution|)", shap))
+
+    prompt = "\n".join(s["text"] for s in segments)
+    return prompt, segments
+
+
+def segment_report(segments):
+    """Per-segment token estimates plus the cacheable static-prefix total."""
+    rows = [{k: s[k] for k in ("name", "kind", "tokens", "cached")} for s in segments]
+    static = sum(s["tokens"] for s in segments if s["kind"] == "static")
+    return {
+        "segments": rows,
+        "static_prefix_tokens": static,
+        "dynamic_tokens": sum(s["tokens"] for s in segments) - static,
+        "total_tokens": sum(s["tokens"] for s in segments),
+    }
+
+
+def clear_cache():
+    _segment_memo.clear()
@@ -1,58 +1,154 @@
 import subprocess
 from pathlib import Path
 from datetime import datetime
-import shutil
+import xml.etree.ElementTree as ET
 import re
 
-# === 1. Create timestamped folder ===
-timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-outdir = Path.cwd()/"results"/ "traffic_simulation_results"
-results_dir = outdir / f"run_{timestamp}"
-results_dir.mkdir(parents=True, exist_ok=True)
-
-# === 2. Paths to base files ===
-sumo_cfg = Path.cwd() / "traffic simulation" / "2906" / "osm.sumocfg"
-detectors_file = Path.cwd() / "traffic simulation" / "2906" / "detectors.add.xml"
-
-# === 3. Copy detectors file and update its output path ===
-detectors_content = detectors_file.read_text(encoding="utf-8")
-
-# Replace all old output filenames with new path
-safe_path = (results_dir / "detector_output.xml").as_posix()
-updated = re.sub(r'file="[^"]+\.xml"', f'file="{safe_path}"', detectors_content)
-
-new_detectors_path = results_dir / "detectors.add.xml"
-new_detectors_path.write_text(updated, encoding="utf-8")
-
-net_path = Path.cwd() / "Results" / "road-rebuild" / "2nd" / "osm_policy_rebuilt-gpt5.net.xml"
-trips_path = Path.cwd() / "traffic simulation" / "2906" / "my_entry_exit_trips.trips.xml"
-view_path = Path.cwd() / "traffic simulation" / "2906" / "osm.view.xml"
-
-# === 4. Copy SUMO config and update summary + detector path ===
-cfg_content = sumo_cfg.read_text(encoding="utf-8")
-cfg_content = cfg_content.replace(
-    'detectors.add.xml',
-    str(new_detectors_path).replace("\\", "/")
-).replace(
-    'results/summary.xml',
-    f'{results_dir}/summary.xml'
-).replace(
-    'osm.net.xml.gz',
-    str(net_path).replace("\\", "/")
-).replace(
-    'my_entry_exit_trips.trips.xml',
-    str(trips_path).replace("\\", "/")
-).replace(
-    'osm.view.xml',
-    str(view_path).replace("\\", "/")
-)
-
-new_cfg_path = results_dir / "osm_config.sumocfg"
-new_cfg_path.write_text(cfg_content, encoding="utf-8")
-
-# === 5. Run SUMO ===
-print(f"Running SUMO... Results will be saved in: {results_dir}")
-subprocess.run(["sumo-gui", "-c", str(new_cfg_path)], check=True)
-# subprocess.run(["sumo", "-c", str(new_cfg_path)], check=True)
-
-print("Simulation finished!")
+import profiling
+
+# =========================
+# Default inputs (2906 hotspot)
+# =========================
+SIM_DIR = Path("traffic simulation") / "2906"
+RESULTS_DIR = Path("results") / "traffic_simulation_results"
+
+DEFAULT_CFG = SIM_DIR / "osm.sumocfg"
+DEFAULT_DETECTORS = SIM_DIR / "detectors.add.xml"
+DEFAULT_NET = Path("results") / "road-rebuild" / "2nd" / "osm_policy_rebuilt-gpt5.net.xml"
+DEFAULT_TRIPS = SIM_DIR / "my_entry_exit_trips.trips.xml"
+DEFAULT_VIEW = SIM_DIR / "osm.view.xml"
+
+
+# =========================
+# Helpers
+# =========================
+
+def make_run_dir(outdir=RESULTS_DIR, name=None):
+    """Create results/<...>/run_<timestamp> (or outdir/<name>) and return it."""
+    if name is None:
+        name = f"run_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    results_dir = Path(outdir) / name
+    results_dir.mkdir(parents=True, exist_ok=True)
+    return results_dir
+
+
+def write_detectors(detectors_file, results_dir):
+    """
+    Copy the detectors additional file into results_dir, pointing every
+    detector output at results_dir/detector_output.xml.
+    """
+    detectors_content = Path(detectors_file).read_text(encoding="utf-8")
+    safe_path = (Path(results_dir).resolve() / "detector_output.xml").as_posix()
+    updated = re.sub(r'file="[^"]+\.xml"', f'file="{safe_path}"', detectors_content)
+
+    new_detectors_path = Path(results_dir) / "detectors.add.xml"
+    new_detectors_path.write_text(updated, encoding="utf-8")
+    return new_detectors_path
+
+
+def _set_option(root, section, option, value):
+    sec = root.find(section)
+    if sec is None:
+        sec = ET.SubElement(root, section)
+    opt = sec.find(option)
+    if opt is None:
+        opt = ET.SubElement(sec, option)
+    opt.set("value", str(value))
+
+
+# log file options (the other outputs all end in "-output")
+_LOG_OPTIONS = ("log", "message-log", "error-log")
+
+
+def _rebase_paths(root, base_dir, results_dir):
+    """
+    Paths in a copied base cfg are relative to the base cfg's folder: input
+    files become absolute, outputs and logs go to results_dir (same file name).
+    """
+    for section in root:
+        for opt in section:
+            value = opt.get("value")
+            if not value:
+                continue
+            if opt.tag.endswith("-output") or opt.tag in _LOG_OPTIONS:
+                opt.set("value", (results_dir / Path(value).name).as_posix())
+            elif opt.tag.endswith(("-file", "-files")):
+                paths = [(base_dir / p.strip()).resolve().as_posix() for p in value.split(",") if p.strip()]
+                opt.set("value", ",".join(paths))
+
+
+def write_sumocfg(results_dir, net_file, trips_file, detectors_file=None,
+                  base_cfg=None, view_file=None, seed=None, begin=None, end=None):
+    """
+    Write results_dir/osm_config.sumocfg.
+
+    Options from base_cfg (processing, routing, report, ...) are kept; input and
+    output paths are set explicitly instead of string-replacing file names, so
+    the config works for any network/trips pair. Other file options of
+    base_cfg are rebased (see _rebase_paths) since the new cfg lives elsewhere.
+    """
+    results_dir = Path(results_dir).resolve()
+    if base_cfg is not None and Path(base_cfg).exists():
+        root = ET.parse(base_cfg).getroot()
+        _rebase_paths(root, Path(base_cfg).resolve().parent, results_dir)
+    else:
+        root = ET.Element("configuration")
+        _set_option(root, "time", "begin", 0)
+        _set_option(root, "time", "end", 3600)
+
+    _set_option(root, "input", "net-file", Path(net_file).resolve().as_posix())
+    _set_option(root, "input", "route-files", Path(trips_file).resolve().as_posix())
+    if detectors_file is not None:
+        _set_option(root, "input", "additional-files", Path(detectors_file).resolve().as_posix())
+    _set_option(root, "output", "summary-output", (results_dir / "summary.xml").as_posix())
+
+    if begin is not None:
+        _set_option(root, "time", "begin", begin)
+    if end is not None:
+        _set_option(root, "time", "end", end)
+    if seed is not None:
+        _set_option(root, "random_number", "seed", int(seed))
+
+    gui = root.find("gui_only")
+    if view_file is not None and Path(view_file).exists():
+        _set_option(root, "gui_only", "gui-settings-file", Path(view_file).resolve().as_posix())
+    elif gui is not None:
+        root.remove(gui)
+
+    new_cfg_path = results_dir / "osm_config.sumocfg"
+    ET.ElementTree(root).write(new_cfg_path, encoding="utf-8", xml_declaration=True)
+    return new_cfg_path
+
+
+# =========================
+# Run
+# =========================
+
+@profiling.traced("sumo_run")
+def run_simulation(
+    net_file=DEFAULT_NET,
+    trips_file=DEFAULT_TRIPS,
+    detectors_file=DEFAULT_DETECTORS,
+    base_cfg=DEFAULT_CFG,
+    view_file=DEFAULT_VIEW,
+    outdir=RESULTS_DIR,
+    sumo_binary="sumo-gui",
+    seed=None,
+):
+    """Prepare a timestamped run folder and launch SUMO on it (blocking)."""
+    results_dir = make_run_dir(outdir)
+    new_detectors_path = write_detectors(detectors_file, results_dir)
+    new_cfg_path = write_sumocfg(
+        results_dir, net_file, trips_file, new_detectors_path,
+        base_cfg=base_cfg, view_file=view_file, seed=seed,
+    )
+
+    print(f"Running SUMO... Results will be saved in: {results_dir}")
+    subprocess.run([sumo_binary, "-c", str(new_cfg_path)], check=True)
+    print("Simulation finished!")
+    return results_dir
+
+
+if __name__ == "__main__":
+    run_simulation()
+    # run_simulation(sumo_binary="sumo")
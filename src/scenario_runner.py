@@ -0,0 +1,192 @@
+# scenario_runner.py — headless, parallel SUMO runs on top of run_simulation
+import argparse
+import json
+import os
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import profiling
+import run_simulation as rs
+
+# =========================
+# Scenario format
+# =========================
+# A scenario is a plain dict (or one JSON object in a scenarios file):
+# {
+#   "name": "gpt5-seed1",                  # optional, used as the run folder name
+#   "policy": "gpt5",                      # optional, groups seeds in compare_runs (default: net stem)
+#   "net": "results/road-rebuild/2nd/osm_policy_rebuilt-gpt5.net.xml",
+#   "trips": "traffic simulation/2906/my_entry_exit_trips.trips.xml",
+#   "detectors": "traffic simulation/2906/detectors.add.xml",   # optional
+#   "seed": 1,                             # optional
+#   "base_cfg": "traffic simulation/2906/osm.sumocfg",          # optional
+#   "begin": 0, "end": 3600                # optional
+# }
+
+DEFAULT_SUMO_BINARY = os.environ.get("SUMO_BINARY", "sumo")
+
+
+def scenario_name(scenario, index=0):
+    if scenario.get("name"):
+        return str(scenario["name"])
+    stem = Path(scenario["net"]).name.split(".")[0]
+    seed = scenario.get("seed")
+    return f"{index:03d}-{stem}" + (f"-seed{seed}" if seed is not None else "")
+
+
+def scenario_policy(scenario):
+    """Policy a run belongs to: the explicit "policy" field, else the network's file stem."""
+    if scenario.get("policy"):
+        return str(scenario["policy"])
+    return Path(scenario["net"]).name.split(".")[0] if scenario.get("net") else None
+
+
+def prepare_scenario(scenario, run_dir):
+    """Write the isolated detectors/config files for one scenario, return the cfg path."""
+    run_dir = Path(run_dir)
+    run_dir.mkdir(parents=True, exist_ok=True)
+    detectors = scenario.get("detectors")
+    new_detectors = rs.write_detectors(detectors, run_dir) if detectors else None
+    return rs.write_sumocfg(
+        run_dir,
+        scenario["net"],
+        scenario["trips"],
+        new_detectors,
+        base_cfg=scenario.get("base_cfg"),
+        seed=scenario.get("seed"),
+        begin=scenario.get("begin"),
+        end=scenario.get("end"),
+    )
+
+
+# =========================
+# Single run
+# =========================
+
+@profiling.traced("sumo_run")
+def run_scenario(scenario, run_dir, sumo_binary=DEFAULT_SUMO_BINARY, timeout=None, extra_args=()):
+    """
+    Run one scenario headless. Never raises on SUMO failure: the outcome is
+    recorded in run_dir/manifest.json and returned.
+    """
+    run_dir = Path(run_dir)
+    run_dir.mkdir(parents=True, exist_ok=True)
+    manifest = {
+        "name": run_dir.name,
+        "policy": scenario_policy(scenario),
+        "scenario": scenario,
+        "run_dir": str(run_dir),
+        "sumo_binary": sumo_binary,
+        "started": datetime.now().isoformat(timespec="seconds"),
+        "status": "pending",
+        "returncode": None,
+        "wall_time_s": None,
+    }
+    t0 = time.perf_counter()
+    try:
+        cfg = prepare_scenario(scenario, run_dir)
+        cmd = [sumo_binary, "-c", str(cfg), *extra_args]
+        manifest["cmd"] = cmd
+        with open(run_dir / "stdout.log", "w", encoding="utf-8") as out, \
+             open(run_dir / "stderr.log", "w", encoding="utf-8") as err:
+            proc = subprocess.run(cmd, stdout=out, stderr=err, timeout=timeout)
+        manifest["returncode"] = proc.returncode
+        manifest["status"] = "ok" if proc.returncode == 0 else "failed"
+    except subprocess.TimeoutExpired:
+        manifest["status"] = "timeout"
+    except Exception as e:  # noqa: BLE001 — bad scenario files (missing keys, broken XML) are recorded, not raised
+        manifest["status"] = "error"
+        manifest["error"] = f"{type(e).__name__}: {e}"
+    manifest["wall_time_s"] = round(time.perf_counter() - t0, 3)
+    manifest["outputs"] = {
+        "summary": str(run_dir / "summary.xml"),
+        "detectors": str(run_dir / "detector_output.xml"),
+    }
+
+    (run_dir / "manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    return manifest
+
+
+# =========================
+# Batch run
+# =========================
+
+def run_scenarios(
+    scenarios,
+    out_dir=rs.RESULTS_DIR,
+    max_workers=None,
+    timeout=None,
+    sumo_binary=DEFAULT_SUMO_BINARY,
+    batch_name=None,
+):
+    """
+    Run many scenarios through a process pool (max_workers caps concurrent SUMO
+    processes). Each scenario gets its own folder under out_dir/<batch_name>/,
+    and a batch manifest.json lists every run's wall time and exit status.
+    """
+    batch_dir = rs.make_run_dir(out_dir, batch_name or f"batch_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    names = [scenario_name(s, i) for i, s in enumerate(scenarios)]
+    if len(set(names)) != len(names):
+        names = [f"{i:03d}-{n}" for i, n in enumerate(names)]
+
+    print(f"Running {len(scenarios)} scenarios (max_workers={max_workers}) → {batch_dir}")
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = [
+            pool.submit(run_scenario, s, batch_dir / n, sumo_binary, timeout)
+            for s, n in zip(scenarios, names)
+        ]
+        runs = [f.result() for f in futures]
+
+    batch = {
+        "batch_dir": str(batch_dir),
+        "wall_time_s": round(time.perf_counter() - t0, 3),
+        "n_ok": sum(r["status"] == "ok" for r in runs),
+        "n_failed": sum(r["status"] != "ok" for r in runs),
+        "runs": runs,
+    }
+    (batch_dir / "manifest.json").write_text(json.dumps(batch, indent=2), encoding="utf-8")
+    print(f"Finished: {batch['n_ok']} ok, {batch['n_failed']} failed in {batch['wall_time_s']} s")
+    return batch
+
+
+def load_scenarios(path):
+    """Scenarios file: a JSON list of scenario dicts, or JSON Lines."""
+    text = Path(path).read_text(encoding="utf-8").strip()
+    if text.startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+# =========================
+# CLI
+# =========================
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Run SUMO scenarios headless and in parallel.")
+    ap.add_argument("scenarios", help="JSON list / JSON Lines file of scenarios")
+    ap.add_argument("--out-dir", default=str(rs.RESULTS_DIR))
+    ap.add_argument("--name", default=None, help="batch folder name (default batch_<timestamp>)")
+    ap.add_argument("-j", "--max-workers", type=int, default=None)
+    ap.add_argument("--timeout", type=float, default=None, help="per-run timeout in seconds")
+    ap.add_argument("--sumo-binary", default=DEFAULT_SUMO_BINARY)
+    profiling.add_cli_args(ap)
+    args = ap.parse_args(argv)
+    profiling.configure_from_args(args)
+
+    batch = run_scenarios(
+        load_scenarios(args.scenarios),
+        out_dir=args.out_dir,
+        max_workers=args.max_workers,
+        timeout=args.timeout,
+        sumo_binary=args.sumo_binary,
+        batch_name=args.name,
+    )
+    return 0 if batch["n_failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
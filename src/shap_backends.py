@@ -0,0 +1,141 @@
+# shap_backends.py — interchangeable SHAP explainers (shap library / native exact / native approximate)
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import profiling
+
+# =========================
+# Backends
+# =========================
+# Every backend returns (values (n_rows, n_features), base_value) for the same
+# booster and feature frame:
+#   shap     shap.TreeExplainer(feature_perturbation="tree_path_dependent") — what the notebooks use
+#   contribs Booster.predict(pred_contribs=True): same TreeSHAP algorithm, computed inside XGBoost
+#   approx   Booster.predict(approx_contribs=True): Saabas-style path attribution, much faster,
+#            not exact (rows still sum to the prediction)
+
+REFERENCE = "contribs"
+AUTO_MIN_ROWS = 20000     # below this, exact contribs are cheap enough — no selection run
+AUTO_SAMPLE_ROWS = 2000   # rows used to time / compare backends during auto-selection
+DEFAULT_TOLERANCE = 0.05  # max mean |error| relative to mean |exact SHAP| for "approx" to be chosen
+
+
+def _booster(model):
+    return model.get_booster() if hasattr(model, "get_booster") else model
+
+
+def _dmatrix(X):
+    import xgboost as xgb
+
+    return xgb.DMatrix(X, enable_categorical=True)
+
+
+def shap_lib_values(model, X):
+    import shap
+
+    explainer = shap.TreeExplainer(model, feature_perturbation="tree_path_dependent")
+    base = np.ravel(explainer.expected_value)[0]
+    return np.asarray(explainer.shap_values(X)), float(base)
+
+
+def native_values(model, X, approx=False):
+    out = _booster(model).predict(_dmatrix(X), pred_contribs=True, approx_contribs=approx)
+    return out[:, :-1], float(out[0, -1]) if len(out) else 0.0  # last column is the bias term
+
+
+BACKENDS = {
+    "shap": shap_lib_values,
+    "contribs": native_values,
+    "approx": lambda model, X: native_values(model, X, approx=True),
+}
+
+
+def available_backends():
+    names = ["contribs", "approx"]
+    try:
+        import shap  # noqa: F401
+        names.insert(0, "shap")
+    except ImportError:
+        pass
+    return names
+
+
+# =========================
+# Consistency
+# =========================
+
+def compare_values(ref, other):
+    """Error of `other` against `ref` SHAP matrices: max / mean abs, relative mean, top-1 feature agreement."""
+    diff = np.abs(ref - other)
+    scale = np.abs(ref).mean() or 1.0
+    return {
+        "max_abs": float(diff.max()) if diff.size else 0.0,
+        "mean_abs": float(diff.mean()) if diff.size else 0.0,
+        "rel_mean_abs": float(diff.mean() / scale) if diff.size else 0.0,
+        "top1_agreement": float((np.abs(ref).argmax(axis=1) == np.abs(other).argmax(axis=1)).mean()) if diff.size else 1.0,
+    }
+
+
+def consistency_check(model, X, backends=None, sample_rows=AUTO_SAMPLE_ROWS, seed=0):
+    """
+    Run each backend on the same (sampled) rows and compare with the exact
+    native contribs. Returns {backend: {"seconds", "rows_per_s", "base_value", errors...}}.
+    """
+    backends = backends or available_backends()
+    if len(X) > sample_rows:
+        X = X.sample(sample_rows, random_state=seed)
+    report = {}
+    ref = None
+    for name in [REFERENCE] + [b for b in backends if b != REFERENCE]:
+        t0 = time.perf_counter()
+        vals, base = BACKENDS[name](model, X)
+        secs = time.perf_counter() - t0
+        if ref is None:
+            ref = vals
+        if name not in backends:
+            continue
+        report[name] = {"seconds": round(secs, 4), "rows_per_s": round(len(X) / max(secs, 1e-9)),
+                        "base_value": base, **compare_values(ref, vals)}
+    return report
+
+
+def select_backend(model, X, tolerance=DEFAULT_TOLERANCE, backends=None):
+    """
+    Auto rule: small explain sets use exact native contribs. From AUTO_MIN_ROWS
+    rows on, time the backends on a sample and take the fastest whose relative
+    mean error vs exact is within `tolerance`. Returns (name, check report or None).
+    """
+    if len(X) < AUTO_MIN_ROWS:
+        return REFERENCE, None
+    report = consistency_check(model, X, backends or ["contribs", "approx"])
+    ok = [n for n, r in report.items() if r["rel_mean_abs"] <= tolerance]
+    return min(ok, key=lambda n: report[n]["seconds"]), report
+
+
+# =========================
+# Export
+# =========================
+
+@profiling.traced(count=lambda r: len(r[0]))
+def explain(model, X, backend="auto", tolerance=DEFAULT_TOLERANCE):
+    """SHAP values for X as a DataFrame (same index / columns), its base value and the backend used."""
+    check = None
+    if backend == "auto":
+        backend, check = select_backend(model, X, tolerance)
+        print(f"SHAP backend: {backend}" + (f" (checked on {AUTO_SAMPLE_ROWS} rows)" if check else ""))
+    vals, base = BACKENDS[backend](model, X)
+    df = pd.DataFrame(vals, index=X.index, columns=X.columns)
+    return df, {"backend": backend, "base_value": base, "rows": len(X), "check": check}
+
+
+def write_exports(shap_df, meta, out_dir):
+    """shap_values.csv (layout convert_shap_json reads) + base_value.json with backend and check."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    shap_df.to_csv(out_dir / "shap_values.csv")
+    (out_dir / "base_value.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    return out_dir / "shap_values.csv"
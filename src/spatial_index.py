@@ -0,0 +1,326 @@
+# spatial_index.py — link SCATS detectors to SUMO junctions/edges through a grid index
+import argparse
+import gzip
+import hashlib
+import json
+import math
+import re
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_CACHE_DIR = Path("results") / "spatial_index"
+
+# SCATS direction of travel → compass heading (deg) of the approach edge
+DIRECTION_BEARING = {"N": 0, "NE": 45, "E": 90, "SE": 135, "S": 180, "SW": 225, "W": 270, "NW": 315}
+
+
+# =========================
+# Network geometry
+# =========================
+
+def _open(path):
+    return gzip.open(path, "rb") if str(path).endswith(".gz") else open(path, "rb")
+
+
+def _shape(s):
+    return np.array([[float(v) for v in p.split(",")[:2]] for p in s.split()])
+
+
+def network_geometry(net_file):
+    """
+    Junction points, non-internal edge shapes and the <location> projection of a net.xml.
+    """
+    location, junctions, edges = {}, [], []
+    with _open(net_file) as f:
+        for _, elem in ET.iterparse(f, events=("end",)):
+            if elem.tag == "location":
+                location = dict(elem.attrib)
+            elif elem.tag == "junction" and elem.get("type") != "internal":
+                junctions.append((elem.get("id"), elem.get("type"), float(elem.get("x", 0)), float(elem.get("y", 0))))
+            elif elem.tag == "edge" and elem.get("function") != "internal":
+                shape = elem.get("shape")
+                if shape is None:
+                    lane = elem.find("lane")
+                    shape = lane.get("shape") if lane is not None else None
+                if shape:
+                    edges.append({"id": elem.get("id"), "from": elem.get("from"), "to": elem.get("to"),
+                                  "shape": _shape(shape)})
+            if elem.tag in ("junction", "edge", "connection", "tlLogic"):
+                elem.clear()
+    return {"location": location, "junctions": junctions, "edges": edges}
+
+
+# =========================
+# lon/lat → network x/y
+# =========================
+
+def _utm(lon, lat, zone, south):
+    """WGS84 → UTM easting/northing (Snyder series), vectorized."""
+    a, f, k0 = 6378137.0, 1 / 298.257223563, 0.9996
+    e2 = f * (2 - f)
+    ep2 = e2 / (1 - e2)
+    lat, lon = np.radians(lat), np.radians(lon)
+    lon0 = np.radians((zone - 1) * 6 - 180 + 3)
+    N = a / np.sqrt(1 - e2 * np.sin(lat) ** 2)
+    T = np.tan(lat) ** 2
+    C = ep2 * np.cos(lat) ** 2
+    A = np.cos(lat) * (lon - lon0)
+    M = a * ((1 - e2 / 4 - 3 * e2 ** 2 / 64 - 5 * e2 ** 3 / 256) * lat
+             - (3 * e2 / 8 + 3 * e2 ** 2 / 32 + 45 * e2 ** 3 / 1024) * np.sin(2 * lat)
+             + (15 * e2 ** 2 / 256 + 45 * e2 ** 3 / 1024) * np.sin(4 * lat)
+             - (35 * e2 ** 3 / 3072) * np.sin(6 * lat))
+    x = k0 * N * (A + (1 - T + C) * A ** 3 / 6 + (5 - 18 * T + T ** 2 + 72 * C - 58 * ep2) * A ** 5 / 120) + 500000.0
+    y = k0 * (M + N * np.tan(lat) * (A ** 2 / 2 + (5 - T + 9 * C + 4 * C ** 2) * A ** 4 / 24
+                                     + (61 - 58 * T + T ** 2 + 600 * C - 330 * ep2) * A ** 6 / 720))
+    if south:
+        y = y + 10000000.0
+    return x, y
+
+
+def lonlat_to_xy(location, lon, lat):
+    """
+    Project lon/lat into network coordinates using the net's <location>.
+    UTM projections are computed exactly; anything else falls back to a linear
+    map from origBoundary to convBoundary.
+    """
+    lon, lat = np.asarray(lon, dtype=float), np.asarray(lat, dtype=float)
+    proj = location.get("projParameter", "")
+    zone = re.search(r"\+zone=(\d+)", proj)
+    if "+proj=utm" in proj and zone:
+        ox, oy = (float(v) for v in location["netOffset"].split(","))
+        x, y = _utm(lon, lat, int(zone.group(1)), "+south" in proj)
+        return x + ox, y + oy
+    lo0, la0, lo1, la1 = (float(v) for v in location["origBoundary"].split(","))
+    x0, y0, x1, y1 = (float(v) for v in location["convBoundary"].split(","))
+    return x0 + (lon - lo0) / (lo1 - lo0) * (x1 - x0), y0 + (lat - la0) / (la1 - la0) * (y1 - y0)
+
+
+# =========================
+# Grid index
+# =========================
+
+class GridIndex:
+    """
+    Uniform grid over 2-D points: points are sorted by cell so every cell is a
+    contiguous slice. Queries only touch the cells a search radius covers.
+    Batched nearest-point queries go through a scipy cKDTree built on first use.
+    """
+
+    def __init__(self, xy, cell=50.0):
+        self.xy = np.asarray(xy, dtype=float).reshape(-1, 2)
+        self.cell = float(cell)
+        self.origin = self.xy.min(axis=0) if len(self.xy) else np.zeros(2)
+        ij = np.floor((self.xy - self.origin) / self.cell).astype(np.int64)
+        self.ncols = int(ij[:, 0].max()) + 1 if len(ij) else 1
+        self.nrows = int(ij[:, 1].max()) + 1 if len(ij) else 1
+        key = ij[:, 1] * self.ncols + ij[:, 0]
+        self.order = np.argsort(key, kind="stable")
+        self.keys, self.starts = np.unique(key[self.order], return_index=True)
+        self.ends = np.append(self.starts[1:], len(key))
+        self._tree = None
+
+    def _candidates(self, x, y, radius):
+        if not len(self.keys):
+            return np.empty(0, dtype=np.int64)
+        i0, j0 = np.floor((np.array([x, y]) - radius - self.origin) / self.cell).astype(int)
+        i1, j1 = np.floor((np.array([x, y]) + radius - self.origin) / self.cell).astype(int)
+        i0, i1 = max(i0, 0), min(i1, self.ncols - 1)
+        j0, j1 = max(j0, 0), min(j1, self.nrows - 1)
+        if i1 < i0 or j1 < j0:
+            return np.empty(0, dtype=np.int64)
+        rows = np.arange(j0, j1 + 1)
+        want = (rows[:, None] * self.ncols + np.arange(i0, i1 + 1)[None, :]).ravel()
+        pos = np.searchsorted(self.keys, want)
+        pos = pos[(pos < len(self.keys)) & (self.keys[np.minimum(pos, len(self.keys) - 1)] == want)]
+        if len(pos) == 0:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([self.order[s:e] for s, e in zip(self.starts[pos], self.ends[pos])])
+
+    def within(self, x, y, radius):
+        """Indices of points within radius of (x, y), nearest first."""
+        cand = self._candidates(x, y, radius)
+        d = np.hypot(self.xy[cand, 0] - x, self.xy[cand, 1] - y)
+        keep = d <= radius
+        o = np.argsort(d[keep])
+        return cand[keep][o], d[keep][o]
+
+    def nearest(self, x, y, k=1, max_radius=None):
+        """k nearest points; the search radius doubles until k are found (or max_radius)."""
+        r = self.cell
+        span = np.ptp(self.xy, axis=0).max() + self.cell if len(self.xy) else 0
+        limit = max_radius if max_radius is not None else span + np.hypot(*(np.array([x, y]) - self.origin))
+        while True:
+            idx, d = self.within(x, y, min(r, limit))
+            if len(idx) >= k or r >= limit:
+                return idx[:k], d[:k]
+            r *= 2
+
+    def nearest_many(self, xs, ys, max_radius=None):
+        """Nearest point for each query, -1 / inf when nothing is within max_radius."""
+        xs, ys = np.asarray(xs, dtype=float), np.asarray(ys, dtype=float)
+        if not len(self.xy):
+            return np.full(len(xs), -1, dtype=np.int64), np.full(len(xs), np.inf)
+        if self._tree is None:
+            from scipy.spatial import cKDTree
+
+            self._tree = cKDTree(self.xy)
+        bound = np.inf if max_radius is None else np.nextafter(max_radius, np.inf)  # inclusive, like within()
+        d, i = self._tree.query(np.column_stack([xs, ys]), k=1, distance_upper_bound=bound)
+        i = np.where(np.isfinite(d), i, -1).astype(np.int64)
+        return i, d
+
+
+class NetworkIndex:
+    """Junction and edge-shape grid indexes for one network."""
+
+    def __init__(self, net_file, cell=50.0, densify=10.0):
+        geo = network_geometry(net_file)
+        self.location = geo["location"]
+        j = geo["junctions"]
+        self.junction_ids = np.array([r[0] for r in j])
+        self.junction_types = np.array([r[1] for r in j])
+        xy = np.array([[r[2], r[3]] for r in j]).reshape(-1, 2)
+        self.junctions = GridIndex(xy, cell)
+        signal = self.junction_types == "traffic_light"
+        self.signal_ids = self.junction_ids[signal]
+        self.signals = GridIndex(xy[signal], cell)
+        self.edges = geo["edges"]
+        self.incoming = {}
+        for e in self.edges:
+            self.incoming.setdefault(e["to"], []).append(e)
+
+        # edge shapes as densified vertices, each tagged with its edge index
+        pts, owner = [], []
+        for n, e in enumerate(self.edges):
+            s = e["shape"]
+            for a, b in zip(s[:-1], s[1:]):
+                steps = max(int(np.ceil(np.hypot(*(b - a)) / densify)), 1)
+                t = np.linspace(0, 1, steps, endpoint=False)[:, None]
+                pts.append(a + t * (b - a))
+                owner.append(np.full(steps, n))
+            pts.append(s[-1:])
+            owner.append([n])
+        self.edge_owner = np.concatenate(owner) if owner else np.empty(0, dtype=int)
+        self.edge_points = GridIndex(np.vstack(pts) if pts else np.empty((0, 2)), cell)
+
+    def nearest_junction(self, x, y, k=1, signalized=False):
+        grid, ids = (self.signals, self.signal_ids) if signalized else (self.junctions, self.junction_ids)
+        idx, d = grid.nearest(x, y, k)
+        return list(zip(ids[idx], d))
+
+    def nearest_junctions(self, xs, ys):
+        """
+        Batched site snapping: nearest traffic-light junction per query, or the
+        nearest junction of any type where the network has no traffic lights.
+        Returns (junction ids, distances).
+        """
+        si, sd = self.signals.nearest_many(xs, ys)
+        ai, ad = self.junctions.nearest_many(xs, ys)
+        ids = np.full(len(ai), None, dtype=object)
+        ids[ai >= 0] = self.junction_ids[ai[ai >= 0]]
+        hit = si >= 0
+        ids[hit] = self.signal_ids[si[hit]]
+        return ids, np.where(hit, sd, ad)
+
+    def junctions_within(self, x, y, radius):
+        idx, d = self.junctions.within(x, y, radius)
+        return list(zip(self.junction_ids[idx], d))
+
+    def nearest_edge(self, x, y):
+        idx, d = self.edge_points.nearest(x, y, 1)
+        return (self.edges[self.edge_owner[idx[0]]]["id"], float(d[0])) if len(idx) else (None, np.inf)
+
+    def edges_within(self, x, y, radius):
+        idx, d = self.edge_points.within(x, y, radius)
+        seen = {}
+        for e, dd in zip(self.edge_owner[idx], d):
+            seen.setdefault(self.edges[e]["id"], float(dd))
+        return list(seen.items())
+
+
+# =========================
+# Detector mapping (cached per network)
+# =========================
+
+def _hash_file(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()[:16]
+
+
+def _bearing(edge):
+    (x0, y0), (x1, y1) = edge["shape"][-2], edge["shape"][-1]
+    return math.degrees(math.atan2(x1 - x0, y1 - y0)) % 360
+
+
+def map_detectors(net_file, sites, lanes=None, max_dist=150.0, cache_dir=DEFAULT_CACHE_DIR, index=None):
+    """
+    sites: Detector_ID, Latitude, Longitude (Site-List-Coordinates.csv)
+    lanes: optional Detector_ID, Lane, Direction (site_description.csv); Direction is the
+           travel direction and picks the incoming edge with the closest heading.
+    Returns {"sites": {id: {...}}, "lanes": {"<id>-<lane>": edge}}, cached per network hash.
+    """
+    sites = sites[["Detector_ID", "Latitude", "Longitude"]].drop_duplicates("Detector_ID")
+    key_src = sites.to_csv(index=False) + (lanes.to_csv(index=False) if lanes is not None else "")
+    cache = Path(cache_dir) / f"{_hash_file(net_file)}-{hashlib.sha1(key_src.encode()).hexdigest()[:12]}.json"
+    if cache.exists():
+        return json.loads(cache.read_text(encoding="utf-8"))
+
+    index = index or NetworkIndex(net_file)
+    xs, ys = lonlat_to_xy(index.location, sites["Longitude"].to_numpy(), sites["Latitude"].to_numpy())
+
+    site_map = {}
+    juncs, dists = index.nearest_junctions(xs, ys)
+    for det, x, y, junc, d in zip(sites["Detector_ID"], xs, ys, juncs, dists):
+        rec = {"x": round(float(x), 2), "y": round(float(y), 2), "junction": None, "distance": None, "incoming": []}
+        if d <= max_dist:
+            rec.update(junction=str(junc), distance=round(float(d), 2),
+                       incoming=[e["id"] for e in index.incoming.get(junc, [])])
+        site_map[str(int(det))] = rec
+
+    lane_map = {}
+    if lanes is not None:
+        for det, lane, direction in lanes[["Detector_ID", "Lane", "Direction"]].itertuples(index=False):
+            rec = site_map.get(str(int(det)))
+            if not rec or not rec["junction"]:
+                continue
+            target = DIRECTION_BEARING.get(str(direction).strip().upper())
+            inc = index.incoming.get(rec["junction"], [])
+            if target is None or not inc:
+                continue
+            diff = [abs((_bearing(e) - target + 180) % 360 - 180) for e in inc]
+            lane_map[f"{int(det)}-{int(lane)}"] = inc[int(np.argmin(diff))]["id"]
+
+    result = {"net": str(net_file), "sites": site_map, "lanes": lane_map}
+    cache.parent.mkdir(parents=True, exist_ok=True)
+    cache.write_text(json.dumps(result, indent=2), encoding="utf-8")
+    return result
+
+
+# =========================
+# CLI
+# =========================
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Map SCATS detectors to SUMO junctions and incoming edges.")
+    ap.add_argument("net")
+    ap.add_argument("sites_csv", help="Site-List-Coordinates.csv (Detector_ID, Latitude, Longitude)")
+    ap.add_argument("--lanes-csv", default=None, help="site_description.csv (Site, Lane, Direction)")
+    ap.add_argument("--max-dist", type=float, default=150.0)
+    ap.add_argument("--out", default=None)
+    args = ap.parse_args()
+
+    lanes = None
+    if args.lanes_csv:
+        lanes = pd.read_csv(args.lanes_csv).rename(columns={"Site": "Detector_ID"})
+    mapping = map_detectors(args.net, pd.read_csv(args.sites_csv), lanes, max_dist=args.max_dist)
+    text = json.dumps(mapping, indent=2)
+    if args.out:
+        Path(args.out).write_text(text, encoding="utf-8")
+    print(f"Mapped {sum(1 for s in mapping['sites'].values() if s['junction'])}/{len(mapping['sites'])} sites, "
+          f"{len(mapping['lanes'])} lanes")
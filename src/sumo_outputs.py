@@ -0,0 +1,74 @@
+# sumo_outputs.py — streaming readers for SUMO output files
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+# =========================
+# summary.xml
+# =========================
+
+def iter_summary_steps(file):
+    """Yield the attributes of every <step> in a SUMO summary output, streaming."""
+    for _, elem in ET.iterparse(file, events=("end",)):
+        if elem.tag == "step":
+            yield elem.attrib
+        elem.clear()
+
+
+def summary_stats(file):
+    """
+    Aggregate a summary output into one dict.
+    meanTravelTime is already the running mean over all vehicles arrived so
+    far (-1 before the first arrival), so the last valid value is the mean
+    travel time of the run; averaging it over steps would overweight early trips.
+    """
+    n = 0
+    speed_sum = 0.0
+    travel_time = None
+    max_running = 0
+    last = {}
+    for s in iter_summary_steps(file):
+        n += 1
+        speed_sum += float(s.get("meanSpeed", 0))
+        tt = float(s.get("meanTravelTime", -1))
+        if tt >= 0:
+            travel_time = tt
+        max_running = max(max_running, int(s.get("running", 0)))
+        last = s
+    if n == 0:
+        return None
+    return {
+        "mean_speed": round(speed_sum / n, 4),
+        "mean_travel_time": round(travel_time, 4) if travel_time is not None else None,
+        "max_running": max_running,
+        "arrived": int(last.get("arrived", 0)),
+        "teleports": int(last.get("teleports", 0)),
+        "simulation_steps": n,
+    }
+
+
+# =========================
+# detector_output.xml (E1 induction loops)
+# =========================
+DETECTOR_FIELDS = ("begin", "flow", "speed", "occupancy", "nVehContrib")
+
+
+def detector_arrays(file):
+    """
+    Stream an induction-loop output into columnar numpy arrays:
+    id (str), begin, flow, speed, occupancy, nVehContrib.
+    SUMO writes speed=-1 for intervals without vehicles; it is kept as is.
+    """
+    ids = []
+    cols = {k: [] for k in DETECTOR_FIELDS}
+    for _, elem in ET.iterparse(file, events=("end",)):
+        if elem.tag == "interval":
+            a = elem.attrib
+            ids.append(a.get("id"))
+            for k in DETECTOR_FIELDS:
+                cols[k].append(a.get(k, "0"))
+        elem.clear()
+    out = {"id": np.asarray(ids, dtype=str)}
+    for k, v in cols.items():
+        out[k] = np.asarray(v, dtype=float)
+    return out
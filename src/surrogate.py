@@ -0,0 +1,150 @@
+# surrogate.py — fast delay estimates for tuning candidates before any SUMO run
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+
+import modified_network as mn
+
+# =========================
+# Constants
+# =========================
+SAT_FLOW = 1800.0      # veh/h per lane of green
+ANALYSIS_PERIOD = 0.25 # h, HCM incremental-delay horizon
+MODEL_FEATURES = ["Detector_ID", "Lane", "hour", "day", "dayofweek", "month", "year", "is_weekend", "Direction"]
+
+
+# =========================
+# Demand from the volume model
+# =========================
+
+def latest_model(detector_id, models_dir="models"):
+    """Newest models/xgb-model-<id>-<timestamp>.json, else models/xgb-model-<id>.json."""
+    stamped = sorted(glob.glob(os.path.join(models_dir, f"xgb-model-{detector_id}-*.json")))
+    if stamped:
+        return stamped[-1]
+    return os.path.join(models_dir, f"xgb-model-{detector_id}.json")
+
+
+def calendar_features(lanes_df, when):
+    """
+    lanes_df: one row per lane with Detector_ID, Lane, Direction (encoded as in training).
+    Returns the model's feature frame for timestamp `when`.
+    """
+    when = pd.Timestamp(when)
+    X = lanes_df[["Detector_ID", "Lane", "Direction"]].copy()
+    X["hour"] = when.hour
+    X["day"] = when.day
+    X["dayofweek"] = when.dayofweek
+    X["month"] = when.month
+    X["year"] = when.year
+    X["is_weekend"] = int(when.dayofweek >= 5)
+    return X[MODEL_FEATURES]
+
+
+def predict_lane_volumes(model_path, X):
+    """Predicted volume per row of X with a saved XGBoost model."""
+    import xgboost as xgb
+
+    booster = xgb.Booster()
+    booster.load_model(model_path)
+    names = booster.feature_names or list(X.columns)
+    return booster.inplace_predict(X[names].to_numpy(dtype=np.float32))
+
+
+def model_tl_volumes(model_path, lanes, when=None):
+    """
+    Predicted demand per signal for prescreen(). lanes: one row per detector
+    lane with Detector_ID, Lane, Direction (encoded as in training) and tl, the
+    signal the lane feeds. when defaults to the next full hour.
+    Returns {tl_id: [lane volumes]}.
+    """
+    when = pd.Timestamp.now().ceil("h") if when is None else pd.Timestamp(when)
+    vols = np.clip(predict_lane_volumes(model_path, calendar_features(lanes, when)), 0, None)
+    out = {}
+    for tl, v in zip(lanes["tl"].astype(str), vols):
+        out.setdefault(tl, []).append(float(v))
+    return out
+
+
+# =========================
+# Candidate signal plans as arrays
+# =========================
+
+def phase_arrays(candidates, tl_links):
+    """
+    candidates: list of tuning configs (signal_tuning.json schema)
+    tl_links:   {tl_id: number of controlled links}
+    Returns dict of (n_candidates, n_tls) arrays: g_main, g_side, cycle, main_share.
+    """
+    tl_ids = list(tl_links)
+    shape = (len(candidates), len(tl_ids))
+    g_main, g_side, cycle, share = (np.zeros(shape) for _ in range(4))
+    for i, cfg in enumerate(candidates):
+        defaults = cfg.get("defaults", {})
+        per_tl = cfg.get("per_tl", {})
+        for j, tl_id in enumerate(tl_ids):
+            tl_cfg = {**defaults, **per_tl.get(tl_id, {})}
+            phases = mn.build_actuated_phases_from_cfg(tl_links[tl_id], tl_cfg)
+            durs = [p[2] for p in phases]
+            g_main[i, j], g_side[i, j] = durs[0], durs[2]
+            cycle[i, j] = sum(durs)
+            share[i, j] = float(tl_cfg.get("main_share", mn.DEFAULT_TUNING["defaults"]["main_share"]))
+    return {"tl_ids": tl_ids, "g_main": g_main, "g_side": g_side, "cycle": cycle, "main_share": share}
+
+
+def _sorted_demand(tl_ids, tl_volumes):
+    """(n_tls, max_lanes) lane volumes sorted high→low, zero padded, plus lane counts."""
+    if not tl_ids:
+        raise ValueError("no signal has both controlled links and lane volumes")
+    vols = [np.sort(np.asarray(tl_volumes[t], dtype=float))[::-1] for t in tl_ids]
+    width = max(len(v) for v in vols)
+    mat = np.zeros((len(tl_ids), width))
+    for j, v in enumerate(vols):
+        mat[j, :len(v)] = v
+    return mat, np.array([len(v) for v in vols])
+
+
+def webster_delay(q, g, cycle, lanes, sat_flow=SAT_FLOW, period=ANALYSIS_PERIOD):
+    """
+    Average control delay (s/veh) per lane group: Webster uniform delay plus
+    the HCM incremental term, which stays finite for oversaturated groups.
+    q in veh/h, g and cycle in s.
+    """
+    lam = np.clip(g / cycle, 1e-6, 1.0)
+    cap = np.maximum(sat_flow * np.maximum(lanes, 1) * lam, 1e-6)
+    x = q / cap
+    d1 = 0.5 * cycle * (1 - lam) ** 2 / (1 - np.minimum(x, 1.0) * lam)
+    d2 = 900 * period * ((x - 1) + np.sqrt((x - 1) ** 2 + 4 * x / (cap * period)))
+    return d1 + d2
+
+
+def estimate_delay(candidates, tl_links, tl_volumes, volume_scale=1.0):
+    """
+    Demand-weighted mean delay (s/veh) for every candidate, shape (n_candidates,).
+    tl_volumes: {tl_id: per-lane volumes}; the busiest lanes form the main group,
+    mirroring how _states_for_links gives the first main_share links the main green.
+    """
+    arr = phase_arrays(candidates, tl_links)
+    demand, n_lanes = _sorted_demand(arr["tl_ids"], tl_volumes)
+    demand = demand * volume_scale
+    csum = np.cumsum(demand, axis=1)
+    total = csum[np.arange(len(n_lanes)), n_lanes - 1]
+
+    m = np.rint(n_lanes * arr["main_share"]).astype(int)
+    m = np.clip(m, 1, np.maximum(n_lanes - 1, 1))
+    q_main = csum[np.arange(len(n_lanes))[None, :], m - 1]
+    q_side = total - q_main
+
+    d_main = webster_delay(q_main, arr["g_main"], arr["cycle"], m)
+    d_side = webster_delay(q_side, arr["g_side"], arr["cycle"], n_lanes - m)
+    weighted = q_main * d_main + q_side * d_side
+    return weighted.sum(axis=1) / np.maximum(total.sum(), 1e-6)
+
+
+def prescreen(candidates, tl_links, tl_volumes, top_k=10, volume_scale=1.0):
+    """Indices of the top_k candidates by estimated delay (best first) and all estimates."""
+    delay = estimate_delay(candidates, tl_links, tl_volumes, volume_scale)
+    order = np.argsort(delay, kind="stable")[:top_k]
+    return order.tolist(), delay
@@ -0,0 +1,195 @@
+# traci_runner.py — step SUMO through TraCI, stream metrics, stop clearly bad policies early
+import argparse
+import json
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+import profiling
+import scenario_runner as sr
+import sumo_outputs as so
+
+# =========================
+# Early-stop rules
+# =========================
+# A check runs every `check_every` simulated seconds after `warmup`. A check is
+# "bad" when the policy is clearly behind the baseline at the same sim time:
+#   - halting vehicles > halting_ratio * baseline (and at least min_halting), or
+#   - mean speed < speed_ratio * baseline mean speed, or
+#   - teleports exceed the baseline's by more than teleport_margin (gridlock).
+# `patience` consecutive bad checks stop the run.
+DEFAULT_RULES = {
+    "warmup": 300,
+    "check_every": 60,
+    "halting_ratio": 2.0,
+    "min_halting": 20,
+    "speed_ratio": 0.5,
+    "teleport_margin": 25,
+    "patience": 3,
+}
+
+HALTING_SPEED = 0.1  # m/s, same threshold SUMO uses for "halting"
+
+
+def baseline_trajectory(summary_file):
+    """Baseline summary.xml → dict of numpy arrays (time, running, halting, meanSpeed, teleports)."""
+    cols = {"time": [], "running": [], "halting": [], "meanSpeed": [], "teleports": []}
+    for s in so.iter_summary_steps(summary_file):
+        for k in cols:
+            cols[k].append(float(s.get(k, 0)))
+    return {k: np.asarray(v) for k, v in cols.items()}
+
+
+def _baseline_at(base, t):
+    i = min(np.searchsorted(base["time"], t, side="right") - 1, len(base["time"]) - 1)
+    i = max(i, 0)
+    return {k: base[k][i] for k in ("running", "halting", "meanSpeed", "teleports")}
+
+
+def check_step(metrics, base_row, rules):
+    """Return a reason string if this step is clearly worse than the baseline, else None."""
+    if metrics["halting"] >= rules["min_halting"] and \
+            metrics["halting"] > rules["halting_ratio"] * base_row["halting"]:
+        return f"halting {metrics['halting']} vs baseline {int(base_row['halting'])}"
+    if metrics["running"] > 0 and base_row["meanSpeed"] > 0 and \
+            metrics["meanSpeed"] < rules["speed_ratio"] * base_row["meanSpeed"]:
+        return f"meanSpeed {metrics['meanSpeed']:.2f} vs baseline {base_row['meanSpeed']:.2f}"
+    if metrics["teleports"] - base_row["teleports"] > rules["teleport_margin"]:
+        return f"teleports {metrics['teleports']} vs baseline {int(base_row['teleports'])}"
+    return None
+
+
+# =========================
+# Runner
+# =========================
+
+def _import_traci():
+    import traci
+    return traci
+
+
+@profiling.traced("sumo_run_traci", count=lambda r: r[0]["steps"])
+def run_with_traci(
+    scenario,
+    run_dir,
+    baseline=None,
+    sumo_binary=sr.DEFAULT_SUMO_BINARY,
+    rules=None,
+    buffer_size=3600,
+    traci_module=None,
+):
+    """
+    Run one scenario (scenario_runner format) step by step over TraCI.
+
+    Per-step running / halting / meanSpeed / teleports go into an in-memory ring
+    buffer (the last buffer_size steps) and run_dir/metrics.jsonl. With a
+    baseline (summary.xml path or baseline_trajectory dict) the run is closed as
+    soon as DEFAULT_RULES (overridable via rules) say it is clearly worse.
+    traci_module lets a fake TraCI stand in for the real one.
+    """
+    traci = traci_module or _import_traci()
+    rules = {**DEFAULT_RULES, **(rules or {})}
+    if isinstance(baseline, (str, Path)):
+        baseline = baseline_trajectory(baseline)
+
+    run_dir = Path(run_dir)
+    run_dir.mkdir(parents=True, exist_ok=True)
+    buffer = deque(maxlen=buffer_size)
+    manifest = {
+        "name": run_dir.name,
+        "scenario": scenario,
+        "run_dir": str(run_dir),
+        "started": datetime.now().isoformat(timespec="seconds"),
+        "status": "ok",
+        "stop_reason": None,
+        "stop_time": None,
+    }
+
+    speed_var = traci.constants.VAR_SPEED
+    steps = 0            # the buffer only keeps the last buffer_size of them
+    teleports = 0
+    bad_checks = 0
+    next_check = rules["warmup"]
+    t0 = time.perf_counter()
+
+    try:
+        with open(run_dir / "metrics.jsonl", "w", encoding="utf-8") as log:
+            cfg = sr.prepare_scenario(scenario, run_dir)
+            traci.start([sumo_binary, "-c", str(cfg)])   # a failed start is recorded like any other error
+            while traci.simulation.getMinExpectedNumber() > 0:
+                traci.simulationStep()
+                steps += 1
+                for vid in traci.simulation.getDepartedIDList():
+                    traci.vehicle.subscribe(vid, [speed_var])
+                teleports += traci.simulation.getStartingTeleportNumber()
+
+                speeds = np.fromiter(
+                    (r[speed_var] for r in traci.vehicle.getAllSubscriptionResults().values() if r),
+                    dtype=float,
+                )
+                metrics = {
+                    "time": traci.simulation.getTime(),
+                    "running": int(speeds.size),
+                    "halting": int((speeds < HALTING_SPEED).sum()),
+                    "meanSpeed": round(float(speeds.mean()), 3) if speeds.size else 0.0,
+                    "teleports": teleports,
+                }
+                buffer.append(metrics)
+                log.write(json.dumps(metrics) + "\n")
+
+                if baseline is not None and metrics["time"] >= next_check:
+                    next_check = metrics["time"] + rules["check_every"]
+                    reason = check_step(metrics, _baseline_at(baseline, metrics["time"]), rules)
+                    bad_checks = bad_checks + 1 if reason else 0
+                    if bad_checks >= rules["patience"]:
+                        manifest["status"] = "early_stop"
+                        manifest["stop_reason"] = reason
+                        manifest["stop_time"] = metrics["time"]
+                        print(f"Early stop at t={metrics['time']}: {reason}")
+                        break
+    except Exception as e:  # noqa: BLE001 — recorded in the manifest, as scenario_runner does
+        manifest["status"] = "error"
+        manifest["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        try:
+            traci.close()
+        except Exception:
+            pass
+
+    manifest["wall_time_s"] = round(time.perf_counter() - t0, 3)
+    manifest["steps"] = steps
+    manifest["last"] = buffer[-1] if buffer else None
+    (run_dir / "manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    return manifest, buffer
+
+
+# =========================
+# CLI
+# =========================
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Run one scenario over TraCI with early termination.")
+    ap.add_argument("--net", required=True)
+    ap.add_argument("--trips", required=True)
+    ap.add_argument("--detectors", default=None)
+    ap.add_argument("--base-cfg", default=None)
+    ap.add_argument("--seed", type=int, default=None)
+    ap.add_argument("--baseline", default=None, help="baseline summary.xml to compare against")
+    ap.add_argument("--rules", default=None, help="JSON overrides for DEFAULT_RULES")
+    ap.add_argument("--out-dir", default=None)
+    ap.add_argument("--sumo-binary", default=sr.DEFAULT_SUMO_BINARY)
+    profiling.add_cli_args(ap)
+    args = ap.parse_args()
+    profiling.configure_from_args(args)
+
+    scenario = {"net": args.net, "trips": args.trips, "detectors": args.detectors,
+                "base_cfg": args.base_cfg, "seed": args.seed}
+    out_dir = args.out_dir or sr.rs.make_run_dir(name=f"traci_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    manifest, _ = run_with_traci(
+        scenario, out_dir, baseline=args.baseline, sumo_binary=args.sumo_binary,
+        rules=json.loads(args.rules) if args.rules else None,
+    )
+    print(json.dumps({k: manifest[k] for k in ("status", "stop_reason", "wall_time_s")}))
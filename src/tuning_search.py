@@ -0,0 +1,403 @@
+# tuning_search.py — grid / random search over signal_tuning.json with parallel SUMO runs
+import argparse
+import copy
+import hashlib
+import itertools
+import json
+import os
+import random
+import shutil
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+import modified_network as mn
+import profiling
+import scenario_runner as sr
+import sumo_outputs as so
+
+# =========================
+# Search space
+# =========================
+# Keys are dotted paths inside one per-TL tuning dict, values are either a list
+# of candidates or a (low, high) tuple sampled uniformly by the random search.
+DEFAULT_SPACE = {
+    "main_share": [0.55, 0.6, 0.65, 0.7, 0.75],
+    "green.main.dur": [30, 35, 40, 45],
+    "green.main.max": [60, 70, 80],
+    "green.side.dur": [18, 20, 22, 25],
+    "green.side.max": [30, 35, 40],
+}
+
+DEFAULT_CACHE_DIR = Path("results") / "tuning_search" / "cache"
+
+
+def tuning_hash(tuning_cfg):
+    blob = json.dumps(tuning_cfg, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()[:16]
+
+
+def _file_digest(path):
+    if path is None:
+        return None
+    import netconvert_pool
+
+    return netconvert_pool.file_sha1(path)
+
+
+def run_context_hash(linked_net, trips, detectors=None, base_cfg_file=None, seeds=(1,),
+                     sumo_binary=sr.DEFAULT_SUMO_BINARY, netconvert_path=None):
+    """Everything besides the tuning that changes a run: input file contents, seeds and binaries."""
+    binaries = {}
+    for name, binary in (("sumo", sumo_binary), ("netconvert", netconvert_path)):
+        resolved = shutil.which(binary) if binary else None
+        binaries[name] = [binary, _file_digest(resolved) if resolved else None]
+    ctx = {
+        "net": _file_digest(linked_net),
+        "trips": _file_digest(trips),
+        "detectors": _file_digest(detectors),
+        "base_cfg": _file_digest(base_cfg_file),
+        "seeds": sorted(seeds),
+        "binaries": binaries,
+    }
+    return tuning_hash(ctx)
+
+
+def _set_path(d, dotted, value):
+    keys = dotted.split(".")
+    for k in keys[:-1]:
+        d = d.setdefault(k, {})
+    d[keys[-1]] = value
+
+
+def _sanitize(tl_cfg):
+    """Keep min <= dur <= max for both green groups after a change."""
+    for group in tl_cfg.get("green", {}).values():
+        if {"min", "max", "dur"} <= group.keys():
+            group["max"] = max(group["max"], group["min"])
+            group["dur"] = min(max(group["dur"], group["min"]), group["max"])
+    return tl_cfg
+
+
+def _tl_base(base_cfg, tl_id):
+    """Full per-TL dict: defaults overlaid with any existing per_tl entry."""
+    merged = copy.deepcopy(base_cfg.get("defaults", {}))
+    for k, v in copy.deepcopy(base_cfg.get("per_tl", {}).get(tl_id, {})).items():
+        if isinstance(v, dict) and isinstance(merged.get(k), dict):
+            merged[k] = {**merged[k], **v}
+        else:
+            merged[k] = v
+    return merged
+
+
+def make_variant(base_cfg, tl_values):
+    """tl_values: {tl_id: {dotted_path: value}} -> full tuning config."""
+    cfg = copy.deepcopy(base_cfg)
+    cfg.setdefault("per_tl", {})
+    for tl_id, values in tl_values.items():
+        tl_cfg = _tl_base(base_cfg, tl_id)
+        for path, value in values.items():
+            _set_path(tl_cfg, path, value)
+        cfg["per_tl"][tl_id] = _sanitize(tl_cfg)
+    return cfg
+
+
+# =========================
+# Proposals
+# =========================
+
+def grid_variants(base_cfg, tl_ids, space=DEFAULT_SPACE):
+    """Every grid point, applied to all tl_ids at once (keeps the grid size independent of #TLs)."""
+    keys = list(space)
+    grids = [v if isinstance(v, list) else list(v) for v in space.values()]
+    for combo in itertools.product(*grids):
+        values = dict(zip(keys, combo))
+        yield make_variant(base_cfg, {tl: values for tl in tl_ids})
+
+
+def random_variants(base_cfg, tl_ids, space=DEFAULT_SPACE, n=20, seed=0):
+    """n variants, each TL sampled independently."""
+    rng = random.Random(seed)
+
+    def draw(v):
+        if isinstance(v, tuple):
+            lo, hi = v
+            return rng.randint(lo, hi) if isinstance(lo, int) and isinstance(hi, int) else round(rng.uniform(lo, hi), 3)
+        return rng.choice(v)
+
+    for _ in range(n):
+        yield make_variant(base_cfg, {tl: {k: draw(v) for k, v in space.items()} for tl in tl_ids})
+
+
+# =========================
+# Network per variant
+# =========================
+
+def build_variant_net(linked_net, tuning_cfg, out_path):
+    """
+    Regenerate tlLogic programs for a linked network (output of
+    link_connections_to_tllogic) with the given tuning config.
+    Phases are wiped first so ensure_tllogic_programs always rebuilds them.
+    """
+    tree = ET.parse(linked_net)
+    root = tree.getroot()
+    tl_to_conns = mn.count_and_assign_link_indices(root)
+    for tl in root.findall("tlLogic"):
+        if tl.get("id") in tl_to_conns:
+            for p in tl.findall("phase"):
+                tl.remove(p)
+    mn.ensure_tllogic_programs(tree, tl_to_conns, str(out_path), tuning_cfg)
+    return out_path
+
+
+def tl_link_counts(linked_net):
+    """{tl_id: number of connections it controls} from a linked network."""
+    counts = {}
+    for c in ET.parse(linked_net).getroot().iter("connection"):
+        if c.get("tl"):
+            counts[c.get("tl")] = counts.get(c.get("tl"), 0) + 1
+    return counts
+
+
+def prescreen_variants(variants, tl_links, tl_volumes, top_k):
+    """
+    Indices of the top_k variants by surrogate delay (best first) and the delay
+    per kept index. Signals need both links and volumes; without any such
+    signal nothing is screened out (all indices, no estimates).
+    """
+    import surrogate
+
+    links = {t: tl_links[t] for t in tl_volumes if t in tl_links and len(tl_volumes[t])}
+    if not links:
+        print("Surrogate: no signal of the network has lane volumes; prescreening skipped")
+        return list(range(len(variants))), {}
+    keep, delay = surrogate.prescreen(variants, links, tl_volumes, top_k=top_k)
+    print(f"Surrogate kept {len(keep)}/{len(variants)} variants "
+          f"(est. delay {delay[keep[0]]:.1f}–{delay[keep[-1]]:.1f} s/veh)")
+    return keep, {i: float(delay[i]) for i in keep}
+
+
+def score_stats(stats, speed_weight=1.0):
+    """Lower is better: mean travel time (s) minus speed_weight * mean speed (m/s)."""
+    if not stats or stats.get("mean_travel_time") is None:
+        return None
+    return round(stats["mean_travel_time"] - speed_weight * stats["mean_speed"], 4)
+
+
+# =========================
+# Evaluation with cache
+# =========================
+
+def evaluate_variants(
+    variants,
+    linked_net,
+    trips,
+    detectors=None,
+    base_cfg_file=None,
+    seeds=(1,),
+    out_dir=Path("results") / "tuning_search",
+    cache_dir=DEFAULT_CACHE_DIR,
+    sumo_binary=sr.DEFAULT_SUMO_BINARY,
+    max_workers=None,
+    timeout=None,
+    speed_weight=1.0,
+    netconvert_path=None,
+):
+    """
+    Simulate every variant not already in the cache and return
+    [{hash, tuning, stats, score}, ...]. Cache entries live under
+    cache_dir/<run_context_hash>/<tuning hash>.json, so a changed network,
+    trips / detector file, seed list or binary never reuses old results.
+    Failed runs and variants netconvert could not rebuild are not cached.
+    """
+    out_dir = Path(out_dir)
+    cache_dir = Path(cache_dir) / run_context_hash(linked_net, trips, detectors, base_cfg_file, seeds,
+                                                   sumo_binary, netconvert_path)
+    nets_dir = out_dir / "nets"
+    nets_dir.mkdir(parents=True, exist_ok=True)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    results, pending = {}, {}
+    for cfg in variants:
+        h = tuning_hash(cfg)
+        if h in results or h in pending:
+            continue
+        cached = cache_dir / f"{h}.json"
+        if cached.exists():
+            rec = json.loads(cached.read_text(encoding="utf-8"))
+            rec["score"] = score_stats(rec["stats"], speed_weight)  # weight is not part of the key
+            results[h] = rec
+        else:
+            pending[h] = cfg
+    print(f"{len(results)} cached variants, {len(pending)} to simulate")
+
+    nets = {h: build_variant_net(linked_net, cfg, nets_dir / f"{h}.ensured.net.xml") for h, cfg in pending.items()}
+    if netconvert_path and nets:
+        import netconvert_pool
+
+        rebuilt = netconvert_pool.rebuild_many(
+            [{"input": str(net), "output": str(nets_dir / f"{h}.rebuilt.net.xml")} for h, net in nets.items()],
+            netconvert_path=netconvert_path, max_workers=max_workers, timeout=timeout,
+        )
+        for h, res in zip(list(nets), rebuilt):
+            if res["status"] in ("ok", "cached"):
+                nets[h] = Path(res["output"])
+            else:                               # not simulated, not cached: the net was never built
+                del nets[h]
+                results[h] = {"hash": h, "tuning": pending[h], "stats": None, "score": None, "n_runs": 0,
+                              "error": f"netconvert {res['status']} (log: {res['log']})"}
+
+    scenarios, owners = [], []
+    for h, net in nets.items():
+        for seed in seeds:
+            scenarios.append({
+                "name": f"{h}-seed{seed}", "net": str(net), "trips": str(trips),
+                "detectors": detectors, "base_cfg": base_cfg_file, "seed": seed,
+            })
+            owners.append(h)
+
+    if scenarios:
+        batch = sr.run_scenarios(scenarios, out_dir=out_dir / "runs", max_workers=max_workers,
+                                 timeout=timeout, sumo_binary=sumo_binary)
+        per_variant = {}
+        for h, run in zip(owners, batch["runs"]):
+            stats = None
+            summary = Path(run["outputs"]["summary"])
+            if run["status"] == "ok" and summary.exists():
+                stats = so.summary_stats(summary)
+            per_variant.setdefault(h, []).append(stats)
+
+        for h, stats_list in per_variant.items():
+            ok = [s for s in stats_list if s and s.get("mean_travel_time") is not None]
+            rec = {"hash": h, "tuning": pending[h], "stats": None, "score": None, "n_runs": len(ok)}
+            if ok:
+                rec["stats"] = {
+                    "mean_travel_time": sum(s["mean_travel_time"] for s in ok) / len(ok),
+                    "mean_speed": sum(s["mean_speed"] for s in ok) / len(ok),
+                }
+                rec["score"] = score_stats(rec["stats"], speed_weight)
+            if len(ok) == len(stats_list):
+                (cache_dir / f"{h}.json").write_text(json.dumps(rec, indent=2), encoding="utf-8")
+            results[h] = rec
+
+    return list(results.values())
+
+
+def write_best(results, out_path="signal_tuning.json"):
+    """Write the lowest-score variant back in the signal_tuning.json schema."""
+    scored = [r for r in results if r.get("score") is not None]
+    if not scored:
+        print("No successful variant to write.")
+        return None
+    best = min(scored, key=lambda r: r["score"])
+    tuning = {"defaults": best["tuning"].get("defaults", {}), "per_tl": best["tuning"].get("per_tl", {})}
+    Path(out_path).write_text(json.dumps(tuning, indent=2), encoding="utf-8")
+    print(f"Best variant {best['hash']} (score {best['score']}) → {out_path}")
+    return best
+
+
+# =========================
+# Orchestrator
+# =========================
+
+def search(
+    linked_net,
+    trips,
+    tl_ids=None,
+    tuning_json_path="signal_tuning.json",
+    strategy="random",
+    space=DEFAULT_SPACE,
+    n=20,
+    seed=0,
+    best_out="signal_tuning.best.json",
+    tl_volumes=None,
+    prescreen_k=None,
+    model_path=None,
+    lanes=None,
+    when=None,
+    **eval_kwargs,
+):
+    """
+    Propose variants, optionally keep only the prescreen_k best by the surrogate
+    delay estimate, then simulate. Demand for the surrogate is tl_volumes
+    ({tl_id: per-lane volumes}) or, if not given, the volume model's forecast
+    for `when` (model_path plus a lanes frame, see surrogate.model_tl_volumes).
+    """
+    base_cfg = mn.load_tuning_config(tuning_json_path)
+    tl_links = tl_link_counts(linked_net)
+    if tl_ids is None:
+        tl_ids = sorted(tl_links)
+
+    if strategy == "grid":
+        variants = list(grid_variants(base_cfg, tl_ids, space))
+    elif strategy == "random":
+        variants = list(random_variants(base_cfg, tl_ids, space, n=n, seed=seed))
+    else:
+        raise ValueError(f"Unknown strategy: {strategy}")
+    variants.insert(0, base_cfg)  # always score the current config too
+
+    if prescreen_k and tl_volumes is None and model_path and lanes is not None:
+        import surrogate
+
+        tl_volumes = surrogate.model_tl_volumes(model_path, lanes, when)
+    if prescreen_k and tl_volumes:
+        keep, _ = prescreen_variants(variants, tl_links, tl_volumes, prescreen_k)
+        variants = [variants[i] for i in keep]
+
+    print(f"Searching {len(variants)} variants over {len(tl_ids)} signals ({strategy})")
+    results = evaluate_variants(variants, linked_net, trips, **eval_kwargs)
+    results.sort(key=lambda r: (r["score"] is None, r["score"]))
+    write_best(results, best_out)
+    return results
+
+
+# =========================
+# CLI
+# =========================
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Search signal tuning variants with headless SUMO runs.")
+    ap.add_argument("linked_net", help="network after link_connections_to_tllogic (…_linked.net.xml)")
+    ap.add_argument("trips")
+    ap.add_argument("--detectors", default=None)
+    ap.add_argument("--base-cfg", default=None, help="base .sumocfg for processing/report options")
+    ap.add_argument("--tuning", default="signal_tuning.json")
+    ap.add_argument("--strategy", choices=["grid", "random"], default="random")
+    ap.add_argument("-n", type=int, default=20, help="number of random variants")
+    ap.add_argument("--seeds", type=int, nargs="+", default=[1])
+    ap.add_argument("--best-out", default="signal_tuning.best.json")
+    ap.add_argument("-j", "--max-workers", type=int, default=os.cpu_count())
+    ap.add_argument("--timeout", type=float, default=None)
+    ap.add_argument("--sumo-binary", default=sr.DEFAULT_SUMO_BINARY)
+    ap.add_argument("--netconvert-path", default=None, help="rebuild each variant with netconvert first")
+    ap.add_argument("--prescreen-k", type=int, default=None, help="simulate only the k best by surrogate delay")
+    ap.add_argument("--volumes", default=None,
+                    help='JSON {tl_id: [lane volumes]} for the surrogate (instead of the model forecast)')
+    ap.add_argument("--lanes", default=None,
+                    help="CSV Detector_ID, Lane, Direction, tl: lanes whose forecast feeds the surrogate")
+    ap.add_argument("--model", default=None, help="volume model (default: newest for --detector)")
+    ap.add_argument("--detector", type=int, default=2906)
+    ap.add_argument("--when", default=None, help="forecast time (default: next full hour)")
+    profiling.add_cli_args(ap)
+    args = ap.parse_args()
+    profiling.configure_from_args(args)
+
+    tl_volumes, lanes, model_path = None, None, None
+    if args.volumes:
+        with open(args.volumes, "r", encoding="utf-8") as f:
+            tl_volumes = json.load(f)
+    elif args.lanes:
+        import pandas as pd
+        import surrogate
+
+        lanes = pd.read_csv(args.lanes)
+        model_path = args.model or surrogate.latest_model(args.detector)
+
+    search(
+        args.linked_net, args.trips,
+        tuning_json_path=args.tuning, strategy=args.strategy, n=args.n,
+        best_out=args.best_out, tl_volumes=tl_volumes, prescreen_k=args.prescreen_k,
+        model_path=model_path, lanes=lanes, when=args.when,
+        detectors=args.detectors, base_cfg_file=args.base_cfg, seeds=tuple(args.seeds),
+        sumo_binary=args.sumo_binary, max_workers=args.max_workers, timeout=args.timeout,
+        netconvert_path=args.netconvert_path,
+    )
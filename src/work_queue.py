@@ -0,0 +1,334 @@
+# work_queue.py — broker-less job queue on a shared directory: atomic-rename claims, leases, retries
+import argparse
+import importlib
+import json
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+import profiling
+
+DEFAULT_ROOT = Path("results") / ".queue"
+LEASE_S = 60.0        # a running job whose file was not touched for this long is requeued
+MAX_ATTEMPTS = 3
+
+# =========================
+# Layout
+# =========================
+#   <root>/pending/<id>.json    waiting jobs; ids sort by submit time
+#   <root>/running/<id>~<claim>.json
+#                               claimed: a worker renamed it here (only one rename can win);
+#                               <claim> is new for every attempt
+#   <root>/done/<id>.json       result manifest (job + result + worker + timings)
+#   <root>/failed/<id>.json     out of attempts, with the last error
+#   <root>/tmp/                 files are written here first, then renamed into place
+# The lease is the running file's mtime: the owning worker touches it every
+# LEASE_S / 3 s. Any worker that finds a stale running file takes it over with
+# one more rename and puts it back in pending (attempt + 1), so a crashed
+# node's jobs are retried elsewhere. A finishing worker renames its own running
+# file into tmp/ before filing the result: that rename and the reaper's compete
+# for the same file, so exactly one of them wins. Everything relies only on
+# rename being atomic within one filesystem (true for local disks and NFS).
+
+STATES = ("pending", "running", "done", "failed")
+
+
+def init_queue(root=DEFAULT_ROOT):
+    root = Path(root)
+    for sub in (*STATES, "tmp"):
+        (root / sub).mkdir(parents=True, exist_ok=True)
+    return root
+
+
+def _write_json(root, dest, record):
+    tmp = Path(root) / "tmp" / f"{uuid.uuid4().hex}.json"
+    tmp.write_text(json.dumps(record, indent=2, default=str), encoding="utf-8")
+    os.replace(tmp, dest)
+
+
+def _read_json(path):
+    return json.loads(Path(path).read_text(encoding="utf-8"))
+
+
+def _job_id(path):
+    return path.stem.rsplit("~", 1)[0] if path.parent.name == "running" else path.stem
+
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+# =========================
+# Submit / status
+# =========================
+
+def submit(root, task, params=None, job_id=None, max_attempts=MAX_ATTEMPTS):
+    """Queue one job (task name from TASKS, params as kwargs). Returns the job id."""
+    root = init_queue(root)
+    if task not in TASKS:
+        raise KeyError(f"unknown task {task!r}; known: {sorted(TASKS)}")
+    job_id = job_id or f"{time.time_ns()}-{task}-{uuid.uuid4().hex[:6]}"
+    job = {"id": job_id, "task": task, "params": params or {}, "attempt": 0,
+           "max_attempts": max_attempts, "submitted": _now(), "errors": []}
+    _write_json(root, root / "pending" / f"{job_id}.json", job)
+    return job_id
+
+
+def status(root=DEFAULT_ROOT):
+    root = Path(root)
+    return {s: sorted(_job_id(p) for p in (root / s).glob("*.json")) for s in STATES}
+
+
+def wait(root, job_ids, timeout=None, poll=0.5):
+    """Block until every job is done or failed; returns {id: manifest}."""
+    root = Path(root)
+    t0, out = time.monotonic(), {}
+    while len(out) < len(job_ids):
+        for j in job_ids:
+            if j in out:
+                continue
+            for state in ("done", "failed"):
+                p = root / state / f"{j}.json"
+                if p.exists():
+                    out[j] = _read_json(p)
+        if len(out) < len(job_ids):
+            if timeout is not None and time.monotonic() - t0 > timeout:
+                raise TimeoutError(f"{len(job_ids) - len(out)} jobs still open after {timeout} s")
+            time.sleep(poll)
+    return out
+
+
+# =========================
+# Leases
+# =========================
+
+def _lease_age(path):
+    st = path.stat()
+    return time.time() - max(st.st_mtime, st.st_ctime)  # rename bumps ctime, touch bumps mtime
+
+
+def requeue_expired(root, lease_s=LEASE_S):
+    """Move running jobs with stale leases back to pending (or to failed after max_attempts)."""
+    root = Path(root)
+    moved = []
+    for path in (root / "running").glob("*.json"):
+        try:
+            if _lease_age(path) < lease_s:
+                continue
+            mine = root / "tmp" / f"reap-{uuid.uuid4().hex}.json"
+            os.rename(path, mine)            # only one reaper wins
+        except FileNotFoundError:
+            continue
+        job = _read_json(mine)
+        job["errors"].append({"attempt": job["attempt"], "worker": job.get("worker"),
+                              "error": f"lease expired after {lease_s} s", "at": _now()})
+        state = "failed" if job["attempt"] >= job["max_attempts"] else "pending"
+        _write_json(root, root / state / f"{job['id']}.json", job)
+        mine.unlink()
+        moved.append((job["id"], state))
+    return moved
+
+
+class _Heartbeat(threading.Thread):
+    """Touch the running file until stopped; `lost` is set if another worker took the job over."""
+
+    def __init__(self, path, interval):
+        super().__init__(daemon=True)
+        self.path, self.interval = path, interval
+        self.stop_event, self.lost = threading.Event(), False
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                os.utime(self.path)
+            except FileNotFoundError:
+                self.lost = True
+                return
+
+    def stop(self):
+        self.stop_event.set()
+        self.join()
+
+
+# =========================
+# Worker
+# =========================
+
+def claim(root, worker_id):
+    """Atomically take the oldest pending job; None if the queue is empty."""
+    root = Path(root)
+    for path in sorted((root / "pending").glob("*.json")):
+        running = root / "running" / f"{path.stem}~{uuid.uuid4().hex[:8]}.json"
+        try:
+            os.rename(path, running)
+        except FileNotFoundError:
+            continue                          # another worker was faster
+        os.utime(running)
+        job = _read_json(running)
+        job.update(attempt=job["attempt"] + 1, worker=worker_id, started=_now())
+        _write_json(root, running, job)
+        return job, running
+    return None
+
+
+def run_job(root, job, running, worker_id, lease_s=LEASE_S):
+    """Execute one claimed job with heartbeats and file its manifest under done/ or failed/."""
+    root = Path(root)
+    beat = _Heartbeat(running, lease_s / 3)
+    beat.start()
+    t0 = time.perf_counter()
+    try:
+        with profiling.span(f"job:{job['task']}", job=job["id"]):
+            result, error = TASKS[job["task"]](**job["params"]), None
+    except Exception as e:  # noqa: BLE001 — any task failure is recorded, not raised
+        result, error = None, f"{type(e).__name__}: {e}\n{traceback.format_exc(limit=5)}"
+    finally:
+        beat.stop()
+    job["wall_time_s"] = round(time.perf_counter() - t0, 3)
+    job["finished"] = _now()
+
+    finishing = root / "tmp" / f"finish-{uuid.uuid4().hex}.json"
+    try:
+        os.rename(running, finishing)        # claims completion; fails if the lease was reaped meanwhile
+    except FileNotFoundError:
+        print(f"[{worker_id}] lease on {job['id']} lost; result discarded")
+        return "lost"
+    if error is None:
+        job["result"] = result
+        state = "done"
+    else:
+        job["errors"].append({"attempt": job["attempt"], "worker": worker_id, "error": error, "at": _now()})
+        state = "failed" if job["attempt"] >= job["max_attempts"] else "pending"
+    _write_json(root, root / state / f"{job['id']}.json", job)
+    finishing.unlink()
+    return state
+
+
+def run_worker(root=DEFAULT_ROOT, worker_id=None, lease_s=LEASE_S, max_jobs=None, idle_exit=None, poll=1.0):
+    """
+    Claim and run jobs until max_jobs have run, or the queue has been empty for
+    idle_exit seconds (None = run forever). Returns {state: count}.
+    """
+    root = init_queue(root)
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    counts, idle_since = {}, time.monotonic()
+    while max_jobs is None or sum(counts.values()) < max_jobs:
+        requeue_expired(root, lease_s)
+        claimed = claim(root, worker_id)
+        if claimed is None:
+            if idle_exit is not None and time.monotonic() - idle_since > idle_exit:
+                break
+            time.sleep(poll)
+            continue
+        job, running = claimed
+        print(f"[{worker_id}] {job['id']} (attempt {job['attempt']}/{job['max_attempts']})")
+        state = run_job(root, job, running, worker_id, lease_s)
+        counts[state] = counts.get(state, 0) + 1
+        idle_since = time.monotonic()
+    return counts
+
+
+# =========================
+# Tasks
+# =========================
+# Thin wrappers over the existing stage functions; params must be JSON.
+
+def task_features(clean_csv, out_csv, detector_id):
+    import pipeline
+
+    pipeline.features_stage(clean_csv, out_csv, detector_id)
+    return {"features": out_csv}
+
+
+def task_train(features_csv, model_out, valid_days=14, test_days=14):
+    import pipeline
+
+    pipeline.train_stage(features_csv, model_out, valid_days=valid_days, test_days=test_days)
+    return {"model": model_out}
+
+
+def task_shap_chunk(features_csv, model_path, out_csv, start, stop, backend="contribs"):
+    """SHAP values for rows [start, stop) of a feature CSV; chunks are concatenated afterwards."""
+    import shap_backends
+    from model_update import load_features, load_regressor
+
+    df, features = load_features(features_csv, start, stop)
+    shap_df, meta = shap_backends.explain(load_regressor(model_path), df[features], backend=backend)
+    shap_df.to_csv(out_csv)
+    return {"shap_values": out_csv, "rows": len(shap_df), "backend": meta["backend"]}
+
+
+def task_netconvert(jobs, netconvert_path="netconvert", max_workers=1, timeout=None):
+    import netconvert_pool
+
+    results = netconvert_pool.rebuild_many(jobs, netconvert_path, max_workers=max_workers, timeout=timeout)
+    failed = [r for r in results if r["status"] not in ("ok", "cached")]
+    if failed:
+        raise RuntimeError(f"{len(failed)} netconvert job(s) failed: {[r['input'] for r in failed]}")
+    return results
+
+
+def task_simulate(scenario, run_dir, sumo_binary=None, timeout=None):
+    import scenario_runner as sr
+
+    manifest = sr.run_scenario(scenario, run_dir, sumo_binary or sr.DEFAULT_SUMO_BINARY, timeout)
+    if manifest["status"] != "ok":
+        raise RuntimeError(f"SUMO run {manifest['status']} (see {run_dir})")
+    return manifest
+
+
+def task_call(func, args=(), kwargs=None):
+    """Any importable function, as "module:function" (for one-off jobs)."""
+    module, name = func.split(":")
+    return getattr(importlib.import_module(module), name)(*args, **(kwargs or {}))
+
+
+TASKS = {
+    "features": task_features,
+    "train": task_train,
+    "shap_chunk": task_shap_chunk,
+    "netconvert": task_netconvert,
+    "simulate": task_simulate,
+    "call": task_call,
+}
+
+
+# =========================
+# CLI
+# =========================
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Shared-directory job queue (submit / work / status).")
+    ap.add_argument("--root", default=str(DEFAULT_ROOT), help="queue directory on the shared filesystem")
+    profiling.add_cli_args(ap)
+    sub = ap.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("submit", help="queue jobs from a JSON list / JSON Lines file of {task, params}")
+    p.add_argument("jobs")
+    p.add_argument("--max-attempts", type=int, default=MAX_ATTEMPTS)
+    p = sub.add_parser("work", help="run a worker on this node")
+    p.add_argument("--worker-id", default=None)
+    p.add_argument("--lease", type=float, default=LEASE_S)
+    p.add_argument("--max-jobs", type=int, default=None)
+    p.add_argument("--idle-exit", type=float, default=None, help="stop after this many idle seconds")
+    sub.add_parser("status")
+    p = sub.add_parser("requeue", help="requeue expired leases now")
+    p.add_argument("--lease", type=float, default=LEASE_S)
+    args = ap.parse_args()
+    profiling.configure_from_args(args)
+
+    if args.command == "submit":
+        text = Path(args.jobs).read_text(encoding="utf-8").strip()
+        specs = json.loads(text) if text.startswith("[") else [json.loads(l) for l in text.splitlines() if l.strip()]
+        for spec in specs:
+            print(submit(args.root, spec["task"], spec.get("params"), max_attempts=args.max_attempts))
+    elif args.command == "work":
+        print(run_worker(args.root, args.worker_id, args.lease, args.max_jobs, args.idle_exit))
+    elif args.command == "status":
+        print(json.dumps({s: len(ids) for s, ids in status(args.root).items()}, indent=2))
+    elif args.command == "requeue":
+        print(requeue_expired(args.root, args.lease))
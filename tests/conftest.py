@@ -0,0 +1,36 @@
+# The modules under src/ import each other by bare name (scripts are run from src/);
+# benchmarks/ is importable for its timing helpers.
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+sys.path.insert(1, str(Path(__file__).resolve().parents[1] / "benchmarks"))
+
+STUBS = Path(__file__).resolve().parent / "stubs"
+
+
+def make_stub(tmp_path, name):
+    """Executable wrapper around tests/stubs/<name>.py, usable wherever a binary path is expected."""
+    path = tmp_path / "bin" / name
+    path.parent.mkdir(exist_ok=True)
+    path.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{STUBS / (name + ".py")}" "$@"\n', encoding="utf-8")
+    path.chmod(0o755)
+    return str(path)
+
+
+@pytest.fixture
+def stub_sumo(tmp_path, monkeypatch):
+    """(binary, call log): stub SUMO that records each run in the log file."""
+    log = tmp_path / "sumo_calls.log"
+    monkeypatch.setenv("STUB_SUMO_LOG", str(log))
+    return make_stub(tmp_path, "sumo"), log
+
+
+@pytest.fixture
+def stub_netconvert(tmp_path, monkeypatch):
+    """(binary, call log): stub netconvert that records each build in the log file."""
+    log = tmp_path / "netconvert_calls.log"
+    monkeypatch.setenv("STUB_NETCONVERT_LOG", str(log))
+    return make_stub(tmp_path, "netconvert"), log
@@ -0,0 +1,30 @@
+# Stand-in for netconvert: copies -s to -o after a short pause. Every build appends
+# "start <src>" and "end <src>" lines to $STUB_NETCONVERT_LOG, so tests can count builds
+# and replay how many overlapped. A source name containing "fail" exits 1, "slow" sleeps 5 s.
+import os
+import shutil
+import sys
+import time
+
+args = sys.argv[1:]
+if "--version" in args:
+    print("Eclipse SUMO netconvert Version stub-1.0")
+    sys.exit(0)
+src, out = args[args.index("-s") + 1], args[args.index("-o") + 1]
+
+
+def log(event):
+    if os.environ.get("STUB_NETCONVERT_LOG"):
+        with open(os.environ["STUB_NETCONVERT_LOG"], "a", encoding="utf-8") as f:
+            f.write(f"{event} {src}\n")
+
+
+log("start")
+if "fail" in os.path.basename(src):
+    print("Error: broken net", file=sys.stderr)
+    log("end")
+    sys.exit(1)
+time.sleep(5 if "slow" in os.path.basename(src) else 0.3)
+print("Loading net... done.")
+shutil.copyfile(src, out)
+log("end")
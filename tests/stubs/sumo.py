@@ -0,0 +1,41 @@
+# Stand-in for the sumo binary: reads a .sumocfg, checks its inputs and writes summary.xml.
+# Relative paths resolve against the config file, as in SUMO. Every call is appended to
+# $STUB_SUMO_LOG. A net file name containing "fail" exits 1, "slow" sleeps 5 s.
+import os
+import sys
+import time
+import xml.etree.ElementTree as ET
+import zlib
+from pathlib import Path
+
+cfg = Path(sys.argv[sys.argv.index("-c") + 1])
+opts = {opt.tag: opt.get("value") for sec in ET.parse(cfg).getroot() for opt in sec}
+if os.environ.get("STUB_SUMO_LOG"):
+    with open(os.environ["STUB_SUMO_LOG"], "a", encoding="utf-8") as f:
+        f.write(f"{cfg}\n")
+
+
+def resolve(value):
+    return [cfg.parent / p for p in value.split(",")]
+
+
+for key in ("net-file", "route-files", "additional-files"):
+    for path in resolve(opts[key]) if key in opts else []:
+        if not path.exists():
+            print(f"Error: Could not access {key} '{path}'", file=sys.stderr)
+            sys.exit(2)
+
+net = resolve(opts["net-file"])[0]
+if "fail" in net.name:
+    sys.exit(1)
+if "slow" in net.name:
+    time.sleep(5)
+
+# deterministic "travel time" per network content and seed
+base = zlib.crc32(net.read_bytes()) % 100 + int(opts.get("seed", 0))
+with open(resolve(opts["summary-output"])[0], "w", encoding="utf-8") as f:
+    f.write("<summary>\n")
+    for step in range(5):
+        f.write(f'  <step time="{step}.00" running="{step}" arrived="{step}" '
+                f'meanSpeed="10.00" meanTravelTime="{base + step}.00"/>\n')
+    f.write("</summary>\n")
@@ -0,0 +1,27 @@
+import artifact_store as ast
+
+
+def test_archived_paths_can_be_looked_up_and_restored(tmp_path):
+    store = ast.ArtifactStore(tmp_path / "store")
+    run = tmp_path / "run"
+    run.mkdir()
+    (run / "summary.xml").write_text("<summary/>", encoding="utf-8")
+    net = tmp_path / "a.net.xml"
+    net.write_text("<net/>", encoding="utf-8")
+
+    tree, file_h = store.put_dir(run), store.put(net)
+    store.tag("v/run", tree)
+    store.archive_path(run, tree)
+    store.archive_path(net, file_h)
+    assert store.lookup_path(run / "summary.xml") == store.tree(tree)["summary.xml"]
+    assert store.lookup_path(run / "missing.xml") is None
+    assert store.lookup_path(tmp_path / "other.xml") is None
+
+    (run / "summary.xml").unlink()
+    net.unlink()
+    assert store.restore(run) and (run / "summary.xml").read_text() == "<summary/>"
+    assert store.restore(net) and net.read_text() == "<net/>"
+
+    store.gc()                                    # a.net.xml has no ref
+    assert store.lookup_path(net) is None
+    assert store.lookup_path(run) == tree
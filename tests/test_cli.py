@@ -0,0 +1,15 @@
+import subprocess
+import sys
+
+import run_benchmarks as rb
+
+
+def test_help_starts_within_budget():
+    assert rb.cli_startup(repeats=10) <= rb.STARTUP_BUDGET     # best of 10, so one slow spawn does not fail it
+
+
+def test_help_loads_no_heavy_modules():
+    code = ("import sys; sys.path.insert(0, sys.argv[1]); import cli; cli.build_parser().format_help(); "
+            "print(','.join(m for m in ('numpy', 'pandas', 'xgboost', 'shap', 'openai') if m in sys.modules))")
+    out = subprocess.run([sys.executable, "-c", code, str(rb.CLI.parent)], capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == ""
@@ -0,0 +1,49 @@
+import json
+
+import compare_runs as cr
+import scenario_runner as sr
+
+
+def _baseline(tmp_path):
+    det = tmp_path / "base_det.xml"
+    det.write_text('<detector><interval begin="0" end="60" id="d1" flow="10" speed="5" occupancy="1" '
+                   'nVehContrib="1"/></detector>', encoding="utf-8")
+    summ = tmp_path / "base_summary.xml"
+    summ.write_text('<summary><step time="0" running="1" arrived="2" meanSpeed="9" meanTravelTime="50"/>'
+                    '</summary>', encoding="utf-8")
+    return det, summ
+
+
+def _batch(tmp_path, sumo, nets):
+    trips = tmp_path / "trips.xml"
+    trips.write_text("<routes/>", encoding="utf-8")
+    scenarios = []
+    for net in nets:
+        (tmp_path / f"{net}.net.xml").write_text(f"<net id='{net}'/>", encoding="utf-8")
+        scenarios += [{"net": str(tmp_path / f"{net}.net.xml"), "trips": str(trips), "seed": s} for s in (1, 2, 3)]
+    sr.run_scenarios(scenarios, out_dir=tmp_path / "runs", max_workers=2, sumo_binary=sumo, batch_name="b")
+    return tmp_path / "runs" / "b" / "manifest.json"
+
+
+def test_unnamed_seeds_group_by_net(tmp_path, stub_sumo):
+    manifest = _batch(tmp_path, stub_sumo[0], ["policyA", "policyB"])
+    runs = cr.runs_from_manifest(manifest)
+    assert sorted({r["policy"] for r in runs}) == ["policyA", "policyB"]
+    det, summ = _baseline(tmp_path)
+    report = cr.compare_runs(runs, det, summ, cache_dir=tmp_path / "cache", n_boot=50)
+    assert sorted(report["policy"]) == ["policyA", "policyB"]
+    assert (report["n_seeds"] == 3).all()
+    assert (report["d_travel_time_lo"] < report["d_travel_time_hi"]).all()
+
+
+def test_explicit_policy_field_wins(tmp_path):
+    assert sr.scenario_policy({"net": "x/gpt5.net.xml"}) == "gpt5"
+    assert sr.scenario_policy({"net": "x/gpt5.net.xml", "policy": "llm"}) == "llm"
+
+
+def test_all_failed_batch_gives_empty_report(tmp_path, stub_sumo):
+    manifest = _batch(tmp_path, stub_sumo[0], ["fail"])
+    assert json.loads(manifest.read_text())["n_ok"] == 0
+    det, summ = _baseline(tmp_path)
+    report = cr.compare_runs(cr.runs_from_manifest(manifest), det, summ, cache_dir=tmp_path / "cache")
+    assert report.empty and list(report.columns) == ["rank", "policy", "n_seeds"]
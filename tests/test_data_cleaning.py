@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+import data_cleaning as dc
+
+
+def _frame(volumes, detector=1, lane="1"):
+    times = pd.date_range("2024-01-01", periods=len(volumes), freq="h")
+    return pd.DataFrame({"Detector_ID": detector, "Lane": lane, "DateTime": times, "Volume": volumes})
+
+
+def test_adjacent_plateaus_are_separate_runs():
+    df = _frame([1, 2, 5, 5, 5, 7, 7, 7, 3, 4])
+    report, spans = dc.quality_scan(df, stuck_hours=3)
+    stuck = spans[spans["kind"] == "stuck"]
+    assert stuck["hours"].tolist() == [3, 3]
+    assert stuck["start"].tolist() == [pd.Timestamp("2024-01-01 02:00"), pd.Timestamp("2024-01-01 05:00")]
+    assert report.loc[0, "stuck_runs"] == 2
+
+    report, spans = dc.quality_scan(df, stuck_hours=4)
+    assert (spans["kind"] == "stuck").sum() == 0
+    assert report.loc[0, "stuck_hours"] == 0
+
+
+def test_stuck_runs_split_by_missing_hours_and_ignore_zeros():
+    volumes = [5, 5, np.nan, 5, 5, 0, 0, 0, 0, 9, 9, 9, 9]
+    report, spans = dc.quality_scan(_frame(volumes), stuck_hours=3)
+    stuck = spans[spans["kind"] == "stuck"]
+    assert stuck["hours"].tolist() == [4]
+    assert stuck["start"].iloc[0] == pd.Timestamp("2024-01-01 09:00")
+
+
+def test_runs_are_per_series():
+    df = pd.concat([_frame([4, 4, 4]), _frame([4, 4, 4], detector=2)], ignore_index=True)
+    report, spans = dc.quality_scan(df, stuck_hours=3)
+    assert report["stuck_runs"].tolist() == [1, 1]
+
+
+def _days(n=10, seed=0):
+    """n days of a quiet-night daily profile: hour 3 is mostly zero, daytime around 100."""
+    rng = np.random.default_rng(seed)
+    hours = np.tile(np.arange(24), n)
+    volumes = np.where((hours >= 7) & (hours <= 19), 100 + rng.integers(-10, 11, len(hours)), 0)
+    volumes[hours == 22] = 20 + rng.integers(-3, 4, n)
+    return volumes.astype(float)
+
+
+def test_long_gaps_are_spans_short_ones_are_not():
+    volumes = _days()
+    volumes[30:33] = np.nan                  # 3 h: interpolated
+    volumes[50:60] = np.nan                  # 10 h: left open
+    report, spans = dc.quality_scan(_frame(volumes), max_gap_hours=6)
+    gaps = spans[spans["kind"] == "gap"]
+    assert gaps["hours"].tolist() == [10]
+    assert gaps["start"].iloc[0] == pd.Timestamp("2024-01-03 02:00")
+    assert report.loc[0, "all_gap_runs"] == 2 and report.loc[0, "longest_gap"] == 10
+
+
+def test_outliers_use_a_scale_floor_on_quiet_hours():
+    volumes = _days()
+    volumes[24 * 2 + 3] = 8                  # small count in a zero-MAD night hour: normal
+    volumes[24 * 4 + 12] = 1000              # daytime spike
+    volumes[24 * 5 + 3] = 90                 # night spike
+    _, spans = dc.quality_scan(_frame(volumes))
+    outliers = spans.loc[spans["kind"] == "outlier", "start"].tolist()
+    assert outliers == [pd.Timestamp("2024-01-05 12:00"), pd.Timestamp("2024-01-06 03:00")]
+
+
+def test_span_mask_matches_series_time_and_kind():
+    df = pd.concat([_frame([1, 2, 3, 4, 5]), _frame([1, 2, 3, 4, 5], detector=2)], ignore_index=True)
+    t = pd.Timestamp("2024-01-01")
+    spans = pd.DataFrame({"Detector_ID": [1, 2], "Lane": ["1", "1"], "kind": ["stuck", "gap"],
+                          "start": [t + pd.Timedelta(hours=1), t], "end": [t + pd.Timedelta(hours=2), t],
+                          "hours": [2, 1]})
+    mask = dc.span_mask(df, spans)
+    assert mask.tolist() == [False, True, True, False, False, True, False, False, False, False]
+    assert dc.span_mask(df, spans, kinds=["gap"]).nonzero()[0].tolist() == [5]
+    assert not dc.span_mask(df, spans, kinds=["zero"]).any()
@@ -0,0 +1,54 @@
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import pandas as pd
+
+import demand_generator as dg
+
+ENTRIES, EXITS = ["in_a", "in_b", "in_c"], ["out_x", "out_y"]
+
+
+def test_entry_demand_sums_lanes_per_hour_and_edge():
+    t = pd.to_datetime(["2024-03-04 08:00"] * 3 + ["2024-03-04 09:00"] * 3)
+    forecast = pd.DataFrame({"DateTime": t, "Detector_ID": [1, 1, 2] * 2, "Lane": [1, 2, 1] * 2,
+                             "Volume": [10.0, 20.0, 5.0, 30.0, 40.0, 7.0]})
+    hours, lam = dg.entry_demand(forecast, {"1-1": "in_a", "1-2": "in_a", "2-1": "nowhere"}, ENTRIES, scale=2)
+    assert list(pd.to_datetime(hours)) == list(t.unique())
+    assert lam.tolist() == [[60.0, 0.0, 0.0], [140.0, 0.0, 0.0]]
+
+
+def test_sample_trips_counts_exits_and_departures():
+    lam = np.array([[300.0, 0.0, 200.0], [100.0, 50.0, 0.0]])
+    od_p = dg.od_probabilities(ENTRIES, EXITS, forbidden_pairs=[("in_a", "out_y"), ("in_c", "out_x")])
+    depart, entry, exit_ = dg.sample_trips(lam, od_p, seed=1, mode="round")
+    assert len(depart) == 650 and (np.diff(depart) >= 0).all()
+    assert np.bincount(entry, minlength=3).tolist() == [400, 50, 200]
+    assert (exit_[entry == 0] == 0).all() and (exit_[entry == 2] == 1).all()
+    b = exit_[entry == 1]
+    assert 10 < (b == 0).sum() < 40                       # in_b splits 50/50
+    first_hour = depart < 3600
+    assert np.bincount(entry[first_hour], minlength=3).tolist() == [300, 0, 200]
+
+    again = dg.sample_trips(lam, od_p, seed=1, mode="round")
+    assert all((a == b).all() for a, b in zip(again, (depart, entry, exit_)))
+
+
+def test_written_trips_and_flows(tmp_path, monkeypatch):
+    monkeypatch.setattr(dg, "WRITE_CHUNK", 7)             # several chunks
+    lam = np.array([[30.0, 10.0, 0.0], [0.0, 20.0, 4.0]])
+    od_p = dg.od_probabilities(ENTRIES, EXITS)
+
+    trips = tmp_path / "t.trips.xml"
+    dg.write_trips(trips, *dg.sample_trips(lam, od_p, mode="round"), ENTRIES, EXITS)
+    rows = ET.parse(trips).getroot().findall("trip")
+    assert len(rows) == 64 and [r.get("id") for r in rows] == [str(i) for i in range(64)]
+    assert {r.get("from") for r in rows} == {"in_a", "in_b", "in_c"}
+
+    flows = tmp_path / "f.rou.xml"
+    dg.write_flows(flows, lam, od_p, ENTRIES, EXITS, min_rate=3)
+    rows = ET.parse(flows).getroot().findall("flow")
+    got = {(r.get("begin"), r.get("from"), r.get("to")): float(r.get("vehsPerHour")) for r in rows}
+    assert got[("0", "in_a", "out_x")] == 15.0 and got[("3600", "in_b", "out_y")] == 10.0
+    assert ("3600", "in_c", "out_x") not in got            # 2 veh/h < min_rate
+    assert len(got) == 6 and [r.get("id") for r in rows] == [f"f{i}" for i in range(6)]
+    assert rows[0].get("end") == "3600"
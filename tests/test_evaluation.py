@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+import evaluation as ev
+
+
+class _Model:
+    """Predicts a fixed per-lane bias on top of the target, so the errors are known."""
+
+    def predict(self, X):
+        return X["truth"].to_numpy(dtype=float) + X["Lane"].to_numpy(dtype=float) * X["noise"].to_numpy()
+
+
+def _frame(n=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "DateTime": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 24 * 30, n), unit="h"),
+        "Detector_ID": rng.choice([2906, 3001, 4040], n),
+        "Lane": rng.integers(1, 5, n),
+        "truth": rng.integers(0, 200, n).astype(float),
+        "noise": rng.normal(size=n),
+    })
+    df["Volume"] = df["truth"]
+    return df
+
+
+def test_chunked_lane_metrics_match_groupby():
+    df = _frame()
+    table = ev.evaluate_by_series(_Model(), df, ["truth", "Lane", "noise"], chunk_rows=777)
+    lane = table[table["level"] == "lane"].set_index(["Detector_ID", "Lane"]).sort_index()
+
+    y, pred = df["Volume"].to_numpy(), _Model().predict(df)
+    err = pd.DataFrame({"Detector_ID": df["Detector_ID"], "Lane": df["Lane"], "e": pred - y,
+                        "s": 2 * np.abs(pred - y) / (np.abs(y) + np.abs(pred))}).fillna({"s": 0})
+    g = err.groupby(["Detector_ID", "Lane"])
+    assert lane["n"].tolist() == g.size().tolist()
+    assert np.allclose(lane["mae"], g["e"].apply(lambda e: e.abs().mean()))
+    assert np.allclose(lane["rmse"], g["e"].apply(lambda e: np.sqrt((e ** 2).mean())))
+    assert np.allclose(lane["bias"], g["e"].mean())
+    assert np.allclose(lane["smape"], g["s"].mean() * 100)
+
+
+def test_key_columns_stay_integers(tmp_path):
+    table = ev.evaluate_by_series(_Model(), _frame(500), ["truth", "Lane", "noise"])
+    assert str(table["Detector_ID"].dtype) == "Int64" and str(table["Lane"].dtype) == "Int64"
+    assert str(table["hour"].dtype) == "Int64"
+    table.to_csv(tmp_path / "m.csv", index=False)
+    raw = pd.read_csv(tmp_path / "m.csv", dtype=str)
+    assert set(raw["Detector_ID"].dropna()) == {"2906", "3001", "4040"}
+    assert set(raw["Lane"].dropna()) == {"1", "2", "3", "4"}
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import forecasting as fc
+
+
+def _history():
+    t = pd.date_range("2024-03-01", periods=24 * 7, freq="h")
+    rows = []
+    for det, base in ((5, 40.0), (9, 100.0), (12, 70.0)):
+        for lane in (1, 2):
+            vol = base + lane * 5 + 20 * np.sin(2 * np.pi * t.hour / 24)
+            rows.append(pd.DataFrame({"DateTime": t, "Detector_ID": det, "Lane": lane, "Volume": vol}))
+    return pd.concat(rows, ignore_index=True)
+
+
+def _booster(hist):
+    import xgboost as xgb
+
+    df = hist.sort_values(["Detector_ID", "Lane", "DateTime"]).copy()
+    df["hour"] = df["DateTime"].dt.hour
+    df["lag_1"] = df.groupby(["Detector_ID", "Lane"])["Volume"].shift(1)
+    for c in fc.ID_COLS:
+        df[c] = df[c].astype("category")
+    X = df[["Detector_ID", "Lane", "hour", "lag_1"]]
+    dm = xgb.DMatrix(X, label=df["Volume"], enable_categorical=True)
+    return xgb.train({"max_depth": 4, "eta": 0.3}, dm, num_boost_round=30)
+
+
+def test_subset_forecast_matches_full_frame():
+    hist = _history()
+    booster = _booster(hist)
+    full = fc.forecast(booster, hist, horizon=6)
+    sub = fc.forecast(booster, hist[hist["Detector_ID"] == 9], horizon=6)
+    expected = full[full["Detector_ID"] == 9].reset_index(drop=True)
+    assert np.allclose(sub["Volume_pred"], expected["Volume_pred"])
+    assert sub["Volume_pred"].mean() > 90                     # detector 9's level, not detector 5's
+
+
+def test_categories_from_model_or_features(tmp_path):
+    hist = _history()
+    booster = _booster(hist)
+    assert fc.model_categories(booster) == {"Detector_ID": [5, 9, 12], "Lane": [1, 2]}
+    path = tmp_path / "features.csv"
+    hist.to_csv(path, index=False)
+    cats = fc.categories_from_features(path)
+    assert list(cats["Detector_ID"]) == [5, 9, 12]
+
+
+def test_forecast_refuses_without_categories(monkeypatch):
+    hist = _history()
+    booster = _booster(hist)
+    monkeypatch.setattr(fc, "model_categories", lambda b: {})
+    with pytest.raises(ValueError, match="training categories"):
+        fc.forecast(booster, hist[hist["Detector_ID"] == 9], horizon=2)
+    cats = {"Detector_ID": [5, 9, 12], "Lane": [1, 2]}
+    assert len(fc.forecast(booster, hist[hist["Detector_ID"] == 9], horizon=2, categories=cats)) == 4
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+
+import cli
+import pipeline
+
+
+def _features_csv(tmp_path, days=20):
+    rng = np.random.default_rng(1)
+    times = pd.date_range("2024-01-01", periods=24 * days, freq="h")
+    rows = []
+    for det, base in ((2906, 150.0), (3001, 40.0)):
+        for lane in (1, 2):
+            vol = base * (1 + np.isin(times.hour, (8, 17))) + rng.normal(0, 5, len(times))
+            rows.append(pd.DataFrame({"Detector_ID": det, "Lane": lane, "DateTime": times,
+                                      "hour": times.hour, "Volume": vol.clip(0)}))
+    path = tmp_path / "features.csv"
+    pd.concat(rows, ignore_index=True).to_csv(path, index=False)
+    return path
+
+
+def test_shap_stage_predictions_feed_the_hotspot_cli(tmp_path):
+    import xgboost as xgb
+
+    feats = _features_csv(tmp_path)
+    df, features = pipeline._load_features(feats)
+    model = xgb.XGBRegressor(n_estimators=30, max_depth=3, enable_categorical=True, tree_method="hist")
+    model.fit(df[features], df["Volume"])
+    model.save_model(tmp_path / "model.json")
+
+    shap_dir = tmp_path / "shap"
+    pipeline.shap_stage(str(feats), str(tmp_path / "model.json"), str(shap_dir), test_days=3, backend="contribs")
+    pred = pd.read_csv(shap_dir / "predictions.csv")
+    assert list(pred.columns) == ["DateTime", "Detector_ID", "Lane", "y_hat", "Volume"]
+    assert len(pred) == 2 * 2 * 24 * 3
+
+    sites = tmp_path / "sites.csv"
+    pd.DataFrame({"Detector_ID": [2906, 3001], "Latitude": [-36.85, -36.86],
+                  "Longitude": [174.76, 174.77]}).to_csv(sites, index=False)
+    out_csv, out_html = tmp_path / "hot.csv", tmp_path / "map.html"
+    cli.main(["hotspots", str(shap_dir / "predictions.csv"), str(sites),
+              "--shap-values", str(shap_dir / "shap_values.csv"), "--shap-features", str(shap_dir / "features.csv"),
+              "--out", str(out_html), "--out-csv", str(out_csv)])
+    ranked = pd.read_csv(out_csv)
+    assert ranked.loc[0, "Detector_ID"] == 2906
+    assert ranked["top_driver"].notna().all()
+    assert out_html.exists()
@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+
+import model_update as mu
+from archive import xgboost_training as xt
+
+
+class _Const:
+    """Stand-in regressor: predicts the target plus a fixed offset."""
+
+    def __init__(self, offset):
+        self.offset = offset
+        self.saved = None
+
+    def predict(self, X):
+        return X["truth"].to_numpy(dtype=float) + self.offset
+
+    def save_model(self, path):
+        self.saved = path
+
+
+def _features(days=20):
+    times = pd.date_range("2024-01-01", periods=24 * days, freq="h")
+    vol = np.arange(len(times), dtype=float) % 50
+    return pd.DataFrame({xt.TIME_COL: times, "truth": vol, xt.TARGET: vol})
+
+
+def test_early_stop_slice_is_the_end_of_the_new_window():
+    new, holdout = mu.split_window(_features(), days=3, holdout_days=1)
+    fit, stop = mu.split_early_stop(new)
+    assert len(fit) + len(stop) == len(new)
+    assert fit[xt.TIME_COL].max() < stop[xt.TIME_COL].min()
+    assert stop[xt.TIME_COL].max() < holdout[xt.TIME_COL].min()
+
+
+def test_full_retrain_never_sees_the_holdout(monkeypatch):
+    seen = {}
+    monkeypatch.setattr(xt, "train_xgb", lambda train, valid, features: seen.update(train=train, valid=valid))
+    df = _features()
+    _, holdout = mu.split_window(df, days=3, holdout_days=1)
+    mu.full_retrain(df, ["truth"], valid_days=2, holdout_start=holdout[xt.TIME_COL].min())
+    assert seen["valid"][xt.TIME_COL].max() < holdout[xt.TIME_COL].min()
+    assert seen["train"][xt.TIME_COL].max() < seen["valid"][xt.TIME_COL].min()
+
+
+def test_worse_retrain_keeps_the_current_model(monkeypatch, tmp_path):
+    retrained = _Const(5.0)
+    monkeypatch.setattr(mu, "load_regressor", lambda path: _Const(1.0))
+    monkeypatch.setattr(mu, "continue_boosting", lambda *a, **k: _Const(3.0))
+    monkeypatch.setattr(mu, "full_retrain", lambda *a, **k: retrained)
+    report = mu.update_model(tmp_path / "m.json", _features(), ["truth"], out_path=str(tmp_path / "out.json"))
+    assert report["result"] == "kept_current"
+    assert report["retrained"]["rmse"] > report["current"]["rmse"]
+    assert retrained.saved is None and "model_out" not in report
+
+
+def test_good_retrain_is_saved(monkeypatch, tmp_path):
+    monkeypatch.setattr(mu, "load_regressor", lambda path: _Const(1.0))
+    monkeypatch.setattr(mu, "continue_boosting", lambda *a, **k: _Const(3.0))
+    monkeypatch.setattr(mu, "full_retrain", lambda *a, **k: _Const(0.5))
+    report = mu.update_model(tmp_path / "m.json", _features(), ["truth"], out_path=str(tmp_path / "out.json"))
+    assert report["result"] == "full_retrain"
+    assert report["model_out"] == str(tmp_path / "out.json")
+
+
+def test_retrain_within_tolerance_but_worse_is_rejected(monkeypatch, tmp_path):
+    monkeypatch.setattr(mu, "load_regressor", lambda path: _Const(1.0))
+    monkeypatch.setattr(mu, "continue_boosting", lambda *a, **k: _Const(3.0))
+    monkeypatch.setattr(mu, "full_retrain", lambda *a, **k: _Const(1.03))
+    report = mu.update_model(tmp_path / "m.json", _features(), ["truth"], out_path=str(tmp_path / "out.json"))
+    assert report["retrained"]["rmse"] <= report["current"]["rmse"] * (1 + mu.DEFAULT_TOLERANCE)
+    assert report["result"] == "kept_current"
+
+
+def _real_model(tmp_path):
+    import xgboost as xgb
+
+    df = _features()
+    df["hour"] = df[xt.TIME_COL].dt.hour
+    df[xt.TARGET] = 20.0 + 3 * df["hour"]
+    old = df[df[xt.TIME_COL] < "2024-01-10"].assign(**{xt.TARGET: lambda d: d[xt.TARGET] * 0.5})
+    model = xgb.XGBRegressor(n_estimators=20, max_depth=3)
+    model.fit(old[["hour"]], old[xt.TARGET])
+    path = str(tmp_path / "xgb-model-1.json")
+    model.save_model(path)
+    return path, df
+
+
+def test_continue_and_refresh_on_a_real_booster(tmp_path):
+    path, df = _real_model(tmp_path)
+    new, holdout = mu.split_window(df, days=3, holdout_days=1)
+    before = mu.load_regressor(path)
+
+    grown = mu.continue_boosting(path, new, ["hour"], rounds=30)
+    n_old = before.get_booster().num_boosted_rounds()
+    assert n_old < grown.get_booster().num_boosted_rounds() <= n_old + 30
+
+    refreshed = mu.refresh_leaves(path, new, ["hour"])
+    assert refreshed.get_booster().num_boosted_rounds() == n_old
+
+    err = {name: np.abs(m.predict(holdout[["hour"]]) - holdout[xt.TARGET]).mean()
+           for name, m in (("before", before), ("grown", grown), ("refreshed", refreshed))}
+    assert err["grown"] < err["before"] and err["refreshed"] < err["before"]
+
+    report = mu.update_model(path, df, ["hour"], rounds=30, out_path=str(tmp_path / "out.json"))
+    assert report["result"] == "continue" and (tmp_path / "out.json").exists()
@@ -0,0 +1,14 @@
+import xml.etree.ElementTree as ET
+
+import modified_network as mn
+
+
+def test_stream_merge_rejects_non_string_snippets(tmp_path):
+    net = tmp_path / "in.net.xml"
+    net.write_text('<net><junction id="J" type="priority"/>'
+                   '<connection from="a" to="b" via=":J_0_0"/></net>', encoding="utf-8")
+    good = '<tlLogic id="J" type="static" programID="0" offset="0"><phase duration="30" state="G"/></tlLogic>'
+    events = [("modified_snippets", {"id": "J"}), ("modified_snippets", None), ("modified_snippets", good)]
+    tree = mn.merge_tlLogic_stream(str(net), events, str(tmp_path / "out.net.xml"))
+    assert [t.get("id") for t in tree.getroot().iter("tlLogic")] == ["J"]
+    assert ET.parse(tmp_path / "out.net.xml").getroot().find("tlLogic") is not None
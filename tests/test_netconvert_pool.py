@@ -0,0 +1,64 @@
+import json
+
+import netconvert_pool as ncp
+
+
+def _nets(tmp_path, names):
+    d = tmp_path / "in"
+    d.mkdir(exist_ok=True)
+    for name in names:
+        # "dup" has the same bytes as n1, so it shares n1's cache key
+        (d / f"{name}.net.xml").write_text(f"<net id='{'n1' if name == 'dup' else name}'/>", encoding="utf-8")
+    return [{"input": str(d / f"{n}.net.xml"), "output": str(tmp_path / "out" / f"{n}.net.xml")} for n in names]
+
+
+def _calls(log):
+    return sum(line.startswith("start ") for line in log.read_text().splitlines()) if log.exists() else 0
+
+
+def _max_concurrent(log):
+    running = peak = 0
+    for line in log.read_text().splitlines():
+        running += 1 if line.startswith("start ") else -1
+        peak = max(peak, running)
+    return peak
+
+
+def test_batch_statuses_cache_and_duplicates(tmp_path, stub_netconvert):
+    binary, log = stub_netconvert
+    jobs = _nets(tmp_path, ["n1", "n2", "dup", "fail", "slow"])
+    cache = tmp_path / "cache"
+    results = ncp.rebuild_many(jobs, binary, cache, max_workers=4, timeout=2)
+    assert [r["status"] for r in results] == ["ok", "ok", "ok", "failed", "timeout"]
+    assert _calls(log) == 4                     # dup reuses n1's build
+    assert (tmp_path / "out" / "dup.net.xml").read_text() == "<net id='n1'/>"
+    job = json.loads((cache / results[3]["key"] / "job.json").read_text())
+    assert job["returncode"] == 1 and "broken net" in (cache / results[3]["key"] / "netconvert.log").read_text()
+
+    again = ncp.rebuild_many(jobs[:3], binary, cache, max_workers=4)
+    assert [r["status"] for r in again] == ["cached"] * 3
+    assert _calls(log) == 4
+
+
+def test_options_and_version_are_part_of_the_key(tmp_path, stub_netconvert):
+    binary, _ = stub_netconvert
+    [job] = _nets(tmp_path, ["n1"])
+    assert ncp.netconvert_version(binary) == "Eclipse SUMO netconvert Version stub-1.0"
+    plain = ncp.job_key(job["input"], (), ncp.netconvert_version(binary))
+    assert plain != ncp.job_key(job["input"], ["--no-turnarounds"], ncp.netconvert_version(binary))
+    assert plain != ncp.job_key(job["input"], (), "Eclipse SUMO netconvert Version 1.20")
+
+
+def test_max_workers_bounds_concurrency(tmp_path, stub_netconvert):
+    binary, log = stub_netconvert
+    jobs = _nets(tmp_path, [f"p{i}" for i in range(4)])
+    results = ncp.rebuild_many(jobs, binary, tmp_path / "cache", max_workers=2)
+    assert all(r["status"] == "ok" for r in results)
+    assert _calls(log) == 4 and _max_concurrent(log) == 2
+
+
+def test_rebuild_one(tmp_path, stub_netconvert):
+    binary, _ = stub_netconvert
+    [ok, bad] = _nets(tmp_path, ["n1", "fail"])
+    assert ncp.rebuild_one(ok["input"], ok["output"], binary, tmp_path / "cache")
+    assert not ncp.rebuild_one(bad["input"], bad["output"], binary, tmp_path / "cache")
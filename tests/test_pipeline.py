@@ -0,0 +1,80 @@
+import json
+import shutil
+from pathlib import Path
+
+import pipeline
+
+
+def _patch(net, merged, linked, ensured):
+    for out in (merged, linked, ensured):
+        Path(out).write_text(Path(net).read_text() + out, encoding="utf-8")
+
+
+def _rebuild(ensured, rebuilt):
+    shutil.copyfile(ensured, rebuilt)
+
+
+def _simulate(rebuilt, run_dir):
+    Path(run_dir).mkdir(parents=True, exist_ok=True)
+    (Path(run_dir) / "summary.xml").write_text("<summary/>", encoding="utf-8")
+    (Path(run_dir) / "manifest.json").write_text(json.dumps({"net": rebuilt}), encoding="utf-8")
+
+
+def _compare(manifest, out_csv):
+    Path(out_csv).write_text("policy,score\nv,1\n" + Path(manifest).read_text(), encoding="utf-8")
+
+
+def _stages(v):
+    files = {k: v / f"{k}.xml" for k in ("net", "raw", "tuning", "merged", "linked", "ensured", "rebuilt")}
+    run_dir, report = v / "runs" / "batch", v / "comparison.csv"
+    manifest = run_dir / "manifest.json"
+    return [
+        pipeline.stage("patch", _patch, [files["net"]], [files["merged"], files["linked"], files["ensured"]],
+                       {"net": str(files["net"]), "merged": str(files["merged"]), "linked": str(files["linked"]),
+                        "ensured": str(files["ensured"])}),
+        pipeline.stage("rebuild", _rebuild, [files["ensured"]], [files["rebuilt"]],
+                       {"ensured": str(files["ensured"]), "rebuilt": str(files["rebuilt"])}),
+        pipeline.stage("simulate", _simulate, [files["rebuilt"]], [manifest],
+                       {"rebuilt": str(files["rebuilt"]), "run_dir": str(run_dir)}),
+        pipeline.stage("compare", _compare, [manifest], [report], {"manifest": str(manifest), "out_csv": str(report)}),
+        pipeline.stage("archive", pipeline.archive_stage,
+                       [files[k] for k in ("net", "raw", "tuning", "merged", "linked", "ensured", "rebuilt")]
+                       + [manifest, report], [v / "artifacts.json"],
+                       {"prefix": "2906/default", "network_file": str(files["net"]), "llm_raw": str(files["raw"]),
+                        "tuning_json": str(files["tuning"]), "merged": str(files["merged"]),
+                        "linked": str(files["linked"]), "ensured": str(files["ensured"]),
+                        "rebuilt": str(files["rebuilt"]), "run_dir": str(run_dir),
+                        "out_json": str(v / "artifacts.json")}),
+    ]
+
+
+def test_archived_working_copies_stay_cached_and_restore_on_demand(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    v = Path("work")
+    v.mkdir()
+    for name in ("net", "raw", "tuning"):
+        (v / f"{name}.xml").write_text(f"<{name}/>", encoding="utf-8")
+    state = tmp_path / "state"
+
+    first = pipeline.run_pipeline(_stages(v), max_workers=2, state_dir=state)
+    assert set(first.values()) == {"ran"}
+    for gone in ("merged.xml", "linked.xml", "ensured.xml", "rebuilt.xml", "runs/batch"):
+        assert not (v / gone).exists()
+    assert (v / "comparison.csv").exists() and (v / "net.xml").exists()
+
+    second = pipeline.run_pipeline(_stages(v), max_workers=2, state_dir=state)
+    assert set(second.values()) == {"cached"}
+    assert not (v / "rebuilt.xml").exists()
+
+    third = pipeline.run_pipeline(_stages(v), max_workers=2, state_dir=state, force=["compare"])
+    assert third["compare"] == "ran" and third["archive"] == "cached"
+    assert json.loads((v / "runs" / "batch" / "manifest.json").read_text())["net"].endswith("rebuilt.xml")
+
+
+def test_archive_declares_every_network_it_stores():
+    stages = pipeline.build_pipeline(variants={"default": "tuning.json"}, work_dir="w")
+    archive = next(s for s in stages if s["name"] == "archive:2906:default")
+    for step in ("merged", "linked", "ensured", "rebuilt"):
+        assert archive["params"][step] in archive["inputs"]
+    assert str(Path("w") / "2906" / "default" / "comparison.csv") in archive["inputs"]
+    pipeline.resolve_deps(stages)
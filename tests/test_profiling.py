@@ -0,0 +1,27 @@
+import tracemalloc
+
+import profiling
+
+
+def test_tracemalloc_stops_after_the_outermost_profiled_span(tmp_path, monkeypatch):
+    monkeypatch.setitem(profiling._config, "trace", str(tmp_path / "trace.jsonl"))
+    monkeypatch.setitem(profiling._config, "profile_dir", str(tmp_path / "prof"))
+    assert not tracemalloc.is_tracing()
+    with profiling.span("outer"):
+        with profiling.span("inner"):
+            assert tracemalloc.is_tracing()
+        assert tracemalloc.is_tracing()
+    assert not tracemalloc.is_tracing()
+    spans = profiling.load_spans(str(tmp_path / "trace.jsonl"))
+    assert [s["name"] for s in spans] == ["inner", "outer"] and "py_peak_mb" in spans[1]
+
+
+def test_callers_own_tracing_is_left_on(tmp_path, monkeypatch):
+    monkeypatch.setitem(profiling._config, "profile_dir", str(tmp_path / "prof"))
+    tracemalloc.start()
+    try:
+        with profiling.span("stage"):
+            pass
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
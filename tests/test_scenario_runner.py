@@ -0,0 +1,54 @@
+import json
+import xml.etree.ElementTree as ET
+
+import scenario_runner as sr
+
+
+def _scenario_files(tmp_path):
+    base = tmp_path / "base"
+    base.mkdir()
+    (base / "extra.add.xml").write_text("<additional/>", encoding="utf-8")
+    (base / "osm.sumocfg").write_text(
+        '<configuration><input><additional-files value="extra.add.xml"/></input>'
+        '<output><tripinfo-output value="out/trips.xml"/></output>'
+        '<report><log value="sumo.log"/></report></configuration>', encoding="utf-8")
+    (tmp_path / "broken.sumocfg").write_text("<configuration><input>", encoding="utf-8")
+    for name in ("a", "fail", "slow"):
+        (tmp_path / f"{name}.net.xml").write_text(f"<net id='{name}'/>", encoding="utf-8")
+    (tmp_path / "trips.xml").write_text("<routes/>", encoding="utf-8")
+    return base / "osm.sumocfg"
+
+
+def test_base_cfg_paths_are_rebased(tmp_path):
+    base_cfg = _scenario_files(tmp_path)
+    run_dir = tmp_path / "run"
+    cfg = sr.prepare_scenario({"net": str(tmp_path / "a.net.xml"), "trips": str(tmp_path / "trips.xml"),
+                               "base_cfg": str(base_cfg)}, run_dir)
+    opts = {o.tag: o.get("value") for sec in ET.parse(cfg).getroot() for o in sec}
+    assert opts["additional-files"] == (base_cfg.parent / "extra.add.xml").resolve().as_posix()
+    assert opts["tripinfo-output"] == (run_dir.resolve() / "trips.xml").as_posix()
+    assert opts["log"] == (run_dir.resolve() / "sumo.log").as_posix()
+
+
+def test_batch_records_every_outcome(tmp_path, stub_sumo):
+    sumo, log = stub_sumo
+    base_cfg = _scenario_files(tmp_path)
+    trips = str(tmp_path / "trips.xml")
+    scenarios = [
+        {"name": "ok", "net": str(tmp_path / "a.net.xml"), "trips": trips, "base_cfg": str(base_cfg), "seed": 3},
+        {"name": "failed", "net": str(tmp_path / "fail.net.xml"), "trips": trips},
+        {"name": "timeout", "net": str(tmp_path / "slow.net.xml"), "trips": trips},
+        {"name": "broken", "net": str(tmp_path / "a.net.xml"), "trips": trips,
+         "base_cfg": str(tmp_path / "broken.sumocfg")},
+        {"name": "no-net", "trips": trips},
+    ]
+    batch = sr.run_scenarios(scenarios, out_dir=tmp_path / "runs", max_workers=3, timeout=2,
+                             sumo_binary=sumo, batch_name="b")
+    status = {r["name"]: r["status"] for r in batch["runs"]}
+    assert status == {"ok": "ok", "failed": "failed", "timeout": "timeout", "broken": "error", "no-net": "error"}
+    assert batch["n_ok"] == 1 and batch["n_failed"] == 4
+
+    broken = json.loads((tmp_path / "runs" / "b" / "broken" / "manifest.json").read_text())
+    assert broken["error"].startswith("ParseError")
+    assert (tmp_path / "runs" / "b" / "ok" / "summary.xml").exists()
+    assert len(log.read_text().splitlines()) == 3
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import shap_backends as sb
+
+
+@pytest.fixture(scope="module")
+def model_and_X():
+    import xgboost as xgb
+
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(400, 4)), columns=["a", "b", "c", "d"])
+    y = X["a"] * X["b"] + np.where(X["c"] > 0, 3.0, -1.0) + 0.1 * rng.normal(size=len(X))
+    booster = xgb.train({"max_depth": 4, "eta": 0.3}, xgb.DMatrix(X, label=y), num_boost_round=40)
+    return booster, X
+
+
+def test_contribs_rows_sum_to_margin(model_and_X):
+    booster, X = model_and_X
+    vals, base = sb.native_values(booster, X)
+    margin = booster.predict(sb._dmatrix(X), output_margin=True)
+    assert vals.shape == X.shape
+    assert np.allclose(vals.sum(axis=1) + base, margin, atol=1e-4)
+
+
+def test_consistency_check_reference_is_exact(model_and_X):
+    booster, X = model_and_X
+    report = sb.consistency_check(booster, X, backends=["contribs", "approx"], sample_rows=100)
+    assert report["contribs"]["max_abs"] == pytest.approx(0.0, abs=1e-9)
+    assert report["contribs"]["top1_agreement"] == 1.0
+    assert report["approx"]["rel_mean_abs"] > 0
+
+
+def test_select_backend_small_sets_and_tolerance_fallback(model_and_X, monkeypatch):
+    booster, X = model_and_X
+    assert sb.select_backend(booster, X) == ("contribs", None)          # len(X) < AUTO_MIN_ROWS
+
+    monkeypatch.setattr(sb, "AUTO_MIN_ROWS", 100)
+    name, report = sb.select_backend(booster, X, tolerance=1e-6)
+    assert name == "contribs" and report["approx"]["rel_mean_abs"] > 1e-6
+
+    df, meta = sb.explain(booster, X, backend="contribs")
+    assert list(df.columns) == list(X.columns) and meta["backend"] == "contribs"
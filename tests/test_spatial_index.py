@@ -0,0 +1,56 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+import spatial_index as si
+
+
+def test_huge_radius_only_scans_the_grid():
+    grid = si.GridIndex(np.array([[0.0, 0.0], [10.0, 400.0], [300.0, 5.0]]), cell=1.0)
+    t0 = time.perf_counter()
+    idx, d = grid.within(0.0, 0.0, 1e6)
+    assert time.perf_counter() - t0 < 0.5
+    assert idx.tolist() == [0, 2, 1]
+    assert grid.within(0.0, 1e5, 10.0)[0].size == 0          # query far above the top row
+
+
+def test_nearest_many_matches_brute_force():
+    rng = np.random.default_rng(0)
+    pts, q = rng.uniform(0, 1000, (500, 2)), rng.uniform(-100, 1100, (200, 2))
+    grid = si.GridIndex(pts, cell=25.0)
+    idx, d = grid.nearest_many(q[:, 0], q[:, 1])
+    brute = np.hypot(*(q[:, None, :] - pts[None, :, :]).transpose(2, 0, 1))
+    assert (idx == brute.argmin(axis=1)).all()
+    assert np.allclose(d, brute.min(axis=1))
+
+    idx, d = grid.nearest_many(q[:, 0], q[:, 1], max_radius=5.0)
+    assert ((idx == -1) == (brute.min(axis=1) > 5.0)).all() and np.isinf(d[idx == -1]).all()
+    assert si.GridIndex(np.empty((0, 2))).nearest_many([1.0], [2.0])[0].tolist() == [-1]
+
+
+def _net(tmp_path, with_signal=True):
+    tl = "traffic_light" if with_signal else "priority"
+    path = tmp_path / "t.net.xml"
+    path.write_text(f"""<net>
+  <location netOffset="0,0" convBoundary="0,0,1000,1000" origBoundary="174,-37,175,-36" projParameter="!"/>
+  <edge id="in_n" from="n" to="c"><lane id="in_n_0" shape="500,900 500,510"/></edge>
+  <edge id="in_w" from="w" to="c"><lane id="in_w_0" shape="100,500 490,500"/></edge>
+  <junction id="c" type="{tl}" x="500" y="500"/>
+  <junction id="p" type="priority" x="520" y="520"/>
+  <junction id="n" type="dead_end" x="500" y="900"/>
+  <junction id="w" type="dead_end" x="100" y="500"/>
+</net>""", encoding="utf-8")
+    return path
+
+
+def test_map_detectors_prefers_signals_and_picks_lane_edges(tmp_path):
+    sites = pd.DataFrame({"Detector_ID": [1, 2], "Latitude": [-36.48, -36.0], "Longitude": [174.52, 175.0]})
+    lanes = pd.DataFrame({"Detector_ID": [1, 1], "Lane": [1, 2], "Direction": ["S", "E"]})
+    out = si.map_detectors(_net(tmp_path), sites, lanes, max_dist=150.0, cache_dir=tmp_path / "cache")
+    assert out["sites"]["1"]["junction"] == "c"               # p is closer but has no signal
+    assert out["sites"]["2"]["junction"] is None               # 700 m away
+    assert out["lanes"] == {"1-1": "in_n", "1-2": "in_w"}
+
+    plain = si.map_detectors(_net(tmp_path, with_signal=False), sites, cache_dir=tmp_path / "cache2")
+    assert plain["sites"]["1"]["junction"] == "p"
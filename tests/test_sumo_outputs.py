@@ -0,0 +1,20 @@
+import sumo_outputs as so
+
+
+def test_travel_time_is_the_final_running_mean(tmp_path):
+    # two trips of 100 s arrive at step 2, eight of 300 s at step 4: overall mean 260 s
+    path = tmp_path / "summary.xml"
+    steps = [(0, -1), (1, -1), (2, 100), (3, 100), (4, 260)]
+    path.write_text("<summary>" + "".join(
+        f'<step time="{t}" running="1" arrived="{2 if t < 4 else 10}" meanSpeed="10" meanTravelTime="{tt}"/>'
+        for t, tt in steps) + "</summary>", encoding="utf-8")
+    stats = so.summary_stats(path)
+    assert stats["mean_travel_time"] == 260
+    assert stats["arrived"] == 10 and stats["simulation_steps"] == 5
+
+
+def test_no_arrivals_has_no_travel_time(tmp_path):
+    path = tmp_path / "summary.xml"
+    path.write_text('<summary><step time="0" running="3" arrived="0" meanSpeed="4" meanTravelTime="-1"/>'
+                    '</summary>', encoding="utf-8")
+    assert so.summary_stats(path)["mean_travel_time"] is None
@@ -0,0 +1,91 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import pipeline
+import surrogate
+import tuning_search as ts
+
+
+def _linked_net(tmp_path):
+    conns = "".join(f'<connection from="e{i}" to="x{i}" tl="{tl}" linkIndex="{i}"/>'
+                    for tl in ("A", "B") for i in range(4))
+    path = tmp_path / "linked.net.xml"
+    path.write_text(f"<net>{conns}</net>", encoding="utf-8")
+    return path
+
+
+def _model(tmp_path):
+    import xgboost as xgb
+
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.integers(0, 24, (200, len(surrogate.MODEL_FEATURES))), columns=surrogate.MODEL_FEATURES)
+    booster = xgb.train({"max_depth": 2}, xgb.DMatrix(X, label=X["hour"] * 20.0), num_boost_round=10)
+    path = tmp_path / "xgb-model-2906.json"
+    booster.save_model(path)
+    return str(path)
+
+
+def _lanes():
+    return pd.DataFrame({"Detector_ID": 2906, "Lane": [1, 2, 3, 4], "Direction": [0, 0, 1, 1],
+                         "tl": ["A", "A", "B", "Z"]})
+
+
+def test_model_tl_volumes_groups_lanes_by_signal(tmp_path):
+    vols = surrogate.model_tl_volumes(_model(tmp_path), _lanes(), "2024-03-04 17:00")
+    assert sorted(vols) == ["A", "B", "Z"]
+    assert len(vols["A"]) == 2 and all(v >= 0 for v in vols["A"])
+
+
+def test_no_shared_signals_skips_prescreening():
+    variants = [{"defaults": {"main_share": s}} for s in (0.6, 0.7, 0.8)]
+    keep, delay = ts.prescreen_variants(variants, {"A": 4}, {"Z": [100.0, 50.0], "A": []}, top_k=1)
+    assert keep == [0, 1, 2] and delay == {}
+    with pytest.raises(ValueError):
+        surrogate._sorted_demand([], {})
+
+
+def test_search_prescreens_with_the_model_forecast(tmp_path, monkeypatch):
+    seen = {}
+
+    def fake_evaluate(variants, *args, **kwargs):
+        seen["n"] = len(variants)
+        return []
+
+    monkeypatch.setattr(ts, "evaluate_variants", fake_evaluate)
+    ts.search(_linked_net(tmp_path), "trips.xml", tuning_json_path=None, n=8, best_out=str(tmp_path / "best.json"),
+              prescreen_k=3, model_path=_model(tmp_path), lanes=_lanes(), when="2024-03-04 17:00")
+    assert seen["n"] == 3
+
+
+def test_pipeline_prescreen_gates_rebuilds(tmp_path):
+    tunings = {}
+    for name, share in (("low", 0.55), ("mid", 0.65), ("high", 0.75)):
+        tunings[name] = tmp_path / f"{name}.json"
+        tunings[name].write_text(json.dumps({"defaults": {"main_share": share}}), encoding="utf-8")
+    lanes = tmp_path / "lanes.csv"
+    _lanes().to_csv(lanes, index=False)
+    out = tmp_path / "prescreen.json"
+    pipeline.prescreen_stage(str(_linked_net(tmp_path)), {k: str(v) for k, v in tunings.items()},
+                             _model(tmp_path), str(lanes), str(out), top_k=1, when="2024-03-04 17:00")
+    ranking = json.loads(out.read_text())
+    [kept] = ranking["kept"]
+    dropped = next(n for n in tunings if n != kept)
+    with pytest.raises(pipeline.SkipStage):
+        pipeline.rebuild_stage("in.net.xml", "out.net.xml", prescreen_json=str(out), variant=dropped)
+
+
+def test_skipped_stage_skips_dependants_without_failing(tmp_path):
+    def skip():
+        raise pipeline.SkipStage("not needed")
+
+    a, b = tmp_path / "a.txt", tmp_path / "b.txt"
+    stages = [
+        pipeline.stage("a", skip, [], [a]),
+        pipeline.stage("b", lambda: b.write_text("x"), [a], [b]),
+        pipeline.stage("c", lambda: (tmp_path / "c.txt").write_text("x"), [], [tmp_path / "c.txt"]),
+    ]
+    status = pipeline.run_pipeline(stages, state_dir=tmp_path / "state")
+    assert status == {"a": "skipped", "b": "skipped", "c": "ran"}
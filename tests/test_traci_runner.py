@@ -0,0 +1,77 @@
+import json
+from types import SimpleNamespace
+
+import numpy as np
+
+import traci_runner as tr
+
+
+class FakeTraci:
+    """Just enough of the traci module: `n_steps` one-second steps, one new vehicle per step."""
+
+    def __init__(self, n_steps, speed=10.0):
+        self.n_steps, self.speed, self.t = n_steps, speed, 0
+        self.subscribed, self.started, self.closed = set(), None, False
+        self.constants = SimpleNamespace(VAR_SPEED=0x40)
+        self.simulation = SimpleNamespace(
+            getMinExpectedNumber=lambda: self.n_steps - self.t,
+            getDepartedIDList=lambda: [f"veh{self.t}"],
+            getStartingTeleportNumber=lambda: 0,
+            getTime=lambda: float(self.t),
+        )
+        self.vehicle = SimpleNamespace(
+            subscribe=lambda vid, vars_: self.subscribed.add(vid),
+            getAllSubscriptionResults=lambda: {v: {0x40: self.speed} for v in self.subscribed},
+        )
+
+    def start(self, cmd):
+        self.started = cmd
+
+    def simulationStep(self):
+        self.t += 1
+
+    def close(self):
+        self.closed = True
+
+
+def _scenario(tmp_path):
+    (tmp_path / "a.net.xml").write_text("<net/>", encoding="utf-8")
+    (tmp_path / "trips.xml").write_text("<routes/>", encoding="utf-8")
+    return {"net": str(tmp_path / "a.net.xml"), "trips": str(tmp_path / "trips.xml")}
+
+
+def test_steps_count_beyond_the_buffer(tmp_path):
+    fake = FakeTraci(50)
+    manifest, buffer = tr.run_with_traci(_scenario(tmp_path), tmp_path / "run", buffer_size=10,
+                                         sumo_binary="sumo-stub", traci_module=fake)
+    assert manifest["status"] == "ok"
+    assert manifest["steps"] == 50
+    assert len(buffer) == 10 and buffer[-1]["time"] == 50.0
+    assert manifest["last"]["running"] == 50
+    assert len((tmp_path / "run" / "metrics.jsonl").read_text().splitlines()) == 50
+    assert fake.started[0] == "sumo-stub" and fake.closed
+
+
+def test_early_stop_against_baseline(tmp_path):
+    baseline = {"time": np.arange(0, 1000.0), "running": np.full(1000, 5.0), "halting": np.zeros(1000),
+                "meanSpeed": np.full(1000, 10.0), "teleports": np.zeros(1000)}
+    rules = {"warmup": 10, "check_every": 5, "min_halting": 1, "patience": 2}
+    manifest, _ = tr.run_with_traci(_scenario(tmp_path), tmp_path / "run", baseline=baseline, rules=rules,
+                                    traci_module=FakeTraci(500, speed=0.0))
+    assert manifest["status"] == "early_stop"
+    assert manifest["stop_time"] == 15.0
+    assert manifest["steps"] == 15
+
+
+def test_failed_start_still_writes_manifest(tmp_path):
+    fake = FakeTraci(5)
+
+    def start(cmd):
+        raise OSError("sumo not found")
+
+    fake.start = start
+    manifest, buffer = tr.run_with_traci(_scenario(tmp_path), tmp_path / "run", traci_module=fake)
+    assert manifest["status"] == "error" and manifest["error"] == "OSError: sumo not found"
+    assert manifest["steps"] == 0 and len(buffer) == 0
+    assert json.loads((tmp_path / "run" / "manifest.json").read_text())["status"] == "error"
+    assert (tmp_path / "run" / "metrics.jsonl").read_text() == ""
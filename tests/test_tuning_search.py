@@ -0,0 +1,94 @@
+import json
+
+import tuning_search as ts
+
+
+def _fake_build(linked_net, tuning_cfg, out_path):
+    # the variant network only has to differ per tuning for the stub simulator
+    out_path.write_text(f"<net>{json.dumps(tuning_cfg, sort_keys=True)}</net>", encoding="utf-8")
+    return out_path
+
+
+def _inputs(tmp_path):
+    net, trips = tmp_path / "linked.net.xml", tmp_path / "trips.xml"
+    net.write_text("<net/>", encoding="utf-8")
+    trips.write_text("<routes/>", encoding="utf-8")
+    return net, trips
+
+
+def _calls(log):
+    return len(log.read_text().splitlines()) if log.exists() else 0
+
+
+def test_cache_is_keyed_by_inputs_seeds_and_binary(tmp_path, monkeypatch, stub_sumo):
+    sumo, log = stub_sumo
+    monkeypatch.setattr(ts, "build_variant_net", _fake_build)
+    net, trips = _inputs(tmp_path)
+    variants = [{"defaults": {"main_share": s}} for s in (0.6, 0.7)]
+    kw = dict(out_dir=tmp_path / "out", cache_dir=tmp_path / "cache", sumo_binary=sumo, max_workers=2)
+
+    first = ts.evaluate_variants(variants, net, trips, **kw)
+    assert _calls(log) == 2
+    assert all(r["score"] is not None for r in first)
+
+    again = ts.evaluate_variants(variants, net, trips, **kw)
+    assert _calls(log) == 2
+    assert sorted(r["score"] for r in again) == sorted(r["score"] for r in first)
+
+    trips.write_text("<routes><trip/></routes>", encoding="utf-8")
+    ts.evaluate_variants(variants, net, trips, **kw)
+    assert _calls(log) == 4
+
+    ts.evaluate_variants(variants, net, trips, seeds=(1, 2), **kw)
+    assert _calls(log) == 8
+
+    net.write_text("<net><edge/></net>", encoding="utf-8")
+    ts.evaluate_variants(variants, net, trips, seeds=(1, 2), **kw)
+    assert _calls(log) == 12
+
+
+def test_context_hash_tracks_binary_and_detectors(tmp_path, stub_sumo):
+    sumo, _ = stub_sumo
+    net, trips = _inputs(tmp_path)
+    det = tmp_path / "det.add.xml"
+    det.write_text("<additional/>", encoding="utf-8")
+    base = ts.run_context_hash(net, trips, sumo_binary=sumo)
+    assert base == ts.run_context_hash(net, trips, sumo_binary=sumo)
+    assert base != ts.run_context_hash(net, trips, sumo_binary="sumo-other")
+    with_det = ts.run_context_hash(net, trips, det, sumo_binary=sumo)
+    assert with_det != base
+    det.write_text("<additional><e1Detector/></additional>", encoding="utf-8")
+    assert ts.run_context_hash(net, trips, det, sumo_binary=sumo) != with_det
+
+
+def test_cached_score_uses_current_speed_weight(tmp_path, monkeypatch, stub_sumo):
+    sumo, _ = stub_sumo
+    monkeypatch.setattr(ts, "build_variant_net", _fake_build)
+    net, trips = _inputs(tmp_path)
+    kw = dict(out_dir=tmp_path / "out", cache_dir=tmp_path / "cache", sumo_binary=sumo)
+    [a] = ts.evaluate_variants([{"defaults": {}}], net, trips, speed_weight=1.0, **kw)
+    [b] = ts.evaluate_variants([{"defaults": {}}], net, trips, speed_weight=2.0, **kw)
+    assert b["score"] == round(a["score"] - a["stats"]["mean_speed"], 4)
+
+
+def test_failed_rebuild_is_not_simulated_or_cached(tmp_path, monkeypatch, stub_sumo, stub_netconvert):
+    sumo, sumo_log = stub_sumo
+    netconvert, _ = stub_netconvert
+    monkeypatch.chdir(tmp_path)
+
+    def build(linked_net, tuning_cfg, out_path):
+        if tuning_cfg["defaults"]["main_share"] == 0.7:
+            out_path = out_path.with_name("fail-" + out_path.name)
+        return _fake_build(linked_net, tuning_cfg, out_path)
+
+    monkeypatch.setattr(ts, "build_variant_net", build)
+    net, trips = _inputs(tmp_path)
+    variants = [{"defaults": {"main_share": s}} for s in (0.6, 0.7)]
+    kw = dict(out_dir=tmp_path / "out", cache_dir=tmp_path / "cache", sumo_binary=sumo,
+              netconvert_path=netconvert, max_workers=2)
+
+    res = {r["tuning"]["defaults"]["main_share"]: r for r in ts.evaluate_variants(variants, net, trips, **kw)}
+    assert res[0.6]["score"] is not None
+    assert res[0.7]["score"] is None and res[0.7]["error"].startswith("netconvert failed")
+    assert _calls(sumo_log) == 1
+    assert len(list((tmp_path / "cache").rglob("*.json"))) == 1
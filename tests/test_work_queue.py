@@ -0,0 +1,104 @@
+import multiprocessing as mp
+import time
+
+import numpy as np
+import pandas as pd
+
+import work_queue as wq
+
+
+def _worker(root, name, lease_s, max_jobs=None):
+    wq.run_worker(root, name, lease_s=lease_s, max_jobs=max_jobs, idle_exit=1.0, poll=0.05)
+
+
+def _processes(root, n, lease_s=5.0):
+    return [mp.Process(target=_worker, args=(str(root), f"w{i}", lease_s)) for i in range(n)]
+
+
+def test_local_workers_share_the_queue(tmp_path):
+    root = tmp_path / "q"
+    ids = [wq.submit(root, "call", {"func": "time:sleep", "args": [0.2]}) for _ in range(12)]
+    bad = wq.submit(root, "call", {"func": "math:sqrt", "args": [-1]}, max_attempts=2)
+    procs = _processes(root, 4)
+    t0 = time.monotonic()
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join(timeout=30)
+    assert time.monotonic() - t0 < 0.2 * 12      # faster than one worker doing it all
+
+    res = wq.wait(root, ids + [bad], timeout=5)
+    assert all(res[j]["attempt"] == 1 and "result" in res[j] for j in ids)
+    assert len({res[j]["worker"] for j in ids}) > 1
+    assert res[bad]["attempt"] == 2 and res[bad]["errors"][-1]["error"].startswith("ValueError")
+    st = wq.status(root)
+    assert len(st["done"]) == 12 and st["failed"] == [bad] and not st["pending"] and not st["running"]
+    assert not list((root / "tmp").iterdir())
+
+
+def test_crashed_worker_is_recovered_after_the_lease(tmp_path):
+    root = tmp_path / "q"
+    job = wq.submit(root, "call", {"func": "time:sleep", "args": [1.0]})
+    crash = mp.Process(target=_worker, args=(str(root), "crash", 1.0, 1))
+    crash.start()
+    time.sleep(0.5)
+    crash.kill()
+    crash.join()
+    assert wq.status(root)["running"] == [job]
+
+    _worker(str(root), "rescue", 1.0)
+    rec = wq.wait(root, [job], timeout=1)[job]
+    assert rec["worker"] == "rescue" and rec["attempt"] == 2
+    assert rec["errors"][0]["worker"] == "crash" and "lease expired" in rec["errors"][0]["error"]
+
+
+def test_result_after_lost_lease_is_discarded(tmp_path):
+    root = tmp_path / "q"
+    job_id = wq.submit(root, "call", {"func": "time:sleep", "args": [0.3]})
+    job, running = wq.claim(root, "slow")
+    assert wq.requeue_expired(root, lease_s=0) == [(job_id, "pending")]
+    again, running2 = wq.claim(root, "fast")
+    assert running2 != running
+
+    assert wq.run_job(root, job, running, "slow", lease_s=30) == "lost"
+    assert wq.run_job(root, again, running2, "fast", lease_s=30) == "done"
+    done = wq.wait(root, [job_id], timeout=1)[job_id]
+    assert done["worker"] == "fast" and done["attempt"] == 2
+
+
+def test_shap_chunks_match_a_full_pass(tmp_path):
+    import xgboost as xgb
+
+    from model_update import load_features
+
+    rng = np.random.default_rng(0)
+    n = 300
+    df = pd.DataFrame({
+        "Detector_ID": rng.choice([2906, 3001, 4100], n),
+        "Lane": rng.choice([1, 2, 3], n),
+        "DateTime": pd.date_range("2024-01-01", periods=n, freq="h"),
+        "hour": np.arange(n) % 24,
+        "Volume": rng.integers(0, 200, n).astype(float),
+    })
+    df.loc[:9, "Detector_ID"] = 4100                 # first chunk lacks most ids
+    csv, model_path = tmp_path / "features.csv", tmp_path / "model.json"
+    df.to_csv(csv, index=False)
+    full, features = load_features(csv)
+    model = xgb.XGBRegressor(n_estimators=20, max_depth=3, enable_categorical=True, tree_method="hist")
+    model.fit(full[features], full["Volume"])
+    model.save_model(model_path)
+
+    part, _ = load_features(csv, 10, 20)
+    assert list(part.index) == list(range(10, 20))
+    assert part["Detector_ID"].cat.categories.tolist() == full["Detector_ID"].cat.categories.tolist()
+    pd.testing.assert_frame_equal(part, full.iloc[10:20])
+
+    chunks = []
+    for start in range(0, n, 128):
+        out = tmp_path / f"shap_{start}.csv"
+        res = wq.task_shap_chunk(str(csv), str(model_path), str(out), start, min(start + 128, n))
+        assert res["rows"] == min(128, n - start)
+        chunks.append(pd.read_csv(out, index_col=0))
+    whole = tmp_path / "shap_all.csv"
+    wq.task_shap_chunk(str(csv), str(model_path), str(whole), 0, n)
+    pd.testing.assert_frame_equal(pd.concat(chunks), pd.read_csv(whole, index_col=0))